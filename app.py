@@ -3,13 +3,27 @@ import time
 import random
 import re
 import os
-import json
+import sys
 from datetime import datetime
-from dataclasses import dataclass
 from typing import List, Optional, Dict
-import anthropic
 from dotenv import load_dotenv
 
+# 共通モジュール（streamlit_app/utils）のパスを追加
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app'))
+
+from data.models import PastQuestion
+from data.universities import get_universities
+from utils.claude_gateway import get_claude_gateway
+from utils.exam_timer import exam_timer
+from utils.timed_exam import TimedExam
+from utils.progress import ProgressReporter, report_stage
+from utils.prompts import category_missing_fields_request, category_scoring_request, response_json
+from utils.score_distribution import attempt_key, get_score_distributions
+from utils.scoring_result import (
+    category_result, missing_category_fields, parse_fields, sabcd_grade, validate_category_fields
+)
+from utils.streaming import IncrementalJSONParser, stream_message
+
 # 環境変数の読み込み
 load_dotenv()
 
@@ -23,196 +37,16 @@ st.set_page_config(
 # Claude API 設定
 @st.cache_resource
 def get_claude_client():
-    """Claude クライアントを取得"""
+    """Claude APIゲートウェイを取得（同時実行数・レート制限・再試行をプロセス全体で共有）"""
     api_key = os.getenv("ANTHROPIC_API_KEY") or st.secrets.get("ANTHROPIC_API_KEY")
     if not api_key:
         st.error("⚠️ Claude API キーが設定されていません。環境変数 ANTHROPIC_API_KEY を設定してください。")
         st.stop()
-    return anthropic.Anthropic(api_key=api_key)
-
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 大学データ
-@st.cache_resource
-def get_universities():
-    return [
-        University(
-            id='dokkyo',
-            name='獨協大学',
-            faculties=[
-                Faculty(
-                    id='foreign-languages',
-                    name='外国語学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='exchange-culture',
-                            name='交流文化学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='dokkyo-culture-2025',
-                                    year=2025,
-                                    theme='【長文読解型】TikTokの影響力と情報発信について論じた文章を読み、「TikTokアプリを禁止すべき」との主張についてのあなたの考えを、本文の議論をふまえて述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2024',
-                                    year=2024,
-                                    theme='【長文読解型】Twitter買収・デジタル時代の公共性について論じた文章を読み、「オンライン上の言論空間はどのようなものであるべきでしょうか」について、本文の議論をふまえたあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2023',
-                                    year=2023,
-                                    theme='【長文読解型】「利他」について論じた文章を読み、問1（短答式9字抜き出し）、問2「あなたは利他についてどのように考えますか」筆者の考えを参考にしてあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='sport-science',
-                    name='スポーツ科学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-science',
-                            name='スポーツ科学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-sport-2023', 2023, 'スポーツが社会に果たす役割について、現代社会の課題と関連づけて論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2022', 2022, 'デジタル技術の発展がスポーツに与える影響と可能性について述べなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2021', 2021, 'コロナ禍におけるスポーツの価値と今後の在り方について論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='rikkyo',
-            name='立教大学',
-            faculties=[
-                Faculty(
-                    id='sports-wellness',
-                    name='スポーツウェルネス学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sports-wellness',
-                            name='スポーツウェルネス学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='rikkyo-sports-2025',
-                                    year=2025,
-                                    theme='スポーツ活動における優秀な実績を持つあなたが、大学でどのような学びを深めたいか、具体的な目標と計画を述べなさい。（800字以内）',
-                                    time_limit=60,
-                                    university='立教大学',
-                                    faculty='スポーツウェルネス学部',
-                                    department='スポーツウェルネス学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='showa-women',
-            name='昭和女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('showa-intl-2023', 2023, '国際社会における多様性の重要性について、具体例を挙げて論じなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-intl-2022', 2022, 'グローバル化が教育に与える影響について述べなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='jissen-women',
-            name='実践女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('jissen-intl-2023', 2023, '持続可能な国際協力のあり方について、あなたの考えを述べなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-intl-2022', 2022, '文化交流が社会に与える意義について論じなさい。', 90, '実践女子大学', '国際学部', '国際学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
+    return get_claude_gateway(api_key)
 
 # Claude API関数
-def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str) -> str:
-    """Claude APIを使用した問題予想"""
+def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str, on_text=None) -> str:
+    """Claude APIを使用した問題予想（on_text を渡すと生成途中の問題文を逐次通知）"""
     try:
         client = get_claude_client()
         
@@ -236,85 +70,68 @@ def api_generate_question(past_questions: List[PastQuestion], university: str, f
 出力形式：
 問題文のみを出力してください。"""
 
-        message = client.messages.create(
+        response_text = stream_message(
+            client,
+            on_text=on_text,
             model="claude-3-haiku-20240307",
             max_tokens=500,
             messages=[{"role": "user", "content": prompt}]
         )
         
-        return message.content[0].text.strip()
+        return response_text.strip()
         
     except Exception as e:
         st.error(f"API エラー: {str(e)}")
         return fallback_generate_question(past_questions, university, faculty, department)
 
-def api_score_essay(content: str, theme: str, university: str, faculty: str) -> dict:
-    """Claude APIを使用した詳細採点"""
+def api_score_essay(content: str, theme: str, university: str, faculty: str, on_section=None, progress: Optional[ProgressReporter] = None) -> dict:
+    """Claude APIを使用した詳細採点
+
+    on_section を渡すと、応答を受信しながら完成した評価項目ごとに on_section(項目名, 値) を呼ぶ。
+    progress を渡すと、プロンプト作成から解析までの処理段階を通知する。
+    """
     try:
         client = get_claude_client()
+        report_stage(progress, "prompt")
         
-        prompt = f"""あなたは{university}{faculty}の厳格な入試評価委員です。以下の小論文を大学入試レベルの厳しい基準で詳細評価してください。
-
-【出題テーマ】
-{theme}
-
-【学生の解答】
-{content}
-
-【厳格評価基準】
-以下の4項目を100点満点で厳しく評価してください。平均点は60-70点とし、優秀でない限り80点を超えないよう厳正に採点：
-
-1. 構成・組織化 (25点満点): 序論・本論・結論の明確性、段落構成、全体の論理的流れ
-2. 内容・論点 (25点満点): 論点の深度、根拠の妥当性、具体例の適切性、独創性
-3. 論理性・一貫性 (25点満点): 論理展開の正確性、矛盾の有無、因果関係の明確性
-4. 表現・文章力 (25点満点): 語彙力、文章の正確性、読みやすさ、誤字脱字
-
-【詳細要求事項】
-- 各項目の評価文は400文字以上で具体的な問題点と改善方法を詳述
-- 改善点は実際の文章を引用して具体的に指摘
-- 総合評価は200文字以上で厳格に判定
-- 具体的アドバイスは8つ以上の詳細な改善提案
-
-【SABCD評価・偏差値・合格可能性も算出】
-
-以下のJSON形式で回答してください：
-{{
-  "総合得点": 65,
-  "SABCD評価": "C",
-  "偏差値": 48,
-  "合格可能性": "35%",
-  "構成": {{"得点": 15, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "内容": {{"得点": 17, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "論理性": {{"得点": 16, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "表現": {{"得点": 17, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "総合評価": "200文字以上の厳格な総合判定コメント",
-  "具体的アドバイス": ["詳細改善提案1", "詳細改善提案2", "詳細改善提案3", "詳細改善提案4", "詳細改善提案5", "詳細改善提案6", "詳細改善提案7", "詳細改善提案8"]
-}}"""
-
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": prompt}]
-        )
-        
-        response_text = message.content[0].text.strip()
+        parser = IncrementalJSONParser()
         
-        # JSON部分を抽出
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
+        def notify_sections(delta: str):
+            if on_section is not None:
+                for key, value in parser.feed(delta):
+                    on_section(key, value)
         
-        if json_start != -1 and json_end != -1:
-            json_text = response_text[json_start:json_end]
-            return json.loads(json_text)
-        else:
-            raise ValueError("JSON形式の応答が見つかりません")
-            
+        # 採点結果は submit_score ツールの入力（JSON スキーマで形式を指定）として受け取る
+        response_text = stream_message(
+            client,
+            on_delta=notify_sections,
+            progress=progress,
+            **category_scoring_request(content, theme, university, faculty)
+        )
+        report_stage(progress, "parse")
+        
+        fields = parse_fields(response_text, validate_category_fields)
+        missing = missing_category_fields(fields)
+        if missing:
+            # 出力が途中で切れるなどして不足した項目だけを再生成する（答案までの入力はキャッシュから読み込まれる）
+            message = client.messages.create(
+                **category_missing_fields_request(content, theme, university, faculty, missing)
+            )
+            supplement = parse_fields(response_json(message), validate_category_fields)
+            for key in missing:
+                if key in supplement:
+                    fields[key] = supplement[key]
+                    if on_section is not None:
+                        on_section(key, supplement[key])
+        result = category_result(fields)
+        return result
+
     except Exception as e:
         st.error(f"API エラー: {str(e)}")
         return fallback_score_essay(content, theme, university, faculty)
 
-def api_generate_model_answer(theme: str, university: str, faculty: str) -> str:
-    """Claude APIを使用した模範解答生成"""
+def api_generate_model_answer(theme: str, university: str, faculty: str, on_text=None) -> str:
+    """Claude APIを使用した模範解答生成（on_text を渡すと生成途中の本文を逐次通知）"""
     try:
         client = get_claude_client()
         
@@ -332,13 +149,15 @@ def api_generate_model_answer(theme: str, university: str, faculty: str) -> str:
 
 模範解答のみを出力してください。"""
 
-        message = client.messages.create(
+        response_text = stream_message(
+            client,
+            on_text=on_text,
             model="claude-3-haiku-20240307",
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
         )
         
-        return message.content[0].text.strip()
+        return response_text.strip()
         
     except Exception as e:
         st.error(f"API エラー: {str(e)}")
@@ -357,27 +176,10 @@ def fallback_score_essay(content: str, theme: str, university: str, faculty: str
     # 厳しい採点基準
     base_score = min(75, max(45, len(content) // 15 + random.randint(35, 60)))
     
-    # SABCD評価
-    if base_score >= 85: sabcd = "S"
-    elif base_score >= 75: sabcd = "A" 
-    elif base_score >= 65: sabcd = "B"
-    elif base_score >= 55: sabcd = "C"
-    else: sabcd = "D"
-    
-    # 偏差値計算
-    deviation = max(35, min(65, base_score * 0.8 + random.randint(-5, 5)))
-    
-    # 合格可能性
-    if base_score >= 80: possibility = f"{random.randint(85, 95)}%"
-    elif base_score >= 70: possibility = f"{random.randint(65, 80)}%"
-    elif base_score >= 60: possibility = f"{random.randint(35, 60)}%"
-    else: possibility = f"{random.randint(10, 30)}%"
-    
     return {
         "総合得点": base_score,
-        "SABCD評価": sabcd,
-        "偏差値": deviation,
-        "合格可能性": possibility,
+        "SABCD評価": sabcd_grade(base_score),
+        "AI使用": "フォールバック",
         "構成": {
             "得点": base_score//4-2, 
             "評価": "序論・本論・結論の構成は見られるものの、段落間の論理的つながりが不明確な部分があります。各段落の役割をより明確にし、論理的な流れを意識した構成にする必要があります。特に序論での問題提起と結論での解決策提示の対応関係を強化してください。", 
@@ -455,6 +257,16 @@ def show_writing_guide():
         
         st.info("💡 この画面は入力中も参照できます。サイドバーから随時確認してください。")
 
+def show_score_section_preview(container, key: str, value):
+    """受信途中の採点結果を項目ごとに表示"""
+    if isinstance(value, dict) and "得点" in value:
+        container.markdown(f"**{key}**: {value['得点']}/25点")
+        container.caption(value.get("評価", ""))
+    elif key == "総合得点":
+        container.markdown(f"**総合得点**: {value}/100点")
+    elif key == "総合評価":
+        container.info(value)
+
 # メイン関数
 def main():
     st.title("🤖 Claude API搭載 総合選抜型入試 小論文対策アプリ（2026年度入試対応）")
@@ -541,13 +353,15 @@ def main():
                     
                     if st.button("問題生成して練習開始", type="primary"):
                         # 問題生成
+                        question_preview = st.empty()
                         with st.spinner("Claude AIが過去問を分析して問題を生成中..."):
                             past_questions = selected_department.past_questions
                             question = api_generate_question(
                                 past_questions,
                                 selected_university.name,
                                 selected_faculty.name,
-                                selected_department.name
+                                selected_department.name,
+                                on_text=question_preview.info
                             )
                             st.session_state.current_question = question
                         
@@ -566,6 +380,11 @@ def main():
             st.error("問題が生成されていません。最初からやり直してください。")
             return
         
+        # 再読み込み・サーバーの再起動で失われた下書きを復元する（確認はセッションごとに1回）
+        exam = TimedExam(st.session_state, st.query_params)
+        if exam.restore_draft(st.session_state.current_question) is not None:
+            st.info("💾 前回の下書きを復元しました。")
+        
         # タイマー機能
         if 'start_time' not in st.session_state:
             st.session_state.start_time = None
@@ -583,18 +402,18 @@ def main():
                     st.session_state.start_time = time.time()
                     st.session_state.timer_started = True
                     st.rerun()
-            else:
-                if st.session_state.start_time:
-                    elapsed = time.time() - st.session_state.start_time
-                    remaining = max(0, 90*60 - elapsed)  # 90分
-                    mins = int(remaining // 60)
-                    secs = int(remaining % 60)
-                    
-                    if remaining > 0:
-                        st.metric("⏰ 残り時間", f"{mins:02d}:{secs:02d}")
-                    else:
-                        st.error("⏰ 時間終了！")
-                        st.markdown("制限時間が終了しました。提出してください。")
+            elif st.session_state.start_time:
+                # ブラウザ側で数え、締切に達したときだけ再実行される（90分）
+                time_limit = 90 * 60
+                if exam_timer(st.session_state.start_time + time_limit, time_limit):
+                    # 時間切れの場合は自動提出（入力欄の最新の内容を使う）
+                    st.session_state.essay_content = st.session_state.get("essay_input", st.session_state.essay_content)
+                    if st.session_state.essay_content.strip():
+                        exam.finish()
+                        st.session_state.essay_result = None
+                        st.session_state.step = 'result'
+                        st.rerun()
+                    st.error("⏰ 時間終了！")
         
         essay_content = st.text_area(
             "小論文を入力してください",
@@ -604,6 +423,7 @@ def main():
             key="essay_input"
         )
         st.session_state.essay_content = essay_content
+        exam.update(essay_content, st.session_state.current_question)
         
         char_count = len(essay_content)
         st.write(f"文字数: {char_count}文字")
@@ -620,6 +440,7 @@ def main():
         with col1:
             if st.button("🤖 Claude詳細評価で提出", type="primary", disabled=not can_submit):
                 st.session_state.essay_content = essay_content
+                exam.finish()
                 # 評価結果をリセット（新しい評価のため）
                 st.session_state.essay_result = None
                 st.session_state.step = 'result'
@@ -637,6 +458,7 @@ def main():
         
         with col4:
             if st.button("❌ 最初から"):
+                exam.finish()
                 for key in ['step', 'selected_university', 'selected_faculty', 'selected_department', 
                            'current_question', 'essay_content', 'essay_result', 'start_time', 'timer_started']:
                     if key in st.session_state:
@@ -653,14 +475,39 @@ def main():
         
         # 評価実行
         if st.session_state.essay_result is None:
+            progress_bar = st.progress(0.0)
+            progress = ProgressReporter(lambda label, fraction: progress_bar.progress(fraction, text=label))
+            section_preview = st.empty()
+            preview_box = section_preview.container()
             with st.spinner("Claude AIが厳格に評価中..."):
                 result = api_score_essay(
                     st.session_state.essay_content,
                     st.session_state.current_question,
                     st.session_state.selected_university.name,
-                    st.session_state.selected_faculty.name
+                    st.session_state.selected_faculty.name,
+                    on_section=lambda key, value: show_score_section_preview(preview_box, key, value),
+                    progress=progress
                 )
+                # 偏差値・合格可能性は学科の得点分布から求める（修正版の再評価・簡易評価は分布に加えず、同じ答案は一度だけ加える）
+                distributions = get_score_distributions()
+                is_revision = st.session_state.pop('is_revision', False)
+                department_key = (
+                    st.session_state.selected_university.name,
+                    st.session_state.selected_faculty.name,
+                    st.session_state.selected_department.name
+                )
+                if is_revision or result.get("AI使用") == "フォールバック":
+                    standing = distributions.standing(*department_key, result.get("総合得点", 0))
+                else:
+                    standing = distributions.observe(
+                        *department_key, result.get("総合得点", 0),
+                        attempt_key(st.session_state.essay_content, st.session_state.current_question, *department_key)
+                    )
+                result.update(standing.to_display())
                 st.session_state.essay_result = result
+            progress.stage("render")
+            section_preview.empty()
+            progress_bar.empty()
         
         result = st.session_state.essay_result
         
@@ -680,6 +527,8 @@ def main():
         with col3:
             deviation = result.get("偏差値", 50)
             st.metric("偏差値", deviation)
+            if "順位" in result:
+                st.caption(f"{result['順位']}（同じ学科の{result.get('比較人数', 0)}件の答案と比較）")
         
         with col4:
             possibility = result.get("合格可能性", "50%")
@@ -742,13 +591,15 @@ def main():
         char_count_modified = len(modified_essay)
         st.write(f"文字数: {char_count_modified}文字")
         
-        # 修正・再評価ボタン
+        # 修正・再評価ボタン（模範解答は生成途中から全幅で表示）
+        model_answer_preview = st.empty()
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             if st.button("🔄 修正して再評価", type="primary", disabled=char_count_modified < 100):
                 st.session_state.essay_content = modified_essay
                 st.session_state.essay_result = None  # 評価結果をリセット
+                st.session_state.is_revision = True
                 st.success("✅ 文章を更新しました。新しい評価を開始します...")
                 st.rerun()
         
@@ -758,9 +609,11 @@ def main():
                     model_answer = api_generate_model_answer(
                         st.session_state.current_question,
                         st.session_state.selected_university.name,
-                        st.session_state.selected_faculty.name
+                        st.session_state.selected_faculty.name,
+                        on_text=model_answer_preview.markdown
                     )
                     st.session_state.model_answer = model_answer
+                model_answer_preview.empty()
                 
         with col3:
             if st.button("✍️ 入力画面に戻る"):
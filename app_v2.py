@@ -3,13 +3,32 @@ import time
 import random
 import re
 import os
-import json
+import sys
 from datetime import datetime
-from dataclasses import dataclass
 from typing import List, Optional, Dict
-import anthropic
 from dotenv import load_dotenv
 
+# 共通モジュール（streamlit_app/utils）のパスを追加
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'streamlit_app'))
+
+from data.models import PastQuestion
+from data.universities import get_universities
+from utils.claude_gateway import get_claude_gateway
+from utils.model_answer_store import get_model_answer_store
+from utils.progress import ProgressReporter, report_stage
+from utils.prompts import (
+    CATEGORY_SCORING_RUBRIC_VERSION, SCORING_MODEL, category_missing_fields_request, category_scoring_request,
+    response_json
+)
+from utils.result_pipeline import prefetch, take_prefetched
+from utils.revision import EssayDiff, describe_paragraph, diff_paragraphs
+from utils.score_cache import RESULT_FORMAT_CATEGORY, get_score_cache, make_cache_key
+from utils.score_distribution import attempt_key, get_score_distributions
+from utils.scoring_result import (
+    category_result, missing_category_fields, parse_fields, repair_json, sabcd_grade, validate_category_fields
+)
+from utils.streaming import IncrementalJSONParser, stream_message
+
 # 環境変数の読み込み
 load_dotenv()
 
@@ -20,199 +39,22 @@ st.set_page_config(
     layout="wide"
 )
 
-# Claude API 設定（キャッシュなし）
+# Claude API 設定
+@st.cache_resource
 def get_claude_client():
-    """Claude クライアントを取得（評価の度に新しいクライアント）"""
+    """Claude APIゲートウェイを取得（同時実行数・レート制限・再試行をプロセス全体で共有）"""
     api_key = os.getenv("ANTHROPIC_API_KEY") or st.secrets.get("ANTHROPIC_API_KEY")
     if not api_key:
         st.error("⚠️ Claude API キーが設定されていません。環境変数 ANTHROPIC_API_KEY を設定してください。")
         st.stop()
-    # 毎回新しいクライアントを作成（キャッシュ回避）
-    return anthropic.Anthropic(api_key=api_key)
-
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 大学データ
-@st.cache_resource
-def get_universities():
-    return [
-        University(
-            id='dokkyo',
-            name='獨協大学',
-            faculties=[
-                Faculty(
-                    id='foreign-languages',
-                    name='外国語学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='exchange-culture',
-                            name='交流文化学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='dokkyo-culture-2025',
-                                    year=2025,
-                                    theme='【長文読解型】TikTokの影響力と情報発信について論じた文章を読み、「TikTokアプリを禁止すべき」との主張についてのあなたの考えを、本文の議論をふまえて述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2024',
-                                    year=2024,
-                                    theme='【長文読解型】Twitter買収・デジタル時代の公共性について論じた文章を読み、「オンライン上の言論空間はどのようなものであるべきでしょうか」について、本文の議論をふまえたあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2023',
-                                    year=2023,
-                                    theme='【長文読解型】「利他」について論じた文章を読み、問1（短答式9字抜き出し）、問2「あなたは利他についてどのように考えますか」筆者の考えを参考にしてあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='sport-science',
-                    name='スポーツ科学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-science',
-                            name='スポーツ科学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-sport-2023', 2023, 'スポーツが社会に果たす役割について、現代社会の課題と関連づけて論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2022', 2022, 'デジタル技術の発展がスポーツに与える影響と可能性について述べなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2021', 2021, 'コロナ禍におけるスポーツの価値と今後の在り方について論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='rikkyo',
-            name='立教大学',
-            faculties=[
-                Faculty(
-                    id='sports-wellness',
-                    name='スポーツウェルネス学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sports-wellness',
-                            name='スポーツウェルネス学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='rikkyo-sports-2025',
-                                    year=2025,
-                                    theme='スポーツ活動における優秀な実績を持つあなたが、大学でどのような学びを深めたいか、具体的な目標と計画を述べなさい。（800字以内）',
-                                    time_limit=60,
-                                    university='立教大学',
-                                    faculty='スポーツウェルネス学部',
-                                    department='スポーツウェルネス学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='showa-women',
-            name='昭和女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('showa-intl-2023', 2023, '国際社会における多様性の重要性について、具体例を挙げて論じなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-intl-2022', 2022, 'グローバル化が教育に与える影響について述べなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='jissen-women',
-            name='実践女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('jissen-intl-2023', 2023, '持続可能な国際協力のあり方について、あなたの考えを述べなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-intl-2022', 2022, '文化交流が社会に与える意義について論じなさい。', 90, '実践女子大学', '国際学部', '国際学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
+    return get_claude_gateway(api_key)
 
 # Claude API関数
-def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str) -> str:
-    """Claude APIを使用した問題予想"""
+# 模範解答プロンプトを変更したら更新する（保存済みの模範解答を作り直すため）
+MODEL_ANSWER_PROMPT_VERSION = "app_v2-2026-v1"
+
+def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str, on_text=None) -> str:
+    """Claude APIを使用した問題予想（on_text を渡すと生成途中の問題文を逐次通知）"""
     try:
         client = get_claude_client()
         
@@ -269,115 +111,219 @@ def api_generate_question(past_questions: List[PastQuestion], university: str, f
 出力形式：
 問題文のみを簡潔に出力してください。"""
 
-        message = client.messages.create(
+        response_text = stream_message(
+            client,
+            on_text=on_text,
             model="claude-3-haiku-20240307",
             max_tokens=800,
             messages=[{"role": "user", "content": prompt}]
         )
         
-        return message.content[0].text.strip()
+        return response_text.strip()
         
     except Exception as e:
         st.error(f"API エラー: {str(e)}")
         return fallback_generate_question(past_questions, university, faculty, department)
 
-def api_score_essay(content: str, theme: str, university: str, faculty: str) -> dict:
-    """Claude APIを使用した詳細採点"""
+def api_score_essay(content: str, theme: str, university: str, faculty: str, force_refresh: bool = False, on_section=None, progress: Optional[ProgressReporter] = None) -> dict:
+    """Claude APIを使用した詳細採点（同一内容の再提出はキャッシュから返す）
+
+    on_section を渡すと、応答を受信しながら完成した評価項目ごとに on_section(項目名, 値) を呼ぶ。
+    progress を渡すと、プロンプト作成から解析までの処理段階を通知する。
+    """
+    cache = get_score_cache()
+    cache_key = make_cache_key(
+        content, theme, university, faculty, CATEGORY_SCORING_RUBRIC_VERSION, SCORING_MODEL, RESULT_FORMAT_CATEGORY
+    )
+    if not force_refresh:
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            return cached_result
+    
     try:
         client = get_claude_client()
+        report_stage(progress, "prompt")
         
-        # 評価用の一意性確保
-        import hashlib
-        content_hash = hashlib.md5(content.encode()).hexdigest()[:8]
-        current_time = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        parser = IncrementalJSONParser()
         
-        # プロンプトに一意性を追加（キャッシュ回避）
-        import random
-        random_seed = random.randint(10000, 99999)
+        def notify_sections(delta: str):
+            if on_section is not None:
+                for key, value in parser.feed(delta):
+                    on_section(key, value)
         
-        prompt = f"""【緊急評価指令 - ID: {content_hash}-{current_time}-{random_seed}】
-あなたは{university}{faculty}の厳格な入試評価委員です。以下の小論文を完全に新規として評価してください。
+        # 採点結果は submit_score ツールの入力（JSON スキーマで形式を指定）として受け取る
+        response_text = stream_message(
+            client,
+            on_delta=notify_sections,
+            progress=progress,
+            **category_scoring_request(content, theme, university, faculty)
+        )
+        report_stage(progress, "parse")
+        
+        fields = parse_fields(response_text, validate_category_fields)
+        missing = missing_category_fields(fields)
+        if missing:
+            # 出力が途中で切れるなどして不足した項目だけを再生成する（答案までの入力はキャッシュから読み込まれる）
+            message = client.messages.create(
+                **category_missing_fields_request(content, theme, university, faculty, missing)
+            )
+            supplement = parse_fields(response_json(message), validate_category_fields)
+            for key in missing:
+                if key in supplement:
+                    fields[key] = supplement[key]
+                    if on_section is not None:
+                        on_section(key, supplement[key])
+        result = category_result(fields)
+        cache.put(cache_key, result)
+        return result
 
-🚨 重要指示:
-1. この評価は独立した新しい評価です
-2. 文章の長さ、構成、内容、表現を詳細に分析してください
-3. 前回とは異なる視点で厳格に採点してください
-4. 必ず具体的な改善点を文章から引用して指摘してください
-5. 評価スコアは文章の実際の質に基づいて変動させてください
+    except Exception as e:
+        st.error(f"API エラー: {str(e)}")
+        return fallback_score_essay(content, theme, university, faculty)
 
-【評価対象文章の特徴】
-- 文字数: {len(content)}文字
-- 文章ハッシュ: {content_hash}
-- 評価時刻: {current_time}
+# 差分採点
+REVISION_MAX_TOKENS = 1500
+SCORE_CATEGORIES = ("構成", "内容", "論理性", "表現")
+# 評価結果に画面側で付け加える項目（前回の評価を引き継ぐときは除く）
+RESULT_METADATA_KEYS = ("評価時刻", "文字数", "AI使用", "評価ID", "評価内容", "偏差値", "合格可能性", "順位", "比較人数")
+# 変更のない段落はプロンプトに冒頭だけを載せる
+UNCHANGED_PARAGRAPH_PREVIEW = 40
+
+def build_revision_prompt(diff: EssayDiff, previous_result: dict, theme: str, university: str, faculty: str) -> str:
+    """修正版の差分採点用のプロンプトを作成（変更された段落と前回の評価だけを送る）"""
+    previous_lines = [
+        f"- {category}: {previous_result[category].get('得点', 0)}/25点 改善点: {previous_result[category].get('改善点', '')}"
+        for category in SCORE_CATEGORIES if isinstance(previous_result.get(category), dict)
+    ]
+    previous_lines.append(f"- 総合得点: {previous_result.get('総合得点', 0)}/100点")
+    
+    changes = {change.index: change for change in diff.changes if change.after}
+    paragraph_lines = []
+    for index, paragraph in enumerate(diff.paragraphs):
+        change = changes.get(index)
+        if change is None:
+            preview = paragraph[:UNCHANGED_PARAGRAPH_PREVIEW] + ("…" if len(paragraph) > UNCHANGED_PARAGRAPH_PREVIEW else "")
+            paragraph_lines.append(f"第{index + 1}段落（変更なし）: {preview}")
+        else:
+            label = "追加" if change.kind == "added" else "変更"
+            paragraph_lines.append(
+                f"第{index + 1}段落（{label}）\n"
+                f"  修正前: {change.before or 'なし'}\n"
+                f"  修正後: {change.after}\n"
+                f"  特徴: {describe_paragraph(change.before)} → {describe_paragraph(change.after)}"
+            )
+    for change in diff.changes:
+        if change.kind == "removed":
+            paragraph_lines.append(f"削除された段落（第{change.index + 1}段落の位置）: {change.before}")
+    
+    return f"""あなたは{university}{faculty}の厳格な入試評価委員です。前回評価した小論文を受験生が修正しました。
+変更された段落だけを精読し、前回の評価を更新してください。変更のない段落の評価は前回のものを引き継ぎます。
 
 【出題テーマ】
 {theme}
 
-【学生の解答】
-{content}
-
-【厳格評価基準】
-以下の4項目を100点満点で厳しく評価してください。文章の質に応じて点数を大きく変動させてください：
+【前回の評価】
+{chr(10).join(previous_lines)}
 
-1. 構成・組織化 (25点満点): 序論・本論・結論の明確性、段落構成、全体の論理的流れ
-2. 内容・論点 (25点満点): 論点の深度、根拠の妥当性、具体例の適切性、独創性
-3. 論理性・一貫性 (25点満点): 論理展開の正確性、矛盾の有無、因果関係の明確性
-4. 表現・文章力 (25点満点): 語彙力、文章の正確性、読みやすさ、誤字脱字
+【修正版の段落構成】（全{len(diff.paragraphs)}段落・{sum(map(len, diff.paragraphs))}文字）
+{chr(10).join(paragraph_lines)}
 
-【詳細要求事項】
-- 各項目の評価文は400文字以上で、この文章特有の問題点と改善方法を詳述
-- 改善点は実際の文章から具体的な部分を引用して指摘
-- 総合評価は200文字以上で、この文章の特徴を踏まえた厳格な判定
-- 具体的アドバイスは8つ以上の、この文章に特化した詳細な改善提案
-- 文字数や内容の変化に応じて評価を大きく変動させてください
-
-【SABCD評価・偏差値・合格可能性も算出】
-- 文章の質に応じて評価を大幅に変動させる
-- 同じ文章でも角度を変えて厳格に再評価する
+【評価要求】
+- 評価基準は前回と同じ（各項目25点満点の厳格評価）
+- 修正によって得点が変わる項目だけを出力し、変わらない項目は省略してください
+- 評価文・改善点は修正箇所を引用して具体的に
 
 以下のJSON形式で回答してください：
 {{
-  "総合得点": 65,
-  "SABCD評価": "C",
-  "偏差値": 48,
-  "合格可能性": "35%",
-  "構成": {{"得点": 15, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "内容": {{"得点": 17, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "論理性": {{"得点": 16, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "表現": {{"得点": 17, "評価": "400文字以上の詳細評価", "改善点": "具体的な文章引用と改善方法"}},
-  "総合評価": "200文字以上の厳格な総合判定コメント",
-  "具体的アドバイス": ["詳細改善提案1", "詳細改善提案2", "詳細改善提案3", "詳細改善提案4", "詳細改善提案5", "詳細改善提案6", "詳細改善提案7", "詳細改善提案8"]
+  "構成": {{"得点": 16, "評価": "修正を踏まえた評価（200文字程度）", "改善点": "具体的な文章引用と改善方法"}},
+  "修正への講評": "修正で良くなった点とまだ残る課題（200文字程度）",
+  "具体的アドバイス": ["詳細改善提案1", "詳細改善提案2", "詳細改善提案3", "詳細改善提案4"]
 }}"""
 
-        # temperatureを追加して応答にバリエーションを持たせる
-        temperature = 0.7 + (random.randint(0, 30) / 100)  # 0.7-1.0の範囲
-        
-        message = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=4000,
-            temperature=temperature,
+def merge_revision_result(previous_result: dict, update: dict) -> dict:
+    """前回の評価に差分採点の結果を反映する（出力されなかった項目は前回の評価を引き継ぐ）"""
+    result = {key: value for key, value in previous_result.items() if key not in RESULT_METADATA_KEYS}
+    for category in SCORE_CATEGORIES:
+        category_update = update.get(category)
+        if not isinstance(category_update, dict):
+            continue
+        merged = dict(result.get(category, {}))
+        if isinstance(category_update.get("得点"), (int, float)):
+            merged["得点"] = min(max(int(category_update["得点"]), 0), 25)
+        for field in ("評価", "改善点"):
+            if isinstance(category_update.get(field), str) and category_update[field].strip():
+                merged[field] = category_update[field]
+        result[category] = merged
+    result["総合得点"] = sum(result.get(category, {}).get("得点", 0) for category in SCORE_CATEGORIES)
+    result["SABCD評価"] = sabcd_grade(result["総合得点"])
+    if isinstance(update.get("修正への講評"), str) and update["修正への講評"].strip():
+        result["総合評価"] = update["修正への講評"]
+    if isinstance(update.get("具体的アドバイス"), list) and update["具体的アドバイス"]:
+        result["具体的アドバイス"] = update["具体的アドバイス"]
+    return result
+
+def api_rescore_revision(previous_content: str, previous_result: dict, content: str, theme: str, university: str, faculty: str, on_section=None, progress: Optional[ProgressReporter] = None) -> dict:
+    """修正版の差分採点（変更された段落だけを送り、前回の Claude の評価を更新する）
+
+    前回がフォールバック評価の場合や、変更が大きい場合（FULL_RESCORE_RATIO 超）は全文を採点し直す。
+    """
+    cache = get_score_cache()
+    cache_key = make_cache_key(
+        content, theme, university, faculty, CATEGORY_SCORING_RUBRIC_VERSION, SCORING_MODEL, RESULT_FORMAT_CATEGORY
+    )
+    cached_result = cache.get(cache_key)
+    if cached_result is not None:
+        return cached_result
+    
+    diff = diff_paragraphs(previous_content, content)
+    if not str(previous_result.get("AI使用", "")).startswith("Claude") or diff.needs_full_rescore():
+        return api_score_essay(content, theme, university, faculty, on_section=on_section, progress=progress)
+    
+    try:
+        client = get_claude_client()
+        report_stage(progress, "prompt")
+        prompt = build_revision_prompt(diff, previous_result, theme, university, faculty)
+        
+        parser = IncrementalJSONParser()
+        
+        def notify_sections(delta: str):
+            if on_section is not None:
+                for key, value in parser.feed(delta):
+                    on_section(key, value)
+        
+        response_text = stream_message(
+            client,
+            on_delta=notify_sections,
+            progress=progress,
+            model=SCORING_MODEL,
+            max_tokens=REVISION_MAX_TOKENS,
+            temperature=0.2,
             messages=[{"role": "user", "content": prompt}]
         )
+        report_stage(progress, "parse")
         
-        response_text = message.content[0].text.strip()
-        
-        # JSON部分を抽出
-        json_start = response_text.find('{')
-        json_end = response_text.rfind('}') + 1
-        
-        if json_start != -1 and json_end != -1:
-            json_text = response_text[json_start:json_end]
-            parsed_result = json.loads(json_text)
-            return parsed_result
-        else:
+        update = repair_json(response_text)
+        if update is None:
             raise ValueError("JSON形式の応答が見つかりません")
-            
+        result = merge_revision_result(previous_result, update)
+        result["評価内容"] = f"差分評価 - 変更{len(diff.changes)}段落/全{len(diff.paragraphs)}段落"
+        cache.put(cache_key, result)
+        return result
+    
     except Exception as e:
-        st.error(f"API エラー: {str(e)}")
-        return fallback_score_essay(content, theme, university, faculty)
-
-def api_generate_model_answer(theme: str, university: str, faculty: str) -> str:
-    """Claude APIを使用した模範解答生成"""
+        st.error(f"差分評価エラー: {str(e)}（全文で評価し直します）")
+        return api_score_essay(content, theme, university, faculty, on_section=on_section, progress=progress)
+
+def api_generate_model_answer(theme: str, university: str, faculty: str, on_text=None) -> str:
+    """Claude APIを使用した模範解答生成（on_text を渡すと生成途中の本文を逐次通知）
+
+    生成済みの模範解答はストアから即座に返し、新たに生成したものはストアに保存する。
+    """
+    store = get_model_answer_store()
+    stored_answer = store.get(theme, university, faculty, MODEL_ANSWER_PROMPT_VERSION)
+    if stored_answer is not None:
+        return stored_answer
+    
     try:
         client = get_claude_client()
         
@@ -395,13 +341,17 @@ def api_generate_model_answer(theme: str, university: str, faculty: str) -> str:
 
 模範解答のみを出力してください。"""
 
-        message = client.messages.create(
+        response_text = stream_message(
+            client,
+            on_text=on_text,
             model="claude-3-haiku-20240307",
             max_tokens=1000,
             messages=[{"role": "user", "content": prompt}]
         )
         
-        return message.content[0].text.strip()
+        model_answer = response_text.strip()
+        store.put(theme, university, faculty, MODEL_ANSWER_PROMPT_VERSION, model_answer)
+        return model_answer
         
     except Exception as e:
         st.error(f"API エラー: {str(e)}")
@@ -421,26 +371,12 @@ def fallback_score_essay(content: str, theme: str, university: str, faculty: str
     base_score = min(75, max(45, len(content) // 15 + random.randint(35, 60)))
     
     # SABCD評価
-    if base_score >= 85: sabcd = "S"
-    elif base_score >= 75: sabcd = "A" 
-    elif base_score >= 65: sabcd = "B"
-    elif base_score >= 55: sabcd = "C"
-    else: sabcd = "D"
-    
-    # 偏差値計算
-    deviation = max(35, min(65, base_score * 0.8 + random.randint(-5, 5)))
-    
-    # 合格可能性
-    if base_score >= 80: possibility = f"{random.randint(85, 95)}%"
-    elif base_score >= 70: possibility = f"{random.randint(65, 80)}%"
-    elif base_score >= 60: possibility = f"{random.randint(35, 60)}%"
-    else: possibility = f"{random.randint(10, 30)}%"
+    sabcd = sabcd_grade(base_score)
     
     return {
         "総合得点": base_score,
         "SABCD評価": sabcd,
-        "偏差値": deviation,
-        "合格可能性": possibility,
+        "AI使用": "フォールバック",
         "構成": {
             "得点": base_score//4-2, 
             "評価": "序論・本論・結論の構成は見られるものの、段落間の論理的つながりが不明確な部分があります。各段落の役割をより明確にし、論理的な流れを意識した構成にする必要があります。特に序論での問題提起と結論での解決策提示の対応関係を強化してください。", 
@@ -518,6 +454,16 @@ def show_writing_guide():
         
         st.info("💡 この画面は入力中も参照できます。サイドバーから随時確認してください。")
 
+def show_score_section_preview(container, key: str, value):
+    """受信途中の採点結果を項目ごとに表示"""
+    if isinstance(value, dict) and "得点" in value:
+        container.markdown(f"**{key}**: {value['得点']}/25点")
+        container.caption(value.get("評価", ""))
+    elif key == "総合得点":
+        container.markdown(f"**総合得点**: {value}/100点")
+    elif key in ("総合評価", "修正への講評"):
+        container.info(value)
+
 # メイン関数
 def main():
     st.title("🤖 Claude API搭載 総合選抜型入試 小論文対策アプリ（2026年度入試対応）")
@@ -553,6 +499,7 @@ def main():
             st.session_state.current_question = None
             st.session_state.essay_content = ""
             st.session_state.essay_result = None
+            st.session_state.model_answer = None
             st.rerun()
         
         st.markdown("---")
@@ -605,16 +552,21 @@ def main():
                     st.info(f"📋 選択内容: {selected_university.name} {selected_faculty.name} {selected_department.name}")
                     
                     if st.button("🚀 問題生成して練習開始", type="primary"):
-                        # 問題生成
-                        with st.spinner("🤖 Claude AIが過去問を分析して問題を生成中..."):
-                            past_questions = selected_department.past_questions
-                            question = api_generate_question(
-                                past_questions,
-                                selected_university.name,
-                                selected_faculty.name,
-                                selected_department.name
-                            )
-                            st.session_state.current_question = question
+                        # 問題生成（前回の結果画面で先読みした予想問題があれば即座に使う）
+                        department_key = (selected_university.name, selected_faculty.name, selected_department.name)
+                        question = take_prefetched(st.session_state, 'next_question_prefetch', department_key)
+                        if question is None:
+                            question_preview = st.empty()
+                            with st.spinner("🤖 Claude AIが過去問を分析して問題を生成中..."):
+                                past_questions = selected_department.past_questions
+                                question = api_generate_question(
+                                    past_questions,
+                                    selected_university.name,
+                                    selected_faculty.name,
+                                    selected_department.name,
+                                    on_text=question_preview.info
+                                )
+                        st.session_state.current_question = question
                         
                         st.success("✅ 問題生成完了！小論文入力画面に移動します")
                         st.session_state.step = 'essay'
@@ -725,22 +677,69 @@ def main():
         if st.session_state.essay_result is None:
             evaluation_time = datetime.now().strftime("%H:%M:%S")
             
+            # 採点と並行して、模範解答の生成と同じ学科の次の予想問題の先読みを開始
+            university_name = st.session_state.selected_university.name
+            faculty_name = st.session_state.selected_faculty.name
+            department = st.session_state.selected_department
+            question_key = (university_name, faculty_name, st.session_state.current_question)
+            if not st.session_state.get('model_answer'):
+                prefetch(st.session_state, 'model_answer_prefetch', question_key,
+                         api_generate_model_answer, st.session_state.current_question, university_name, faculty_name)
+            prefetch(st.session_state, 'next_question_prefetch', (university_name, faculty_name, department.name),
+                     api_generate_question, department.past_questions, university_name, faculty_name, department.name)
+            
+            progress_bar = st.progress(0.0)
+            progress = ProgressReporter(lambda label, fraction: progress_bar.progress(fraction, text=label))
+            section_preview = st.empty()
+            preview_box = section_preview.container()
             with st.spinner("🤖 Claude AIが厳格に評価中..."):
                 try:
                     
-                    result = api_score_essay(
-                        st.session_state.essay_content,
-                        st.session_state.current_question,
-                        st.session_state.selected_university.name,
-                        st.session_state.selected_faculty.name
-                    )
+                    force_refresh = st.session_state.pop('force_rescore', False)
+                    revision_base = st.session_state.pop('revision_base', None)
+                    if revision_base is not None and not force_refresh:
+                        # 修正版は前回の評価から変更された段落だけを評価し直す
+                        previous_content, previous_result = revision_base
+                        result = api_rescore_revision(
+                            previous_content,
+                            previous_result,
+                            st.session_state.essay_content,
+                            st.session_state.current_question,
+                            st.session_state.selected_university.name,
+                            st.session_state.selected_faculty.name,
+                            on_section=lambda key, value: show_score_section_preview(preview_box, key, value),
+                            progress=progress
+                        )
+                    else:
+                        result = api_score_essay(
+                            st.session_state.essay_content,
+                            st.session_state.current_question,
+                            st.session_state.selected_university.name,
+                            st.session_state.selected_faculty.name,
+                            force_refresh=force_refresh,
+                            on_section=lambda key, value: show_score_section_preview(preview_box, key, value),
+                            progress=progress
+                        )
                     
                     # 評価時刻を記録
                     result["評価時刻"] = evaluation_time
                     result["文字数"] = len(st.session_state.essay_content)
-                    result["AI使用"] = "Claude-3-Haiku"
+                    result.setdefault("AI使用", "Claude-3-Haiku")
                     result["評価ID"] = f"Claude-{evaluation_time}"
-                    result["評価内容"] = f"新規評価 - 文字数{len(st.session_state.essay_content)}"
+                    result.setdefault("評価内容", f"新規評価 - 文字数{len(st.session_state.essay_content)}")
+                    # 偏差値・合格可能性は学科の得点分布から求める（修正版の再評価・簡易評価は分布に加えず、
+                    # キャッシュ済みの結果や強制再評価など同じ答案は一度だけ加える）
+                    distributions = get_score_distributions()
+                    total_score = result.get("総合得点", 0)
+                    if revision_base is not None or result["AI使用"] == "フォールバック":
+                        standing = distributions.standing(university_name, faculty_name, department.name, total_score)
+                    else:
+                        standing = distributions.observe(
+                            university_name, faculty_name, department.name, total_score,
+                            attempt_key(st.session_state.essay_content, st.session_state.current_question,
+                                        university_name, faculty_name, department.name)
+                        )
+                    result.update(standing.to_display())
                     
                     st.session_state.essay_result = result
                     
@@ -757,8 +756,16 @@ def main():
                     result["評価時刻"] = evaluation_time
                     result["文字数"] = len(st.session_state.essay_content)
                     result["AI使用"] = "フォールバック"
+                    result.update(get_score_distributions().standing(
+                        university_name, faculty_name, department.name, result["総合得点"]
+                    ).to_display())
                     
                     st.session_state.essay_result = result
+            if not st.session_state.get('model_answer'):
+                st.session_state.model_answer = take_prefetched(st.session_state, 'model_answer_prefetch', question_key)
+            progress.stage("render")
+            section_preview.empty()
+            progress_bar.empty()
         
         result = st.session_state.essay_result
         
@@ -790,6 +797,8 @@ def main():
         with col3:
             deviation = result.get("偏差値", 50)
             st.metric("偏差値", deviation)
+            if "順位" in result:
+                st.caption(f"{result['順位']}（同じ学科の{result.get('比較人数', 0)}件の答案と比較）")
         
         with col4:
             possibility = result.get("合格可能性", "50%")
@@ -879,11 +888,15 @@ def main():
         else:
             st.warning("⚠️ 文章に変更がありません")
         
-        # 修正・再評価ボタン
+        # 修正・再評価ボタン（模範解答は生成途中から全幅で表示）
+        model_answer_preview = st.empty()
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             if st.button("🔄 修正版で再評価", type="primary", disabled=char_count_new < 100 or not has_changed):
+                # 前回の解答と評価を差分評価の基準として残す
+                if st.session_state.essay_result is not None:
+                    st.session_state.revision_base = (st.session_state.essay_content, st.session_state.essay_result)
                 # セッション状態を確実に更新
                 st.session_state.essay_content = new_essay
                 st.session_state.essay_result = None
@@ -893,8 +906,7 @@ def main():
                     if key in st.session_state:
                         del st.session_state[key]
                 
-                st.success("✅ 新しい文章で評価を開始します...")
-                time.sleep(1)
+                st.toast("✅ 新しい文章で評価を開始します...")
                 st.rerun()
         
         with col2:
@@ -903,9 +915,11 @@ def main():
                     model_answer = api_generate_model_answer(
                         st.session_state.current_question,
                         st.session_state.selected_university.name,
-                        st.session_state.selected_faculty.name
+                        st.session_state.selected_faculty.name,
+                        on_text=model_answer_preview.markdown
                     )
                     st.session_state.model_answer = model_answer
+                model_answer_preview.empty()
                 
         with col3:
             if st.button("✍️ 入力画面に戻る"):
@@ -918,11 +932,18 @@ def main():
                 st.session_state.essay_content = ""
                 st.session_state.essay_result = None
                 st.session_state.current_question = None
+                st.session_state.model_answer = None
                 st.session_state.start_time = None
                 st.session_state.timer_started = False
                 st.session_state.step = 'select'
                 st.rerun()
         
+        # キャッシュを使わない強制再評価
+        if st.button("♻️ 同じ文章を強制再評価", help="保存済みの評価結果を使わずにClaudeで評価し直します"):
+            st.session_state.essay_result = None
+            st.session_state.force_rescore = True
+            st.rerun()
+        
         # 模範解答表示
         if 'model_answer' in st.session_state and st.session_state.model_answer:
             st.markdown("---")
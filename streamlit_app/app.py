@@ -3,6 +3,7 @@ import time
 import sys
 import os
 from datetime import datetime
+from functools import partial
 
 # パスを追加
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -11,6 +12,9 @@ from data.universities import get_universities
 from data.writing_guides import get_writing_guides
 from utils.question_predictor import generate_predicted_question
 from utils.essay_scorer import score_essay
+from utils.exam_timer import exam_timer
+from utils.timed_exam import TimedExam
+from utils.repetition import MAX_ESSAY_CHARS
 from data.models import Essay
 
 # ページ設定
@@ -61,16 +65,6 @@ st.markdown("""
         border-left: 4px solid #4f46e5;
         margin: 1rem 0;
     }
-    .timer-display {
-        font-size: 2rem;
-        font-weight: bold;
-        color: #dc2626;
-        text-align: center;
-        padding: 1rem;
-        background-color: #fef2f2;
-        border-radius: 8px;
-        border: 2px solid #fecaca;
-    }
 </style>
 """, unsafe_allow_html=True)
 
@@ -104,6 +98,7 @@ def reset_state():
     st.session_state.essay_content = ""
     st.session_state.start_time = None
     st.session_state.essay_score = None
+    TimedExam(st.session_state, st.query_params).finish()
 
 def main():
     st.title("📝 総合選抜型入試 小論文対策アプリ")
@@ -246,47 +241,62 @@ def show_essay_editor():
     st.markdown(f"**制限時間:** {question.time_limit}分 | **推奨文字数:** 800-1200字")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    exam = TimedExam(st.session_state, st.query_params)
+    
+    # 締切時にサーバー側で自動提出済み（タブを操作していなかった場合も含む）なら結果画面へ
+    auto_submitted = exam.take_auto_submitted()
+    if auto_submitted is not None:
+        draft, future = auto_submitted
+        if draft.strip():
+            st.session_state.essay_content = draft
+            st.session_state.essay_score = future.result()
+            st.session_state.current_state = 'result'
+            st.rerun()
+    
+    # 再読み込み・サーバーの再起動で失われた下書きを復元する（確認はセッションごとに1回）
+    if exam.restore_draft(question.theme) is not None:
+        st.info("💾 前回の下書きを復元しました。")
+    saved = exam.saved_draft()
+    if saved is not None and saved.theme != question.theme:
+        # 出題テーマが変わった場合は復元せず、参照できるように表示だけする
+        with st.expander(f"💾 前回の下書き（出題テーマ: {saved.theme}）"):
+            st.text(saved.content)
+    
     # タイマー開始
     if st.session_state.start_time is None:
         if st.button("⏰ タイマーを開始して練習を始める", type="primary"):
             st.session_state.start_time = time.time()
             st.session_state.time_limit = question.time_limit * 60  # 秒に変換
+            # 締切に達したら、ブラウザの操作を待たずにその時点の下書きを採点する
+            exam.start(st.session_state.start_time + st.session_state.time_limit,
+                       partial(score_essay, theme=question.theme), st.session_state.essay_content)
             st.rerun()
         
         st.info("準備ができたら上のボタンを押してタイマーを開始してください。")
         return
     
-    # 経過時間とタイマー表示
-    elapsed_time = time.time() - st.session_state.start_time
-    remaining_time = max(0, st.session_state.time_limit - elapsed_time)
-    
-    col1, col2, col3 = st.columns(3)
+    # 経過時間とタイマー表示（ブラウザ側で数え、締切に達したときだけ再実行される）
+    col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.metric("経過時間", f"{int(elapsed_time // 60)}:{int(elapsed_time % 60):02d}")
+        time_up = exam_timer(st.session_state.start_time + st.session_state.time_limit, st.session_state.time_limit)
     
     with col2:
-        minutes = int(remaining_time // 60)
-        seconds = int(remaining_time % 60)
-        if remaining_time > 0:
-            st.markdown(f'<div class="timer-display">残り {minutes}:{seconds:02d}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="timer-display">時間切れ</div>', unsafe_allow_html=True)
-    
-    with col3:
         word_count = len(st.session_state.essay_content.replace(' ', '').replace('\n', ''))
         st.metric("文字数", word_count)
     
     # 小論文入力エリア
-    if remaining_time > 0:
+    if not time_up:
         essay_content = st.text_area(
             "📝 ここに小論文を書いてください",
             value=st.session_state.essay_content,
             height=400,
+            max_chars=MAX_ESSAY_CHARS,
             placeholder="ここに小論文を入力してください...",
             key="essay_input"
         )
         st.session_state.essay_content = essay_content
+        exam.update(essay_content, question.theme)
         
         # 提出ボタン
         col1, col2 = st.columns(2)
@@ -315,6 +325,7 @@ def show_essay_editor():
     else:
         # 時間切れの場合は自動提出
         st.error("⏰ 制限時間が終了しました。自動的に提出されます。")
+        st.session_state.essay_content = st.session_state.get("essay_input", st.session_state.essay_content)
         if st.session_state.essay_content.strip():
             submit_essay()
         else:
@@ -326,6 +337,9 @@ def submit_essay():
         st.error("小論文が入力されていません。")
         return
     
+    # 締切前の提出（または時間切れを画面側で検出した場合）は自動提出を取り消す
+    TimedExam(st.session_state, st.query_params).finish()
+    
     # 採点実行
     score = score_essay(st.session_state.essay_content, st.session_state.current_question.theme)
     st.session_state.essay_score = score
@@ -1,11 +1,20 @@
 import streamlit as st
 import time
-import random
-import re
+import os
+import sys
 from datetime import datetime
-from dataclasses import dataclass
 from typing import List, Optional, Dict
 
+# パスを追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data.search import search, search_universities
+from data.universities import get_universities
+from utils.question_predictor import predict_question
+from utils.repetition import MAX_ESSAY_CHARS, find_repeated_spans
+from utils.rule_engine import EssayFeatures, RuleEngine
+from utils.tokenizer import analyze
+
 # ページ設定
 st.set_page_config(
     page_title="AI搭載 総合選抜型入試 小論文対策アプリ",
@@ -13,217 +22,25 @@ st.set_page_config(
     layout="wide"
 )
 
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 拡張された大学データ
-@st.cache_data
-def get_universities():
-    return [
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='political-science',
-                    name='政治経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='politics',
-                            name='政治学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-pol-2023', 2023, 'デジタル社会における民主主義の課題と可能性について、具体例を挙げて論じなさい。', 90, '早稲田大学', '政治経済学部', '政治学科'),
-                                PastQuestion('waseda-pol-2022', 2022, 'グローバル化が進む現代において、国家の役割はどのように変化すべきか論じなさい。', 90, '早稲田大学', '政治経済学部', '政治学科'),
-                                PastQuestion('waseda-pol-2021', 2021, 'コロナ禍を通じて見えた現代社会の課題と、その解決策について論じなさい。', 90, '早稲田大学', '政治経済学部', '政治学科'),
-                                PastQuestion('waseda-pol-2020', 2020, '持続可能な社会の実現に向けて、政治が果たすべき役割について論じなさい。', 90, '早稲田大学', '政治経済学部', '政治学科'),
-                                PastQuestion('waseda-pol-2019', 2019, '人工知能の発達が社会に与える影響と、それに対する政策の在り方について論じなさい。', 90, '早稲田大学', '政治経済学部', '政治学科')
-                            ]
-                        ),
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-econ-2023', 2023, '日本経済の持続的成長に向けた課題と解決策について論じなさい。', 90, '早稲田大学', '政治経済学部', '経済学科'),
-                                PastQuestion('waseda-econ-2022', 2022, 'デジタル経済の発展が労働市場に与える影響について述べなさい。', 90, '早稲田大学', '政治経済学部', '経済学科'),
-                                PastQuestion('waseda-econ-2021', 2021, 'ポストコロナ時代の経済政策について論じなさい。', 90, '早稲田大学', '政治経済学部', '経済学科'),
-                                PastQuestion('waseda-econ-2020', 2020, '環境問題と経済発展の両立について論じなさい。', 90, '早稲田大学', '政治経済学部', '経済学科'),
-                                PastQuestion('waseda-econ-2019', 2019, 'AI時代における雇用創出の在り方について述べなさい。', 90, '早稲田大学', '政治経済学部', '経済学科')
-                            ]
-                        )
-                    ]
-                ),
-                Faculty(
-                    id='law',
-                    name='法学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='law',
-                            name='法学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-law-2023', 2023, '法の支配と民主主義の関係について、現代社会の具体例を挙げて論じなさい。', 90, '早稲田大学', '法学部', '法学科'),
-                                PastQuestion('waseda-law-2022', 2022, 'デジタル時代における個人情報保護と表現の自由の調和について論じなさい。', 90, '早稲田大学', '法学部', '法学科'),
-                                PastQuestion('waseda-law-2021', 2021, 'コロナ禍における緊急事態宣言と憲法上の人権制約について述べなさい。', 90, '早稲田大学', '法学部', '法学科'),
-                                PastQuestion('waseda-law-2020', 2020, '国際社会における法の役割と限界について論じなさい。', 90, '早稲田大学', '法学部', '法学科'),
-                                PastQuestion('waseda-law-2019', 2019, 'AI判断システムの導入と司法制度の未来について述べなさい。', 90, '早稲田大学', '法学部', '法学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='keio',
-            name='慶應義塾大学',
-            faculties=[
-                Faculty(
-                    id='economics',
-                    name='経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('keio-econ-2023', 2023, 'デジタル化が進む現代において、経済活動はどのように変化すべきか論じなさい。', 90, '慶應義塾大学', '経済学部', '経済学科'),
-                                PastQuestion('keio-econ-2022', 2022, 'グローバル資本主義の課題と新しい経済システムの可能性について述べなさい。', 90, '慶應義塾大学', '経済学部', '経済学科'),
-                                PastQuestion('keio-econ-2021', 2021, 'コロナ禍が明らかにした経済格差の問題と解決策について論じなさい。', 90, '慶應義塾大学', '経済学部', '経済学科'),
-                                PastQuestion('keio-econ-2020', 2020, '持続可能な経済発展とイノベーションの関係について述べなさい。', 90, '慶應義塾大学', '経済学部', '経済学科'),
-                                PastQuestion('keio-econ-2019', 2019, 'デジタル通貨の普及が金融システムに与える影響について論じなさい。', 90, '慶應義塾大学', '経済学部', '経済学科')
-                            ]
-                        )
-                    ]
-                ),
-                Faculty(
-                    id='business',
-                    name='商学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='business',
-                            name='商学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('keio-bus-2023', 2023, 'ESG経営が企業価値に与える影響について論じなさい。', 90, '慶應義塾大学', '商学部', '商学科'),
-                                PastQuestion('keio-bus-2022', 2022, 'デジタルマーケティングの進化と消費者行動の変化について述べなさい。', 90, '慶應義塾大学', '商学部', '商学科'),
-                                PastQuestion('keio-bus-2021', 2021, 'ポストコロナ時代のビジネスモデル変革について論じなさい。', 90, '慶應義塾大学', '商学部', '商学科'),
-                                PastQuestion('keio-bus-2020', 2020, 'スタートアップ企業の社会的価値創造について述べなさい。', 90, '慶應義塾大学', '商学部', '商学科'),
-                                PastQuestion('keio-bus-2019', 2019, 'AIを活用したビジネス革新の可能性と課題について論じなさい。', 90, '慶應義塾大学', '商学部', '商学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='todai',
-            name='東京大学',
-            faculties=[
-                Faculty(
-                    id='liberal-arts',
-                    name='教養学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='liberal-arts',
-                            name='教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('todai-liberal-2023', 2023, '多様性と包摂性が求められる現代社会において、教育の果たすべき役割について論じなさい。', 120, '東京大学', '教養学部', '教養学科'),
-                                PastQuestion('todai-liberal-2022', 2022, '科学技術の発展と人間性の調和について、具体例を挙げて述べなさい。', 120, '東京大学', '教養学部', '教養学科'),
-                                PastQuestion('todai-liberal-2021', 2021, 'グローバル化時代における文化的アイデンティティの意義について論じなさい。', 120, '東京大学', '教養学部', '教養学科'),
-                                PastQuestion('todai-liberal-2020', 2020, '持続可能な社会の実現に向けた教養教育の役割について述べなさい。', 120, '東京大学', '教養学部', '教養学科'),
-                                PastQuestion('todai-liberal-2019', 2019, 'AI時代における人間の知性と創造性の価値について論じなさい。', 120, '東京大学', '教養学部', '教養学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='sophia',
-            name='上智大学',
-            faculties=[
-                Faculty(
-                    id='foreign-studies',
-                    name='外国語学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='english',
-                            name='英語学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('sophia-eng-2023', 2023, '言語多様性の保護と国際コミュニケーションの促進の両立について論じなさい。', 90, '上智大学', '外国語学部', '英語学科'),
-                                PastQuestion('sophia-eng-2022', 2022, 'デジタル時代における言語学習の変化と課題について述べなさい。', 90, '上智大学', '外国語学部', '英語学科'),
-                                PastQuestion('sophia-eng-2021', 2021, '国際社会における英語の役割と他言語との共存について論じなさい。', 90, '上智大学', '外国語学部', '英語学科'),
-                                PastQuestion('sophia-eng-2020', 2020, '異文化理解教育の重要性と実践方法について述べなさい。', 90, '上智大学', '外国語学部', '英語学科'),
-                                PastQuestion('sophia-eng-2019', 2019, 'AI翻訳技術の発展が言語教育に与える影響について論じなさい。', 90, '上智大学', '外国語学部', '英語学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='meiji',
-            name='明治大学',
-            faculties=[
-                Faculty(
-                    id='information',
-                    name='情報コミュニケーション学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='information',
-                            name='情報コミュニケーション学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('meiji-info-2023', 2023, 'SNSが現代社会のコミュニケーションに与える影響について論じなさい。', 90, '明治大学', '情報コミュニケーション学部', '情報コミュニケーション学科'),
-                                PastQuestion('meiji-info-2022', 2022, 'デジタルデバイドの解消に向けた取り組みについて述べなさい。', 90, '明治大学', '情報コミュニケーション学部', '情報コミュニケーション学科'),
-                                PastQuestion('meiji-info-2021', 2021, 'メディアリテラシー教育の重要性と実践について論じなさい。', 90, '明治大学', '情報コミュニケーション学部', '情報コミュニケーション学科'),
-                                PastQuestion('meiji-info-2020', 2020, '情報社会における個人のプライバシー保護について述べなさい。', 90, '明治大学', '情報コミュニケーション学部', '情報コミュニケーション学科'),
-                                PastQuestion('meiji-info-2019', 2019, 'AI時代におけるヒューマンコミュニケーションの価値について論じなさい。', 90, '明治大学', '情報コミュニケーション学部', '情報コミュニケーション学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
+# 採点ルールで使うキーワード群（RuleEngine で全キーワードをまとめて照合する）
+SCORING_RULES = RuleEngine({
+    "introduction": ['について', 'において', 'に関して', 'とは'],
+    "conclusion": ['よって', '従って', '以上', 'このように', '結論として'],
+    "ordering": ['まず', '次に', 'さらに', '最後に'],
+    "example": ['例えば', '具体的に', 'たとえば', '実際に', '現実に'],
+    "logical_connector": ['そのため', 'なぜなら', '理由は', 'その結果', 'このことから', 'つまり', 'すなわち'],
+    "counter_argument": ['一方', 'しかし', 'ただし', 'もっとも', 'とはいえ', 'けれども'],
+    "causal": ['原因', '結果', '要因', '影響', '背景', '根拠'],
+    "plain_style": ['である', 'だ。'],
+    # アドバイス用（採点より狭い条件で判定する）
+    "introduction_advice": ['について', 'において', 'に関して'],
+    "example_advice": ['例えば', '具体的に', 'たとえば'],
+    "connector_advice": ['そのため', 'なぜなら', 'その結果', 'このことから'],
+    "counter_advice": ['一方', 'しかし', 'ただし'],
+    "hedging": ['思います', '思う'],
+    # 執筆中の簡易分析プレビュー用
+    "preview_connector": ['そのため', 'なぜなら', 'このため'],
+})
 
 # AI機能：詳細採点システム
 def detailed_essay_scoring(content: str, theme: str) -> dict:
@@ -240,21 +57,19 @@ def detailed_essay_scoring(content: str, theme: str) -> dict:
             "model_answer": ""
         }
     
-    word_count = len(content.replace(' ', '').replace('\n', ''))
-    paragraphs = [p.strip() for p in content.split('\n') if p.strip()]
-    sentences = [s.strip() for s in re.split(r'[。！？]', content) if s.strip()]
+    features = SCORING_RULES.extract(content)
     
     # 構成評価
-    structure_score, structure_eval = evaluate_structure(content, paragraphs)
+    structure_score, structure_eval = evaluate_structure(features)
     
     # 内容評価
-    content_score, content_eval = evaluate_content(content, theme, word_count)
+    content_score, content_eval = evaluate_content(content, theme, features)
     
     # 論理性評価
-    logic_score, logic_eval = evaluate_logic(content, sentences)
+    logic_score, logic_eval = evaluate_logic(features)
     
     # 表現評価
-    expression_score, expression_eval = evaluate_expression(content, sentences, word_count)
+    expression_score, expression_eval = evaluate_expression(content, features)
     
     total_score = structure_score + content_score + logic_score + expression_score
     
@@ -262,7 +77,7 @@ def detailed_essay_scoring(content: str, theme: str) -> dict:
     detailed_feedback = generate_detailed_feedback(total_score, structure_score, content_score, logic_score, expression_score)
     
     # 具体的アドバイス生成
-    specific_advice = generate_specific_advice(content, structure_score, content_score, logic_score, expression_score)
+    specific_advice = generate_specific_advice(features, structure_score, content_score, logic_score, expression_score)
     
     # 模範解答生成
     model_answer = generate_model_answer(theme)
@@ -278,16 +93,17 @@ def detailed_essay_scoring(content: str, theme: str) -> dict:
         "model_answer": model_answer
     }
 
-def evaluate_structure(content: str, paragraphs: List[str]) -> tuple:
+def evaluate_structure(features: EssayFeatures) -> tuple:
     """構成評価"""
     score = 0
     evaluation_parts = []
+    paragraph_count = features.paragraph_count
     
     # 段落数評価
-    if len(paragraphs) >= 4:
+    if paragraph_count >= 4:
         score += 8
         evaluation_parts.append("適切な段落数（序論・本論・結論）が確保されています。")
-    elif len(paragraphs) >= 3:
+    elif paragraph_count >= 3:
         score += 6
         evaluation_parts.append("基本的な三段構成が確認できます。")
     else:
@@ -295,25 +111,22 @@ def evaluate_structure(content: str, paragraphs: List[str]) -> tuple:
         evaluation_parts.append("段落数が不足しています。序論・本論・結論の構成を明確にしてください。")
     
     # 序論の評価
-    first_paragraph = paragraphs[0] if paragraphs else ""
-    if any(keyword in first_paragraph for keyword in ['について', 'において', 'に関して', 'とは']):
+    if features.paragraph_has("introduction", 0):
         score += 5
         evaluation_parts.append("序論で適切な問題提起が行われています。")
     else:
         evaluation_parts.append("序論での問題提起をより明確にしてください。")
     
     # 結論の評価
-    last_paragraph = paragraphs[-1] if paragraphs else ""
-    if any(keyword in last_paragraph for keyword in ['よって', '従って', '以上', 'このように', '結論として']):
+    if features.paragraph_has("conclusion", -1):
         score += 7
         evaluation_parts.append("結論部分で適切なまとめが行われています。")
     else:
         evaluation_parts.append("結論での主張のまとめをより明確にしてください。")
     
     # 文章の流れ評価
-    if len(paragraphs) >= 3:
-        middle_paragraphs = paragraphs[1:-1]
-        if any(any(keyword in p for keyword in ['まず', '次に', 'さらに', '最後に']) for p in middle_paragraphs):
+    if paragraph_count >= 3:
+        if any(features.paragraph_has("ordering", i) for i in range(1, paragraph_count - 1)):
             score += 5
             evaluation_parts.append("論理的な順序立てが確認できます。")
     
@@ -322,10 +135,11 @@ def evaluate_structure(content: str, paragraphs: List[str]) -> tuple:
     
     return score, evaluation
 
-def evaluate_content(content: str, theme: str, word_count: int) -> tuple:
+def evaluate_content(content: str, theme: str, features: EssayFeatures) -> tuple:
     """内容評価"""
     score = 0
     evaluation_parts = []
+    word_count = features.word_count
     
     # 文字数評価
     if word_count >= 600:
@@ -341,15 +155,14 @@ def evaluate_content(content: str, theme: str, word_count: int) -> tuple:
         evaluation_parts.append("文字数が不足しています。より詳細な論述を心がけてください。")
     
     # 具体例の評価
-    example_keywords = ['例えば', '具体的に', 'たとえば', '実際に', '現実に']
-    if any(keyword in content for keyword in example_keywords):
+    if features.has("example"):
         score += 8
         evaluation_parts.append("具体例が適切に使用され、論証が強化されています。")
     else:
         evaluation_parts.append("具体例を追加して論証を強化してください。")
     
     # データ・数値の活用
-    if re.search(r'\d+%|\d+人|\d+件|\d+年|\d+倍', content):
+    if features.has_data():
         score += 6
         evaluation_parts.append("数値やデータを用いた客観的な論証が見られます。")
     else:
@@ -368,14 +181,13 @@ def evaluate_content(content: str, theme: str, word_count: int) -> tuple:
     
     return score, evaluation
 
-def evaluate_logic(content: str, sentences: List[str]) -> tuple:
+def evaluate_logic(features: EssayFeatures) -> tuple:
     """論理性評価"""
     score = 0
     evaluation_parts = []
     
     # 論理的接続詞の使用
-    logical_connectors = ['そのため', 'なぜなら', '理由は', 'その結果', 'このことから', 'つまり', 'すなわち']
-    connector_count = sum(content.count(connector) for connector in logical_connectors)
+    connector_count = features.count("logical_connector")
     
     if connector_count >= 3:
         score += 8
@@ -390,23 +202,21 @@ def evaluate_logic(content: str, sentences: List[str]) -> tuple:
         evaluation_parts.append("論理的接続詞を使用して、文章の流れをより明確にしてください。")
     
     # 反対意見への言及
-    counter_keywords = ['一方', 'しかし', 'ただし', 'もっとも', 'とはいえ', 'けれども']
-    if any(keyword in content for keyword in counter_keywords):
+    if features.has("counter_argument"):
         score += 8
         evaluation_parts.append("反対意見や異なる視点への言及があり、多角的な論述が行われています。")
     else:
         evaluation_parts.append("反対意見や異なる視点も考慮して、より多角的な論述を心がけてください。")
     
     # 因果関係の明確性
-    causal_keywords = ['原因', '結果', '要因', '影響', '背景', '根拠']
-    if sum(content.count(keyword) for keyword in causal_keywords) >= 2:
+    if features.count("causal") >= 2:
         score += 6
         evaluation_parts.append("因果関係が明確に示され、論理的な論証が行われています。")
     else:
         evaluation_parts.append("因果関係をより明確に示して、論証を強化してください。")
     
     # 論理の一貫性（重複や矛盾のチェック）
-    if len(sentences) >= 5:
+    if features.sentence_count >= 5:
         score += 3
         evaluation_parts.append("適切な文数で論理的な展開が行われています。")
     
@@ -415,32 +225,32 @@ def evaluate_logic(content: str, sentences: List[str]) -> tuple:
     
     return score, evaluation
 
-def evaluate_expression(content: str, sentences: List[str], word_count: int) -> tuple:
+def evaluate_expression(content: str, features: EssayFeatures) -> tuple:
     """表現評価"""
     score = 0
     evaluation_parts = []
     
     # 文体の適切性
-    if 'である' in content or 'だ。' in content:
+    if features.has("plain_style"):
         score += 5
         evaluation_parts.append("小論文に適した文体で書かれています。")
     else:
         evaluation_parts.append("小論文では「である調」の使用が推奨されます。")
     
     # 語彙の豊富さ
-    unique_words = set(re.findall(r'[ぁ-んァ-ヶー一-龯]+', content))
-    if len(unique_words) >= 100:
+    vocabulary_size = analyze(content).vocabulary_size
+    if vocabulary_size >= 100:
         score += 6
         evaluation_parts.append("豊富な語彙が使用され、表現力豊かな文章です。")
-    elif len(unique_words) >= 70:
+    elif vocabulary_size >= 70:
         score += 4
         evaluation_parts.append("適切な語彙が使用されています。")
     else:
         evaluation_parts.append("より多様な語彙を使用して表現力を向上させてください。")
     
     # 文の長さのバランス
-    if sentences:
-        avg_sentence_length = sum(len(s) for s in sentences) / len(sentences)
+    if features.sentence_count:
+        avg_sentence_length = features.average_sentence_length
         if 30 <= avg_sentence_length <= 60:
             score += 4
             evaluation_parts.append("文の長さが適切で、読みやすい文章です。")
@@ -448,7 +258,7 @@ def evaluate_expression(content: str, sentences: List[str], word_count: int) ->
             evaluation_parts.append("文の長さを調整して、読みやすさを向上させてください。")
     
     # 重複表現のチェック
-    repetitive_patterns = re.findall(r'(.{5,})\1', content)
+    repetitive_patterns = find_repeated_spans(content, 5)
     if not repetitive_patterns:
         score += 5
         evaluation_parts.append("重複表現がなく、簡潔で効果的な表現が使われています。")
@@ -496,53 +306,48 @@ def generate_detailed_feedback(total: int, structure: int, content: int, logic:
     
     return feedback
 
-def generate_specific_advice(content: str, structure: int, content_score: int, logic: int, expression: int) -> List[str]:
+def generate_specific_advice(features: EssayFeatures, structure: int, content_score: int, logic: int, expression: int) -> List[str]:
     """具体的アドバイス生成"""
     advice = []
     
     # 構成に関するアドバイス
     if structure < 20:
-        paragraphs = [p.strip() for p in content.split('\n') if p.strip()]
-        if len(paragraphs) < 3:
+        if features.paragraph_count < 3:
             advice.append("【構成改善】序論・本論・結論の三段構成を明確にしてください。各段落の役割を意識して、序論で問題提起、本論で論証、結論でまとめを行いましょう。")
         
-        first_paragraph = paragraphs[0] if paragraphs else ""
-        if not any(keyword in first_paragraph for keyword in ['について', 'において', 'に関して']):
+        if not features.paragraph_has("introduction_advice", 0):
             advice.append("【序論改善】序論では「〜について」「〜において」などを使って、明確に問題提起を行ってください。例：『近年、デジタル化について様々な議論が行われている。』")
     
     # 内容に関するアドバイス
     if content_score < 24:
-        if not any(keyword in content for keyword in ['例えば', '具体的に', 'たとえば']):
+        if not features.has("example_advice"):
             advice.append("【内容強化】具体例を追加してください。『例えば、〜の場合、』『具体的には、』などを使って、実際の事例や体験を挙げると説得力が増します。")
         
-        if not re.search(r'\d+%|\d+人|\d+件|\d+年', content):
+        if not features.has_data("%人件年"):
             advice.append("【データ活用】可能な範囲で統計データや数値を含めてください。『約70%の企業が』『過去10年間で』などの表現により、客観性が向上します。")
     
     # 論理性に関するアドバイス
     if logic < 20:
-        logical_connectors = ['そのため', 'なぜなら', 'その結果', 'このことから']
-        if not any(connector in content for connector in logical_connectors):
+        if not features.has("connector_advice"):
             advice.append("【論理性向上】論理的接続詞を使用してください。『そのため』『なぜなら』『その結果』などにより、論理の流れを明確にしましょう。")
         
-        if not any(keyword in content for keyword in ['一方', 'しかし', 'ただし']):
+        if not features.has("counter_advice"):
             advice.append("【多角的視点】反対意見にも触れてください。『一方で』『しかし』などを使って異なる立場の意見を紹介し、その上で自分の主張を展開すると説得力が高まります。")
     
     # 表現に関するアドバイス
     if expression < 16:
-        if '思います' in content or '思う' in content:
+        if features.has("hedging"):
             advice.append("【文体改善】小論文では『思う』ではなく『考える』『述べる』『論じる』などの表現を使用してください。また、『である調』で統一しましょう。")
         
-        sentences = [s.strip() for s in re.split(r'[。！？]', content) if s.strip()]
-        if sentences:
-            avg_length = sum(len(s) for s in sentences) / len(sentences)
+        if features.sentence_count:
+            avg_length = features.average_sentence_length
             if avg_length < 20:
                 advice.append("【文章構成】文がやや短すぎます。修飾語や具体例を加えて、より詳細で豊かな表現を心がけてください。")
             elif avg_length > 80:
                 advice.append("【文章構成】文が長すぎて読みにくくなっています。適切な箇所で文を分割し、読みやすさを向上させてください。")
     
     # 全体的なアドバイス
-    word_count = len(content.replace(' ', '').replace('\n', ''))
-    if word_count < 400:
+    if features.word_count < 400:
         advice.append("【文字数】もう少し詳細な論述を心がけてください。根拠の説明や具体例の詳細化により、文字数と説得力の両方を向上させることができます。")
     
     return advice
@@ -602,90 +407,6 @@ AIの最大の利点は、人間の能力を拡張し、効率性を向上させ
 
 結論として、現代社会の課題解決には、多様な立場の人々が協働し、バランスの取れた議論を通じて最適解を見出すことが重要である。変化を恐れるのではなく、積極的に向き合い、より良い社会の実現を目指すべきである。"""
 
-# AI問題予想機能
-def ai_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str) -> str:
-    """AIによる問題予想"""
-    
-    # 過去問題からキーワードを抽出
-    themes = [q.theme for q in past_questions]
-    all_themes_text = " ".join(themes)
-    
-    # トレンドキーワードの定義
-    current_trends = [
-        'デジタル変革', 'AI・機械学習', '持続可能性', 'カーボンニュートラル',
-        'ダイバーシティ', 'インクルージョン', '働き方改革', 'ウェルビーイング',
-        'グローバル化', 'ローカライゼーション', 'イノベーション', 'スタートアップ',
-        'サーキュラーエコノミー', 'SDGs', 'ESG経営', 'リスキリング',
-        'メンタルヘルス', 'デジタルデバイド', 'サイバーセキュリティ', '量子コンピュータ'
-    ]
-    
-    # 学部・学科別のコンテキスト
-    domain_contexts = {
-        '政治': ['民主主義', '政策立案', '国際関係', '公共政策', '行政改革', '地方創生'],
-        '経済': ['市場経済', '金融政策', '産業構造', '労働市場', '国際貿易', '経済格差'],
-        '法': ['法制度', '人権保護', '司法制度', '国際法', '企業法務', '憲法改正'],
-        '商': ['企業経営', 'マーケティング', 'ビジネスモデル', '起業', 'イノベーション', 'ESG'],
-        '外国語': ['国際コミュニケーション', '多言語社会', '異文化理解', '言語教育', '翻訳技術'],
-        '情報': ['情報社会', 'デジタル技術', 'メディア', 'コミュニケーション', 'プライバシー'],
-        '教養': ['人文学', '学際研究', '批判的思考', '文化研究', '社会科学', '総合知']
-    }
-    
-    # 学部・学科に関連するコンテキストを特定
-    relevant_contexts = []
-    for key, contexts in domain_contexts.items():
-        if key in faculty or key in department:
-            relevant_contexts.extend(contexts)
-    
-    if not relevant_contexts:
-        relevant_contexts = ['社会', '現代', '課題', '解決策', '将来展望']
-    
-    # トレンドとコンテキストを組み合わせて問題を生成
-    selected_trend = random.choice(current_trends)
-    selected_context = random.choice(relevant_contexts)
-    
-    # 過去問題のスタイルを分析
-    question_styles = [
-        f"{selected_trend}が{selected_context}分野に与える影響について、具体例を挙げながら論じなさい。また、今後の課題と解決策についてもあなたの考えを述べなさい。",
-        f"現代社会における{selected_trend}の意義を踏まえ、{selected_context}の観点から将来のあるべき姿について論じなさい。",
-        f"{selected_trend}の進展により{selected_context}分野で生じている変化について分析し、それに対する適切な対応策を提言しなさい。",
-        f"{selected_trend}と{selected_context}の関係性について考察し、持続可能な社会の実現に向けた方策を論じなさい。",
-        f"グローバル化が進む中で{selected_trend}が{selected_context}に与える影響について、メリットとデメリットを比較検討し、今後の方向性を述べなさい。"
-    ]
-    
-    return random.choice(question_styles)
-
-# 大学検索機能
-def search_universities(query: str, universities: List[University]) -> List[University]:
-    """大学検索機能"""
-    if not query:
-        return universities
-    
-    query_lower = query.lower()
-    filtered = []
-    
-    for uni in universities:
-        # 大学名での検索
-        if query_lower in uni.name.lower():
-            filtered.append(uni)
-            continue
-        
-        # 学部名での検索
-        for faculty in uni.faculties:
-            if query_lower in faculty.name.lower():
-                filtered.append(uni)
-                break
-        
-        # 学科名での検索
-        for faculty in uni.faculties:
-            for dept in faculty.departments:
-                if query_lower in dept.name.lower():
-                    filtered.append(uni)
-                    break
-            if uni in filtered:
-                break
-    
-    return filtered
-
 # メイン関数
 def main():
     st.title("🤖 AI搭載 総合選抜型入試 小論文対策アプリ")
@@ -778,7 +499,7 @@ def show_advanced_university_selection():
         search_query = st.text_input(
             "🔍 大学名・学部名・学科名で検索", 
             value=default_search,
-            placeholder="例: 早稲田、政治経済、情報コミュニケーション",
+            placeholder="例: 早稲田、早大、keio、政経、情報コミュニケーション",
             key="search_input"
         )
     
@@ -790,11 +511,16 @@ def show_advanced_university_selection():
     
     # 検索結果の表示
     if search_query:
-        filtered_universities = search_universities(search_query, universities)
+        filtered_universities = search_universities(search_query)
         
         if filtered_universities:
             st.success(f"🎯 検索結果: {len(filtered_universities)}件の大学が見つかりました")
             
+            # 学部・学科名で一致したもの
+            unit_matches = [result.label for result in search(search_query, limit=5) if result.faculty is not None]
+            if unit_matches:
+                st.caption("一致した学部・学科: " + " / ".join(unit_matches))
+            
             # 大学選択
             uni_options = ["選択してください"] + [uni.name for uni in filtered_universities]
             selected_uni_name = st.selectbox("📚 大学を選択", uni_options, key="uni_select")
@@ -812,7 +538,7 @@ def show_advanced_university_selection():
                             st.markdown(f"• **{faculty.name}**")
                             ao_depts = [d for d in faculty.departments if d.has_ao]
                             for dept in ao_depts:
-                                st.markdown(f"  - {dept.name} (過去問題: {len(dept.past_questions)}件)")
+                                st.markdown(f"  - {dept.name} (過去問題: {dept.question_count}件)")
                 
                 # 学部選択
                 ao_faculties = [fac for fac in selected_university.faculties if fac.has_ao]
@@ -863,8 +589,7 @@ def show_advanced_university_selection():
                                 
                                 if st.button("🤖 AI予想問題で練習開始", type="primary", key="ai_start_btn"):
                                     with st.spinner("🧠 AI が過去5年のデータを分析して予想問題を生成中..."):
-                                        time.sleep(2)  # AI処理をシミュレート
-                                        ai_question = ai_generate_question(
+                                        ai_question = predict_question(
                                             selected_department.past_questions,
                                             selected_university.name,
                                             selected_faculty.name,
@@ -872,8 +597,7 @@ def show_advanced_university_selection():
                                         )
                                         st.session_state.current_question = ai_question
                                         st.session_state.page = 'writing'
-                                        st.success("✨ AI予想問題を生成しました！")
-                                        time.sleep(1)
+                                        st.toast("✨ AI予想問題を生成しました！")
                                         st.rerun()
                 else:
                     st.warning("この大学にはAO入試対応学部がありません。")
@@ -893,7 +617,7 @@ def show_advanced_university_selection():
                         st.markdown(f"**{faculty.name}** ({ao_dept_count}学科)")
                         for dept in faculty.departments:
                             if dept.has_ao:
-                                st.markdown(f"  • {dept.name} - 過去問題{len(dept.past_questions)}件")
+                                st.markdown(f"  • {dept.name} - 過去問題{dept.question_count}件")
 
 def show_ai_essay_editor():
     """AI小論文エディター画面"""
@@ -915,8 +639,7 @@ def show_ai_essay_editor():
     with col2:
         if st.button("🔄 新しい予想問題", key="new_question_btn"):
             with st.spinner("🤖 新しい予想問題を生成中..."):
-                time.sleep(1)
-                new_question = ai_generate_question(
+                new_question = predict_question(
                     st.session_state.selected_department.past_questions,
                     st.session_state.selected_university.name,
                     st.session_state.selected_faculty.name,
@@ -1007,6 +730,7 @@ def show_ai_essay_editor():
         "📝 ここに小論文を書いてください（AIが文体・構成・論理性をリアルタイム分析）",
         value=st.session_state.essay_content,
         height=400,
+        max_chars=MAX_ESSAY_CHARS,
         placeholder="小論文をここに入力してください...\n\n💡 AIからのヒント:\n- 序論で明確な問題提起を行う\n- 本論で具体例と論拠を示す\n- 結論で主張をまとめる",
         key="ai_essay_textarea"
     )
@@ -1021,7 +745,8 @@ def show_ai_essay_editor():
     
     with col2:
         current_content = essay_content if essay_content else st.session_state.essay_content
-        word_count = len(current_content.replace(' ', '').replace('\n', ''))
+        features = SCORING_RULES.extract(current_content)
+        word_count = features.word_count
         st.metric("📝 文字数", word_count)
         
         # 進捗インジケーター
@@ -1035,7 +760,7 @@ def show_ai_essay_editor():
             st.info("十分")
     
     with col3:
-        paragraphs = len([p for p in current_content.split('\n') if p.strip()])
+        paragraphs = features.paragraph_count
         st.metric("📑 段落数", paragraphs)
         
         if paragraphs < 3:
@@ -1052,15 +777,15 @@ def show_ai_essay_editor():
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                has_examples = any(kw in current_content for kw in ['例えば', '具体的に', 'たとえば'])
+                has_examples = features.has("example_advice")
                 st.metric("具体例", "✓" if has_examples else "✗")
             
             with col2:
-                has_logic = any(kw in current_content for kw in ['そのため', 'なぜなら', 'このため'])
+                has_logic = features.has("preview_connector")
                 st.metric("論理接続", "✓" if has_logic else "✗")
             
             with col3:
-                has_counter = any(kw in current_content for kw in ['一方', 'しかし', 'ただし'])
+                has_counter = features.has("counter_advice")
                 st.metric("多角的視点", "✓" if has_counter else "✗")
     
     # 提出ボタン
@@ -1193,16 +918,10 @@ def show_detailed_results():
     # AI採点実行
     if st.session_state.essay_score is None:
         with st.spinner("🧠 AI が詳細分析中... 構成・内容・論理性・表現を多角的に評価しています"):
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.02)
-                progress_bar.progress(i + 1)
-            
             st.session_state.essay_score = detailed_essay_scoring(
                 st.session_state.essay_content, 
                 st.session_state.current_question
             )
-            progress_bar.empty()
     
     score = st.session_state.essay_score
     
@@ -1316,14 +1035,12 @@ def show_detailed_results():
     
     with col1:
         st.markdown("### 📊 作成統計情報")
-        word_count = len(st.session_state.essay_content.replace(' ', '').replace('\n', ''))
-        st.write(f"**📝 総文字数:** {word_count}文字")
+        features = SCORING_RULES.extract(st.session_state.essay_content)
+        st.write(f"**📝 総文字数:** {features.word_count}文字")
         
-        paragraphs = len([p for p in st.session_state.essay_content.split('\n') if p.strip()])
-        st.write(f"**📑 段落数:** {paragraphs}段落")
+        st.write(f"**📑 段落数:** {features.paragraph_count}段落")
         
-        sentences = len([s for s in re.split(r'[。！？]', st.session_state.essay_content) if s.strip()])
-        st.write(f"**📄 文数:** {sentences}文")
+        st.write(f"**📄 文数:** {features.sentence_count}文")
         
         if st.session_state.start_time:
             elapsed_time = time.time() - st.session_state.start_time
@@ -1368,8 +1085,7 @@ def show_detailed_results():
     with col2:
         if st.button("🤖 新しいAI予想問題", key="new_ai_question"):
             with st.spinner("🧠 新しい予想問題を生成中..."):
-                time.sleep(1)
-                new_question = ai_generate_question(
+                new_question = predict_question(
                     st.session_state.selected_department.past_questions,
                     st.session_state.selected_university.name,
                     st.session_state.selected_faculty.name,
@@ -1,14 +1,35 @@
 import streamlit as st
 import time
-import random
 import re
 import os
+import sys
 from datetime import datetime
-from dataclasses import dataclass
-from typing import List, Optional, Dict
-import anthropic
+from functools import partial
+from typing import Callable, List, Optional, Dict
+import pandas as pd
 from dotenv import load_dotenv
 
+# パスを追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data.models import PastQuestion
+from data.universities import get_universities
+from utils.claude_gateway import get_claude_gateway
+from utils.model_answer_store import get_model_answer_store
+from utils.practice_history import AXES, AXIS_LIMITS, get_practice_history
+from utils.progress import ProgressReporter, report_stage
+from utils.prompts import (
+    MODEL_ANSWER_PROMPT_VERSION, SCORING_MODEL, SCORING_RUBRIC_VERSION,
+    missing_fields_request, model_answer_request, response_json, scoring_request
+)
+from utils.question_pool import get_question_pool
+from utils.question_predictor import predict_question
+from utils.result_pipeline import prefetch, take_prefetched
+from utils.score_cache import RESULT_FORMAT_DISPLAY, get_score_cache, make_cache_key
+from utils.score_distribution import attempt_key, get_score_distributions
+from utils.scoring_result import ScoringResult, is_display_result, missing_fields, parse_fields
+from utils.streaming import IncrementalJSONParser, stream_message
+
 # 環境変数の読み込み
 load_dotenv()
 
@@ -22,172 +43,16 @@ st.set_page_config(
 # Claude API 設定
 @st.cache_resource
 def get_claude_client():
-    """Claude クライアントを取得"""
+    """Claude APIゲートウェイを取得（同時実行数・レート制限・再試行をプロセス全体で共有）"""
     api_key = os.getenv("ANTHROPIC_API_KEY") or st.secrets.get("ANTHROPIC_API_KEY")
     if not api_key:
         st.error("⚠️ Claude API キーが設定されていません。環境変数 ANTHROPIC_API_KEY を設定してください。")
         st.stop()
-    return anthropic.Anthropic(api_key=api_key)
-
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 拡張された大学データ
-@st.cache_resource
-def get_universities():
-    return [
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='sport-science',
-                    name='スポーツ科学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-science',
-                            name='スポーツ科学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('waseda-sport-2023', 2023, 'スポーツが社会に果たす役割について、現代社会の課題と関連づけて論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2022', 2022, 'デジタル技術の発展がスポーツに与える影響と可能性について述べなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2021', 2021, 'コロナ禍におけるスポーツの価値と今後の在り方について論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2020', 2020, 'スポーツを通じた国際交流の意義と課題について論じなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科'),
-                                PastQuestion('waseda-sport-2019', 2019, '高齢化社会におけるスポーツの役割について述べなさい。', 90, '早稲田大学', 'スポーツ科学部', 'スポーツ科学科')
-                            ]
-                        )
-                    ]
-                ),
-            ]
-        ),
-        University(
-            id='dokkyo',
-            name='獨協大学',
-            faculties=[
-                Faculty(
-                    id='foreign-languages',
-                    name='外国語学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='exchange-culture',
-                            name='交流文化学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('dokkyo-culture-2025', 2025, '【長文読解型】TikTokの影響力と情報発信について論じた文章を読み、「TikTokアプリを禁止すべき」との主張についてのあなたの考えを、本文の議論をふまえて述べなさい。（601字以上800字以内）', 90, '獨協大学', '外国語学部', '交流文化学科'),
-                                PastQuestion('dokkyo-culture-2024', 2024, '【長文読解型】Twitter買収・デジタル時代の公共性について論じた文章を読み、「オンライン上の言論空間はどのようなものであるべきでしょうか」について、本文の議論をふまえたあなたの考えを述べなさい。（601字以上800字以内）', 90, '獨協大学', '外国語学部', '交流文化学科'),
-                                PastQuestion('dokkyo-culture-2023', 2023, '【長文読解型】「利他」について論じた文章を読み、問1（短答式9字抜き出し）、問2「あなたは利他についてどのように考えますか」筆者の考えを参考にしてあなたの考えを述べなさい。（601字以上800字以内）', 90, '獨協大学', '外国語学部', '交流文化学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='showa-women',
-            name='昭和女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('showa-international-2023', 2023, '女性のグローバルリーダーシップについて、現代社会の課題と関連づけて論じなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-international-2022', 2022, '持続可能な国際協力の在り方について述べなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-international-2021', 2021, 'コロナ禍における国際教育の価値と課題について論じなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-international-2020', 2020, '文化の多様性と国際理解について述べなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科'),
-                                PastQuestion('showa-international-2019', 2019, 'AI時代における国際教養の意義について論じなさい。', 90, '昭和女子大学', '国際学部', '国際教養学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='jissen-women',
-            name='実践女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('jissen-international-2023', 2023, '実践的な国際協力の在り方について、具体的な事例を挙げて論じなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-international-2022', 2022, '女性の国際的な活躍と社会貢献について述べなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-international-2021', 2021, 'グローバル社会における実践的な学びの重要性について論じなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-international-2020', 2020, '国際社会での実践活動が個人に与える影響について述べなさい。', 90, '実践女子大学', '国際学部', '国際学科'),
-                                PastQuestion('jissen-international-2019', 2019, '実践的な国際理解教育の在り方について論じなさい。', 90, '実践女子大学', '国際学部', '国際学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='rikkyo',
-            name='立教大学',
-            faculties=[
-                Faculty(
-                    id='sport-wellness',
-                    name='スポーツウェルネス学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-wellness',
-                            name='スポーツウェルネス学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion('rikkyo-wellness-2025', 2025, '【長文読解型】エスノメソドロジーについて論じた文章を読み、問1「エスノメソドロジー」について文章の論旨に沿ってまとめなさい（200字前後）、問2「エスノメソドロジー」の見方を異文化コミュニケーション研究でも適用できるかを考察し述べなさい（800字前後）', 90, '立教大学', 'スポーツウェルネス学部', 'スポーツウェルネス学科')
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
+    return get_claude_gateway(api_key)
 
 # Claude API 関数群
-def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str) -> str:
-    """Claude APIを使用した問題予想"""
+def api_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str, on_text=None) -> str:
+    """Claude APIを使用した問題予想（on_text を渡すと生成途中の問題文を逐次通知）"""
     try:
         client = get_claude_client()
         
@@ -245,7 +110,9 @@ def api_generate_question(past_questions: List[PastQuestion], university: str, f
         # 獨協大学の長文読解型問題の場合はトークン数を増やす
         max_tokens = 1500 if university == "獨協大学" else 200
         
-        response = client.messages.create(
+        response_text = stream_message(
+            client,
+            on_text=on_text,
             model="claude-3-haiku-20240307",
             max_tokens=max_tokens,
             temperature=0.8,
@@ -254,170 +121,98 @@ def api_generate_question(past_questions: List[PastQuestion], university: str, f
             ]
         )
         
-        return response.content[0].text.strip()
+        return response_text.strip()
     
     except Exception as e:
         st.error(f"AI問題生成エラー: {e}")
-        # フォールバック（元のロジック）
-        return fallback_generate_question(past_questions, university, faculty, department)
+        # フォールバック（過去問の出題傾向による予想問題）
+        return predict_question(past_questions, university, faculty, department)
 
-def api_score_essay(content: str, theme: str, university: str, faculty: str) -> dict:
-    """Claude APIを使用した詳細採点"""
+def api_score_essay(content: str, theme: str, university: str, faculty: str, force_refresh: bool = False, on_section=None, progress: Optional[ProgressReporter] = None) -> dict:
+    """Claude APIを使用した詳細採点（同一内容の再提出はキャッシュから返す）
+
+    on_section を渡すと、応答を受信しながら完成した項目ごとに on_section(キー, 値) を呼ぶ。
+    progress を渡すと、プロンプト作成から解析までの処理段階を通知する。
+    """
+    cache = get_score_cache()
+    cache_key = make_cache_key(
+        content, theme, university, faculty, SCORING_RUBRIC_VERSION, SCORING_MODEL, RESULT_FORMAT_DISPLAY
+    )
+    if not force_refresh:
+        cached_result = cache.get(cache_key)
+        # 結果画面・練習履歴・得点分布は total と観点別の点数を前提にするため、形式の違う結果は使わずに採点し直す
+        if cached_result is not None and is_display_result(cached_result):
+            return cached_result
+    
     try:
         client = get_claude_client()
+        report_stage(progress, "prompt")
         
-        prompt = f"""
-あなたは厳格な大学入試の小論文採点官です。{university}{faculty}の入試基準で以下の小論文を厳しく評価してください。
-
-【出題テーマ】
-{theme}
-
-【受験生の解答】
-{content}
-
-【厳格な採点基準（大学入試レベル）】
-1. 構成（25点満点）: 
-   - 序論での問題提起と立場表明の明確性
-   - 本論での論点の整理と段落構成
-   - 結論での主張の再確認と提案
-   - 全体的な論理的流れ
-
-2. 内容（30点満点）:
-   - テーマに対する理解度の深さ
-   - 具体例・データ・事例の適切性と効果性
-   - {faculty}の専門性を活かした視点
-   - 独創性と洞察力
-   - 現実性のある提案
-
-3. 論理性（25点満点）:
-   - 論理的一貫性と因果関係の明確性
-   - 反対意見への言及と反駁
-   - 根拠と主張の適切な関係性
-   - 論点の飛躍や矛盾の有無
-
-4. 表現（20点満点）:
-   - 文体統一と表現の適切性
-   - 語彙の豊富さと専門用語の使用
-   - 文の長さと読みやすさ
-   - 誤字脱字や文法の正確性
-
-【厳しい評価要求】
-- 平均的な受験生なら50-60点が標準
-- 80点以上は上位10%レベル
-- 90点以上は最優秀レベル
-- 具体的な改善点を「〜である」を「〜に変更すべきである」の形で指摘
-- 実際の文章例を引用して問題点を指摘
-- {university}{faculty}の入試レベルに特化した評価
-- 文章の具体的な箇所を特定して改善指導
-
-【出力形式】
-以下のJSON形式で厳格に出力してください：
-{{
-  "structure_score": 数値(0-25),
-  "content_score": 数値(0-30),
-  "logic_score": 数値(0-25),
-  "expression_score": 数値(0-20),
-  "structure_evaluation": "構成の具体的問題点と改善策。序論・本論・結論の各段落を個別に分析し、段落内の論理展開、段落間の接続、全体的な流れを300字以上で詳述。",
-  "content_evaluation": "内容の深度、具体例の適切性、{faculty}の専門性との関連、独創性、現実性を具体的に分析。不足している具体例、データ、専門的視点を明示し、どのような内容を追加すべきかを300字以上で詳述。",
-  "logic_evaluation": "論理的一貫性、因果関係の妥当性、反対意見への配慮、根拠と主張の関係性を詳細分析。論理の飛躍箇所、矛盾点、論証の弱い部分を具体的に指摘し、改善方法を300字以上で詳述。",
-  "expression_evaluation": "文体の統一性、語彙の豊富さ、文章の読みやすさ、専門用語の使用、誤字脱字を詳細チェック。文章レベル向上のための具体的修正案を300字以上で詳述。",
-  "detailed_feedback": "{university}{faculty}の入試基準での総合評価。現在のレベル、合格可能性、重点改善項目、学習計画を含む総合的な指導を400字以上で詳述。",
-  "specific_advice": [
-    "序論の構成について：「[実際の文章の具体的箇所]」を「[具体的な改善文例]」に変更し、問題提起をより明確にすべきである",
-    "本論の論証について：「[論理的に弱い箇所]」に「[具体的なデータや事例]」を追加して説得力を強化すべきである",
-    "結論の提案について：「[抽象的な表現]」を「[具体的で実現可能な提案]」に変更して実践性を高めるべきである",
-    "全体の表現について：「[不適切な表現例]」を「[より適切な学術的表現]」に統一すべきである",
-    "{faculty}の専門性について：「[専門性が不足している箇所]」に「[具体的な専門的視点や知識]」を加えて学部適合性を高めるべきである",
-    "文字数と構成について：現在[実際の文字数]字だが、[具体的な増減指示]して全体のバランスを改善すべきである"
-  ]
-}}
-"""
-        
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=2500,
-            temperature=0.2,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
+        parser = IncrementalJSONParser()
         
-        import json
-        result = json.loads(response.content[0].text)
+        def notify_sections(delta: str):
+            if on_section is not None:
+                for key, value in parser.feed(delta):
+                    on_section(key, value)
         
-        # 総合点数を計算
-        total_score = result["structure_score"] + result["content_score"] + result["logic_score"] + result["expression_score"]
+        response_text = stream_message(
+            client,
+            on_delta=notify_sections,
+            progress=progress,
+            **scoring_request(content, theme, university, faculty)
+        )
         
-        return {
-            "total": total_score,
-            "structure": {"score": result["structure_score"], "evaluation": result["structure_evaluation"]},
-            "content": {"score": result["content_score"], "evaluation": result["content_evaluation"]},
-            "logic": {"score": result["logic_score"], "evaluation": result["logic_evaluation"]},
-            "expression": {"score": result["expression_score"], "evaluation": result["expression_evaluation"]},
-            "detailed_feedback": result["detailed_feedback"],
-            "specific_advice": result["specific_advice"]
-        }
+        report_stage(progress, "parse")
+        fields = parse_fields(response_text)
+        missing = missing_fields(fields)
+        if missing:
+            # 出力が途中で切れるなどして不足した項目だけを再生成する（答案までの入力はキャッシュから読み込まれる）
+            message = client.messages.create(
+                **missing_fields_request(content, theme, university, faculty, missing)
+            )
+            supplement = parse_fields(response_json(message))
+            for key in missing:
+                if key in supplement:
+                    fields[key] = supplement[key]
+                    if on_section is not None:
+                        on_section(key, supplement[key])
+        score = ScoringResult.from_fields(fields).to_display()
+        cache.put(cache_key, score)
+        return score
     
     except Exception as e:
         st.error(f"AI採点エラー: {e}")
         # フォールバック（元のロジック）
         return fallback_score_essay(content, theme)
 
-def api_generate_model_answer(theme: str, university: str, faculty: str) -> str:
-    """Claude APIを使用した模範解答生成"""
+def api_generate_model_answer(theme: str, university: str, faculty: str, on_text=None) -> str:
+    """Claude APIを使用した模範解答生成（on_text を渡すと生成途中の本文を逐次通知）
+
+    生成済みの模範解答はストアから即座に返し、新たに生成したものはストアに保存する。
+    """
+    store = get_model_answer_store()
+    stored_answer = store.get(theme, university, faculty, MODEL_ANSWER_PROMPT_VERSION)
+    if stored_answer is not None:
+        return stored_answer
+    
     try:
         client = get_claude_client()
         
-        prompt = f"""
-あなたは{university}{faculty}の入試対策専門講師です。以下の小論文テーマに対する模範解答を作成してください。
-
-【テーマ】
-{theme}
-
-【要求事項】
-1. {faculty}の専門性を活かした内容
-2. 大学入試で高評価を得るレベル
-3. 800-1000文字程度
-4. 序論・本論・結論の明確な構成
-5. 具体例やデータの適切な活用
-6. 論理的で説得力のある論述
-7. 反対意見への配慮も含める
-
-【注意点】
-- 「である調」で統一
-- 専門用語は適切に使用
-- 現実的で実現可能な提案を含める
-- 読み手を意識した表現
-
-模範解答のみを出力してください。解説は不要です。
-"""
-        
-        response = client.messages.create(
-            model="claude-3-haiku-20240307",
-            max_tokens=1500,
-            temperature=0.7,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+        response_text = stream_message(
+            client,
+            on_text=on_text,
+            **model_answer_request(theme, university, faculty)
         )
         
-        return response.content[0].text.strip()
+        model_answer = response_text.strip()
+        store.put(theme, university, faculty, MODEL_ANSWER_PROMPT_VERSION, model_answer)
+        return model_answer
     
     except Exception as e:
         st.error(f"模範解答生成エラー: {e}")
         return "申し訳ありません。模範解答の生成に失敗しました。APIの設定を確認してください。"
 
 # フォールバック関数（API失敗時用）
-def fallback_generate_question(past_questions: List[PastQuestion], university: str, faculty: str, department: str) -> str:
-    """API失敗時のフォールバック問題生成"""
-    trends = ['デジタル変革', 'AI技術', '持続可能性', 'グローバル化', '多様性']
-    contexts = ['社会', '経済', '政治', '教育', '文化']
-    
-    trend = random.choice(trends)
-    context = random.choice(contexts)
-    
-    return f"{trend}が進む現代において、{context}分野での課題と解決策について、{faculty}の観点から論じなさい。"
-
 def fallback_score_essay(content: str, theme: str) -> dict:
     """API失敗時のフォールバック採点"""
     word_count = len(content.replace(' ', '').replace('\n', ''))
@@ -437,7 +232,8 @@ def fallback_score_essay(content: str, theme: str) -> dict:
         "logic": {"score": logic_score, "evaluation": "APIが利用できないため簡易評価を実施"},
         "expression": {"score": expression_score, "evaluation": "APIが利用できないため簡易評価を実施"},
         "detailed_feedback": "APIが利用できないため、詳細評価は行えませんでした。",
-        "specific_advice": ["Claude APIキーを設定してください", "より詳細な評価を受けるにはAPI機能を有効にしてください"]
+        "specific_advice": ["Claude APIキーを設定してください", "より詳細な評価を受けるにはAPI機能を有効にしてください"],
+        "fallback": True
     }
 
 # 小論文書き方ガイド関数
@@ -540,34 +336,22 @@ def show_essay_writing_guide():
         - 入学後の学習計画との関連性
         """)
 
-# 大学検索機能
-def search_universities(query: str, universities: List[University]) -> List[University]:
-    """大学検索機能"""
-    if not query:
-        return universities
-    
-    query_lower = query.lower()
-    filtered = []
-    
-    for uni in universities:
-        if query_lower in uni.name.lower():
-            filtered.append(uni)
-            continue
-        
-        for faculty in uni.faculties:
-            if query_lower in faculty.name.lower():
-                filtered.append(uni)
-                break
-        
-        for faculty in uni.faculties:
-            for dept in faculty.departments:
-                if query_lower in dept.name.lower():
-                    filtered.append(uni)
-                    break
-            if uni in filtered:
-                break
-    
-    return filtered
+def show_score_section_preview(container, key: str, value):
+    """受信途中の採点結果を項目ごとに表示"""
+    section_labels = {
+        "structure": ("📋 構成", 25),
+        "content": ("💡 内容", 30),
+        "logic": ("🔗 論理性", 25),
+        "expression": ("✏️ 表現", 20)
+    }
+    section, _, field = key.partition("_")
+    if section in section_labels and field == "score":
+        label, max_val = section_labels[section]
+        container.markdown(f"**{label}**: {value}/{max_val}点")
+    elif section in section_labels and field == "evaluation":
+        container.caption(value)
+    elif key == "detailed_feedback":
+        container.info(value)
 
 # メイン関数
 def main():
@@ -624,6 +408,11 @@ def main():
         st.session_state.model_answer = None
     if 'show_writing_guide' not in st.session_state:
         st.session_state.show_writing_guide = False
+    if 'student_name' not in st.session_state:
+        # 練習履歴の保存先（再読み込みしても同じ履歴を表示できるよう URL に残す）
+        st.session_state.student_name = st.query_params.get("student", "")
+    if 'time_spent' not in st.session_state:
+        st.session_state.time_spent = None
     
     # サイドバー
     with st.sidebar:
@@ -639,6 +428,21 @@ def main():
             st.session_state.show_writing_guide = not st.session_state.show_writing_guide
             st.rerun()
         
+        # 練習履歴
+        st.markdown("### 📈 練習履歴")
+        student_name = st.text_input("👤 学習者名", value=st.session_state.student_name,
+                                     placeholder="名前を入力すると履歴を保存", key="student_name_input").strip()
+        if student_name != st.session_state.student_name:
+            st.session_state.student_name = student_name
+            if student_name:
+                st.query_params["student"] = student_name
+            else:
+                st.query_params.pop("student", None)
+        if st.button("📈 練習履歴・成績", key="practice_history_btn", disabled=not student_name):
+            st.session_state.show_writing_guide = False
+            st.session_state.page = 'history'
+            st.rerun()
+        
         st.markdown("---")
         st.markdown("### 🤖 AI機能状態")
         
@@ -658,6 +462,8 @@ def main():
             st.info("✍️ Claude小論文練習中")
         elif st.session_state.page == 'result':
             st.info("📈 Claude詳細評価表示中")
+        elif st.session_state.page == 'history':
+            st.info("📈 練習履歴表示中")
         
         # 検索履歴の表示
         if st.session_state.search_history:
@@ -676,6 +482,8 @@ def main():
         show_api_essay_editor()
     elif st.session_state.page == 'result':
         show_api_results()
+    elif st.session_state.page == 'history':
+        show_practice_history()
 
 def reset_all_state():
     """全セッション状態をリセット"""
@@ -689,6 +497,33 @@ def reset_all_state():
     st.session_state.timer_started = False
     st.session_state.start_time = None
     st.session_state.model_answer = None
+    st.session_state.pop('model_answer_prefetch', None)
+
+def current_department_key() -> tuple:
+    """選択中の大学・学部・学科を表すキー（先読み結果の照合に使用）"""
+    return (
+        st.session_state.selected_university.name,
+        st.session_state.selected_faculty.name,
+        st.session_state.selected_department.name
+    )
+
+def department_question_generator() -> Callable[..., str]:
+    """選択中の学科の予想問題を生成する関数（作り置きの補充にも使用）"""
+    return partial(
+        api_generate_question,
+        st.session_state.selected_department.past_questions,
+        st.session_state.selected_university.name,
+        st.session_state.selected_faculty.name,
+        st.session_state.selected_department.name
+    )
+
+def next_predicted_question(on_text=None) -> str:
+    """作り置きの予想問題を取り出す（作り置きがなければその場で生成し、補充はバックグラウンドで行う）"""
+    generate = department_question_generator()
+    question = get_question_pool().take(current_department_key(), generate)
+    if question is None:
+        question = generate(on_text=on_text)
+    return question
 
 def show_api_university_selection():
     """API対応大学選択画面"""
@@ -747,6 +582,8 @@ def show_api_university_selection():
                 # 学科が選択された場合（自動 or 手動）
                 if st.session_state.selected_department:
                     selected_department = st.session_state.selected_department
+                    # 練習開始までに予想問題の作り置きを始めておく
+                    get_question_pool().fill(current_department_key(), department_question_generator())
                     
                     # 選択完了表示
                     st.success(f"✅ 選択完了: {selected_university.name} {selected_faculty.name} {selected_department.name}")
@@ -789,31 +626,21 @@ def show_api_university_selection():
                     if auto_selected:
                         st.info("🚀 選択肢が1つのため、自動的にClaude予想問題を生成します...")
                         if st.button("📝 小論文練習を開始", type="primary", key="auto_start_btn"):
+                            question_preview = st.empty()
                             with st.spinner("🧠 Claudeが過去問題を分析して予想問題を生成中..."):
-                                ai_question = api_generate_question(
-                                    selected_department.past_questions,
-                                    selected_university.name,
-                                    selected_faculty.name,
-                                    selected_department.name
-                                )
+                                ai_question = next_predicted_question(on_text=question_preview.info)
                                 st.session_state.current_question = ai_question
                                 st.session_state.page = 'writing'
-                                st.success("✨ Claude予想問題を生成しました！")
-                                time.sleep(1)
+                                st.toast("✨ Claude予想問題を生成しました！")
                                 st.rerun()
                     else:
                         if st.button("🚀 Claude予想問題で練習開始", type="primary", key="claude_start_btn"):
+                            question_preview = st.empty()
                             with st.spinner("🧠 Claudeが過去問題を分析して予想問題を生成中..."):
-                                ai_question = api_generate_question(
-                                    selected_department.past_questions,
-                                    selected_university.name,
-                                    selected_faculty.name,
-                                    selected_department.name
-                                )
+                                ai_question = next_predicted_question(on_text=question_preview.info)
                                 st.session_state.current_question = ai_question
                                 st.session_state.page = 'writing'
-                                st.success("✨ Claude予想問題を生成しました！")
-                                time.sleep(1)
+                                st.toast("✨ Claude予想問題を生成しました！")
                                 st.rerun()
         else:
             st.warning(f"⚠️ {selected_university.name}にはAO入試対応学部がありません")
@@ -829,7 +656,7 @@ def show_api_university_selection():
                     st.markdown(f"　🏛️ {faculty.name} ({ao_dept_count}学科)")
                     for dept in faculty.departments:
                         if dept.has_ao:
-                            st.markdown(f"　　🎓 {dept.name} - 過去問題{len(dept.past_questions)}件")
+                            st.markdown(f"　　🎓 {dept.name} - 過去問題{dept.question_count}件")
 
 def show_api_essay_editor():
     """Claude対応小論文エディター"""
@@ -849,15 +676,12 @@ def show_api_essay_editor():
     
     with col2:
         if st.button("🔄 新しいClaude予想問題", key="new_claude_question"):
+            # 作り置きの予想問題があれば即座に使う
+            question_preview = st.empty()
             with st.spinner("🤖 Claudeが新しい予想問題を生成中..."):
-                new_question = api_generate_question(
-                    st.session_state.selected_department.past_questions,
-                    st.session_state.selected_university.name,
-                    st.session_state.selected_faculty.name,
-                    st.session_state.selected_department.name
-                )
-                st.session_state.current_question = new_question
-                st.rerun()
+                new_question = next_predicted_question(on_text=question_preview.info)
+            st.session_state.current_question = new_question
+            st.rerun()
     
     # 出題条件表示
     if st.session_state.selected_department and st.session_state.selected_department.past_questions:
@@ -991,6 +815,7 @@ def show_api_essay_editor():
     with col1:
         if st.button("🤖 Claude詳細評価で提出", type="primary", disabled=not can_submit, key="claude_submit_btn"):
             st.session_state.essay_content = essay_content
+            st.session_state.time_spent = time.time() - st.session_state.start_time if st.session_state.start_time else None
             st.session_state.page = 'result'
             st.rerun()
     
@@ -1009,27 +834,70 @@ def show_api_essay_editor():
             reset_all_state()
             st.rerun()
 
+def record_attempt(score: dict):
+    """採点結果を練習履歴に記録（学習者名が未入力・簡易評価の場合は記録しない）"""
+    if not st.session_state.student_name or score.get("fallback"):
+        return
+    get_practice_history().record(
+        st.session_state.student_name,
+        st.session_state.selected_university.name,
+        st.session_state.selected_faculty.name,
+        st.session_state.selected_department.name,
+        st.session_state.current_question,
+        st.session_state.essay_content,
+        score,
+        time_spent=st.session_state.time_spent
+    )
+
 def show_api_results():
     """Claude評価結果画面"""
     st.header("🤖 Claude詳細評価結果")
     
     # Claude採点実行
     if st.session_state.essay_score is None:
+        # 採点（この画面でストリーミング表示）と並行して、模範解答の生成と予想問題の作り置きの補充を開始
+        university_name = st.session_state.selected_university.name
+        faculty_name = st.session_state.selected_faculty.name
+        question_key = (university_name, faculty_name, st.session_state.current_question)
+        if st.session_state.model_answer is None:
+            prefetch(st.session_state, 'model_answer_prefetch', question_key,
+                     api_generate_model_answer, st.session_state.current_question, university_name, faculty_name)
+        get_question_pool().fill(current_department_key(), department_question_generator())
+        
+        progress_bar = st.progress(0.0)
+        progress = ProgressReporter(lambda label, fraction: progress_bar.progress(fraction, text=label))
+        section_preview = st.empty()
+        preview_box = section_preview.container()
         with st.spinner("🧠 Claudeが詳細分析中... 大学入試レベルの厳正な評価を実施しています"):
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.03)
-                progress_bar.progress(i + 1)
-            
             st.session_state.essay_score = api_score_essay(
                 st.session_state.essay_content, 
                 st.session_state.current_question,
                 st.session_state.selected_university.name,
-                st.session_state.selected_faculty.name
+                st.session_state.selected_faculty.name,
+                on_section=lambda key, value: show_score_section_preview(preview_box, key, value),
+                progress=progress
+            )
+        if st.session_state.model_answer is None:
+            st.session_state.model_answer = take_prefetched(st.session_state, 'model_answer_prefetch', question_key)
+        record_attempt(st.session_state.essay_score)
+        # 偏差値・合格可能性は学科の得点分布から求める（簡易評価は分布に加えず、同じ答案は一度だけ加える）
+        distributions = get_score_distributions()
+        department_name = st.session_state.selected_department.name
+        total = st.session_state.essay_score['total']
+        if st.session_state.essay_score.get("fallback"):
+            st.session_state.score_standing = distributions.standing(university_name, faculty_name, department_name, total)
+        else:
+            st.session_state.score_standing = distributions.observe(
+                university_name, faculty_name, department_name, total,
+                attempt_key(st.session_state.essay_content, st.session_state.current_question,
+                            university_name, faculty_name, department_name)
             )
-            progress_bar.empty()
+        progress.stage("render")
+        section_preview.empty()
+        progress_bar.empty()
     
     score = st.session_state.essay_score
+    standing = st.session_state.score_standing
     
     # 総合評価ヘッダー
     col1, col2, col3 = st.columns([2, 1, 1])
@@ -1053,21 +921,11 @@ def show_api_results():
         st.markdown(f"<h1 style='color: {color}'>評価: {grade}（{comment}）</h1>", unsafe_allow_html=True)
     
     with col2:
-        # 推定偏差値
-        estimated_rank = min(80, max(20, score['total'] - 20))
-        st.metric("📈 推定偏差値", f"{estimated_rank}")
-        
-        # 合格可能性
-        if score['total'] >= 85:
-            pass_rate = "95%以上"
-        elif score['total'] >= 75:
-            pass_rate = "85-90%"
-        elif score['total'] >= 65:
-            pass_rate = "70-80%"
-        else:
-            pass_rate = "60%以下"
-        
-        st.metric("🎯 合格可能性", pass_rate)
+        # 偏差値・合格可能性（同じ学科の答案の得点分布から算出）
+        standing_display = standing.to_display()
+        st.metric("📈 偏差値", f"{standing_display['偏差値']}")
+        st.metric("🎯 合格可能性", standing_display['合格可能性'])
+        st.caption(f"{standing_display['順位']}（同じ学科の{standing.cohort_size}件の答案と比較）")
     
     with col3:
         st.metric("🤖 評価AI", "Claude")
@@ -1125,11 +983,13 @@ def show_api_results():
     # Claude模範解答生成
     if st.session_state.model_answer is None:
         if st.button("📖 Claude模範解答を生成", key="generate_model"):
+            model_answer_preview = st.empty()
             with st.spinner("🤖 Claudeが模範解答を生成中..."):
                 model_answer = api_generate_model_answer(
                     st.session_state.current_question,
                     st.session_state.selected_university.name,
-                    st.session_state.selected_faculty.name
+                    st.session_state.selected_faculty.name,
+                    on_text=model_answer_preview.markdown
                 )
                 st.session_state.model_answer = model_answer
                 st.rerun()
@@ -1163,21 +1023,18 @@ def show_api_results():
     
     with col2:
         if st.button("🤖 新しいClaude予想問題", key="new_claude_question_result"):
+            # 作り置きの予想問題があれば即座に使う
+            question_preview = st.empty()
             with st.spinner("🧠 新しい予想問題を生成中..."):
-                new_question = api_generate_question(
-                    st.session_state.selected_department.past_questions,
-                    st.session_state.selected_university.name,
-                    st.session_state.selected_faculty.name,
-                    st.session_state.selected_department.name
-                )
-                st.session_state.current_question = new_question
-                st.session_state.page = 'writing'
-                st.session_state.essay_content = ""
-                st.session_state.essay_score = None
-                st.session_state.model_answer = None
-                st.session_state.timer_started = False
-                st.session_state.start_time = None
-                st.rerun()
+                new_question = next_predicted_question(on_text=question_preview.info)
+            st.session_state.current_question = new_question
+            st.session_state.page = 'writing'
+            st.session_state.essay_content = ""
+            st.session_state.essay_score = None
+            st.session_state.model_answer = None
+            st.session_state.timer_started = False
+            st.session_state.start_time = None
+            st.rerun()
     
     with col3:
         if st.button("🏛️ 別の大学で練習", key="change_university"):
@@ -1226,5 +1083,72 @@ Claude小論文評価結果
                 mime="text/plain"
             )
 
+AXIS_LABELS = {"structure": "📋 構成", "content": "💡 内容", "logic": "🔗 論理性", "expression": "✏️ 表現"}
+
+def show_practice_history():
+    """練習履歴・成績画面（集計は記録のたびに更新済みの集計表から読む）"""
+    st.header("📈 練習履歴・成績")
+    student = st.session_state.student_name
+    history = get_practice_history()
+    summary = history.summary(student)
+    if summary is None:
+        st.info(f"👤 {student} さんの練習履歴はまだありません。Claude詳細評価で提出すると記録されます。")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📝 練習回数", f"{summary.attempts}回")
+    with col2:
+        st.metric("📊 平均点", f"{summary.average_total:.1f}/100点")
+    with col3:
+        st.metric("🏆 最高点", f"{summary.best_total}/100点")
+
+    # 観点別の平均点
+    st.markdown("### 📊 観点別の平均点")
+    columns = st.columns(len(AXES))
+    for column, axis in zip(columns, AXES):
+        with column:
+            average = summary.averages[axis]
+            st.metric(AXIS_LABELS[axis], f"{average:.1f}/{AXIS_LIMITS[axis]}")
+            st.progress(min(average / AXIS_LIMITS[axis], 1.0))
+
+    # 週ごとの推移（直近1年）
+    trend = history.weekly_trend(student)
+    if len(trend) >= 2:
+        st.markdown("### 📈 週ごとの平均点の推移")
+        chart = pd.DataFrame(
+            {"総合": [week.average_total for week in trend],
+             **{AXIS_LABELS[axis]: [week.averages[axis] for week in trend] for axis in AXES}},
+            index=pd.to_datetime([week.week for week in trend])
+        )
+        st.line_chart(chart)
+
+    # 学科別の成績
+    st.markdown("### 🏛️ 学科別の成績")
+    st.dataframe(
+        pd.DataFrame([
+            {"大学": university, "学部": faculty, "学科": department, "回数": stats.attempts,
+             "平均点": round(stats.average_total, 1), "最高点": stats.best_total,
+             "最終練習日": datetime.fromtimestamp(stats.last_at).strftime('%Y/%m/%d')}
+            for (university, faculty, department), stats in history.department_summaries(student)
+        ]),
+        hide_index=True
+    )
+
+    # 最近の練習
+    st.markdown("### 🕒 最近の練習")
+    for attempt in history.recent_attempts(student, limit=10):
+        practiced_at = datetime.fromtimestamp(attempt.created_at).strftime('%Y/%m/%d %H:%M')
+        with st.expander(f"{practiced_at}  {attempt.university} {attempt.department} - {attempt.total}点"):
+            st.markdown("#### 🎯 出題テーマ")
+            st.write(attempt.question)
+            scores = " / ".join(f"{AXIS_LABELS[axis]} {attempt.scores[axis]}/{AXIS_LIMITS[axis]}" for axis in AXES)
+            st.markdown(f"**{scores}**")
+            if attempt.time_spent is not None:
+                st.caption(f"⏱️ 所要時間 {int(attempt.time_spent // 60)}分{int(attempt.time_spent % 60):02d}秒")
+            st.info(attempt.feedback.get("detailed_feedback", ""))
+            st.text_area("解答", value=attempt.essay, height=150, disabled=True,
+                         key=f"history_essay_{attempt.id}", label_visibility="collapsed")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
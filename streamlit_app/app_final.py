@@ -2,10 +2,19 @@ import streamlit as st
 import time
 import random
 import re
+import os
+import sys
 from datetime import datetime
-from dataclasses import dataclass
 from typing import List, Optional
 
+# パスを追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data.models import PastQuestion
+from data.universities import get_universities
+from utils.exam_timer import exam_timer
+from utils.timed_exam import TimedExam
+
 # ページ設定
 st.set_page_config(
     page_title="総合選抜型入試 小論文対策アプリ（2026年度入試対応）",
@@ -13,233 +22,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 大学データ
-@st.cache_resource
-def get_universities():
-    return [
-        University(
-            id='dokkyo',
-            name='獨協大学',
-            faculties=[
-                Faculty(
-                    id='foreign-languages',
-                    name='外国語学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='exchange-culture',
-                            name='交流文化学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='dokkyo-culture-2025',
-                                    year=2025,
-                                    theme='【長文読解型】TikTokの影響力と情報発信について論じた文章を読み、「TikTokアプリを禁止すべき」との主張についてのあなたの考えを、本文の議論をふまえて述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2024',
-                                    year=2024,
-                                    theme='【長文読解型】Twitter買収・デジタル時代の公共性について論じた文章を読み、「オンライン上の言論空間はどのようなものであるべきでしょうか」について、本文の議論をふまえたあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                ),
-                                PastQuestion(
-                                    id='dokkyo-culture-2023',
-                                    year=2023,
-                                    theme='【長文読解型】「利他」について論じた文章を読み、問1（短答式9字抜き出し）、問2「あなたは利他についてどのように考えますか」筆者の考えを参考にしてあなたの考えを述べなさい。（601字以上800字以内）',
-                                    time_limit=90,
-                                    university='獨協大学',
-                                    faculty='外国語学部',
-                                    department='交流文化学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='showa-women',
-            name='昭和女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='showa-international-2023',
-                                    year=2023,
-                                    theme='女性のグローバルリーダーシップについて、現代社会の課題と関連づけて論じなさい。',
-                                    time_limit=90,
-                                    university='昭和女子大学',
-                                    faculty='国際学部',
-                                    department='国際教養学科'
-                                ),
-                                PastQuestion(
-                                    id='showa-international-2022',
-                                    year=2022,
-                                    theme='持続可能な国際協力の在り方について述べなさい。',
-                                    time_limit=90,
-                                    university='昭和女子大学',
-                                    faculty='国際学部',
-                                    department='国際教養学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='jissen-women',
-            name='実践女子大学',
-            faculties=[
-                Faculty(
-                    id='international',
-                    name='国際学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='international-studies',
-                            name='国際学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='jissen-international-2023',
-                                    year=2023,
-                                    theme='実践的な国際協力の在り方について、具体的な事例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='実践女子大学',
-                                    faculty='国際学部',
-                                    department='国際学科'
-                                ),
-                                PastQuestion(
-                                    id='jissen-international-2022',
-                                    year=2022,
-                                    theme='女性の国際的な活躍と社会貢献について述べなさい。',
-                                    time_limit=90,
-                                    university='実践女子大学',
-                                    faculty='国際学部',
-                                    department='国際学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='waseda-new',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='sport-science',
-                    name='スポーツ科学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-science',
-                            name='スポーツ科学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-sport-2023',
-                                    year=2023,
-                                    theme='スポーツが社会に果たす役割について、現代社会の課題と関連づけて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='スポーツ科学部',
-                                    department='スポーツ科学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-sport-2022',
-                                    year=2022,
-                                    theme='デジタル技術の発展がスポーツに与える影響と可能性について述べなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='スポーツ科学部',
-                                    department='スポーツ科学科'
-                                )
-                            ]
-                        )
-                    ]
-                ),
-            ]
-        ),
-        University(
-            id='rikkyo',
-            name='立教大学',
-            faculties=[
-                Faculty(
-                    id='sport-wellness',
-                    name='スポーツウェルネス学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='sport-wellness',
-                            name='スポーツウェルネス学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='rikkyo-wellness-2025',
-                                    year=2025,
-                                    theme='【長文読解型】エスノメソドロジーについて論じた文章を読み、問1「エスノメソドロジー」について文章の論旨に沿ってまとめなさい（200字前後）、問2「エスノメソドロジー」の見方を異文化コミュニケーション研究でも適用できるかを考察し述べなさい（800字前後）',
-                                    time_limit=90,
-                                    university='立教大学',
-                                    faculty='スポーツウェルネス学部',
-                                    department='スポーツウェルネス学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
-
 # AI評価シミュレーション（基本版）
 def simulate_ai_evaluation(content: str, theme: str, university: str, faculty: str) -> dict:
     """AI風の詳細評価を生成（基本版）"""
@@ -531,6 +313,7 @@ def reset_all_state():
     st.session_state.essay_score = None
     st.session_state.timer_started = False
     st.session_state.start_time = None
+    TimedExam(st.session_state, st.query_params).finish()
 
 def show_university_selection():
     """大学選択画面"""
@@ -654,6 +437,11 @@ def show_essay_editor():
     st.info(st.session_state.current_question)
     st.markdown("**制限時間:** 90分 | **推奨文字数:** 400-800字")
     
+    # 再読み込み・サーバーの再起動で失われた下書きを復元する（確認はセッションごとに1回）
+    exam = TimedExam(st.session_state, st.query_params)
+    if exam.restore_draft(st.session_state.current_question) is not None:
+        st.info("💾 前回の下書きを復元しました。")
+    
     # タイマー管理（簡素化）
     if not st.session_state.timer_started:
         col1, col2 = st.columns(2)
@@ -671,32 +459,19 @@ def show_essay_editor():
                 st.info("タイマーなしで開始しました。")
                 st.rerun()
         
-        st.info("⚠️ Streamlit Cloudではタイマーが正確に動作しない場合があります。「タイマーなしで開始」を推奨します。")
         return
     
-    # タイマー表示（手動更新）
+    # タイマー表示（ブラウザ側で数え、締切に達したときだけ再実行される）
     if st.session_state.start_time:
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            if st.button("🔄 時間を更新", key="update_timer"):
+        time_limit = 90 * 60
+        if exam_timer(st.session_state.start_time + time_limit, time_limit):
+            # 時間切れの場合は自動提出（入力欄の最新の内容を使う）
+            st.session_state.essay_content = st.session_state.get("essay_textarea", st.session_state.essay_content)
+            if st.session_state.essay_content.strip():
+                exam.finish()
+                st.session_state.page = 'result'
                 st.rerun()
-        
-        with col2:
-            elapsed_time = time.time() - st.session_state.start_time
-            minutes = int(elapsed_time // 60)
-            seconds = int(elapsed_time % 60)
-            st.metric("経過時間", f"{minutes}:{seconds:02d}")
-        
-        with col3:
-            remaining_time = max(0, 90 * 60 - elapsed_time)
-            if remaining_time > 0:
-                r_minutes = int(remaining_time // 60)
-                r_seconds = int(remaining_time % 60)
-                st.metric("残り時間", f"{r_minutes}:{r_seconds:02d}")
-            else:
-                st.metric("残り時間", "終了")
-                st.warning("⏰ 制限時間が終了しました！")
+            st.warning("⏰ 制限時間が終了しました！内容が入力されていません。")
     else:
         st.info("⏱️ タイマーなしモードで練習中")
     
@@ -724,6 +499,7 @@ def show_essay_editor():
     
     # 内容を保存
     st.session_state.essay_content = essay_content
+    exam.update(essay_content, st.session_state.current_question)
     
     # 提出条件の表示
     min_chars = 50
@@ -739,6 +515,7 @@ def show_essay_editor():
     with col1:
         if st.button("📤 提出する", type="primary", disabled=not can_submit, key="submit_btn"):
             st.session_state.essay_content = essay_content  # 最新の内容を保存
+            exam.finish()
             st.session_state.page = 'result'
             st.rerun()
     
@@ -770,18 +547,12 @@ def show_results():
     # AI採点実行
     if st.session_state.essay_score is None:
         with st.spinner("🤖 AI分析中... 詳細な評価とアドバイスを生成しています"):
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.02)
-                progress_bar.progress(i + 1)
-            
             st.session_state.essay_score = score_essay(
                 st.session_state.essay_content,
                 st.session_state.current_question,
                 st.session_state.selected_university.name if st.session_state.selected_university else "",
                 st.session_state.selected_faculty.name if st.session_state.selected_faculty else ""
             )
-            progress_bar.empty()
     
     score = st.session_state.essay_score
     
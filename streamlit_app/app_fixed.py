@@ -2,10 +2,17 @@ import streamlit as st
 import time
 import random
 import re
+import os
+import sys
 from datetime import datetime
-from dataclasses import dataclass
 from typing import List, Optional
 
+# パスを追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from data.models import PastQuestion
+from data.universities import get_universities
+
 # ページ設定
 st.set_page_config(
     page_title="総合選抜型入試 小論文対策アプリ",
@@ -13,139 +20,6 @@ st.set_page_config(
     layout="wide"
 )
 
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
-
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
-
-# 大学データ（固定データ）
-@st.cache_data
-def get_universities():
-    return [
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='political-science',
-                    name='政治経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='politics',
-                            name='政治学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-pol-2023',
-                                    year=2023,
-                                    theme='デジタル社会における民主主義の課題と可能性について、具体例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2022',
-                                    year=2022,
-                                    theme='グローバル化が進む現代において、国家の役割はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='keio',
-            name='慶應義塾大学',
-            faculties=[
-                Faculty(
-                    id='economics',
-                    name='経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='keio-econ-2023',
-                                    year=2023,
-                                    theme='デジタル化が進む現代において、経済活動はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='慶應義塾大学',
-                                    faculty='経済学部',
-                                    department='経済学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='todai',
-            name='東京大学',
-            faculties=[
-                Faculty(
-                    id='liberal-arts',
-                    name='教養学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='liberal-arts',
-                            name='教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='todai-liberal-2023',
-                                    year=2023,
-                                    theme='多様性と包摂性が求められる現代社会において、教育の果たすべき役割について論じなさい。',
-                                    time_limit=120,
-                                    university='東京大学',
-                                    faculty='教養学部',
-                                    department='教養学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
-
 # 採点機能
 def score_essay(content: str) -> dict:
     """簡略化された採点機能"""
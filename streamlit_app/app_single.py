@@ -1,42 +1,24 @@
 import streamlit as st
 import time
-import random
 import re
+import os
+import sys
 from datetime import datetime
 from dataclasses import dataclass
+from functools import partial
 from typing import List, Optional
 
-# データクラス定義
-@dataclass
-class PastQuestion:
-    id: str
-    year: int
-    theme: str
-    time_limit: int  # minutes
-    university: str
-    faculty: str
-    department: str
-
-@dataclass
-class Department:
-    id: str
-    name: str
-    has_ao: bool
-    past_questions: List[PastQuestion]
+# パスを追加
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-@dataclass
-class Faculty:
-    id: str
-    name: str
-    departments: List[Department]
-    has_ao: bool
-
-@dataclass
-class University:
-    id: str
-    name: str
-    faculties: List[Faculty]
+from data.models import PastQuestion
+from data.universities import get_universities
+from utils.exam_timer import exam_timer
+from utils.timed_exam import TimedExam
+from utils.question_predictor import predict_question
+from utils.repetition import MAX_ESSAY_CHARS, find_repeated_spans
 
+# データクラス定義
 @dataclass
 class PredictedQuestion:
     id: str
@@ -73,173 +55,6 @@ class WritingGuide:
     content: str
     category: str  # 'structure', 'content', 'expression', 'examples'
 
-# 大学データ
-def get_universities():
-    return [
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='political-science',
-                    name='政治経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='politics',
-                            name='政治学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-pol-2023',
-                                    year=2023,
-                                    theme='デジタル社会における民主主義の課題と可能性について、具体例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2022',
-                                    year=2022,
-                                    theme='グローバル化が進む現代において、国家の役割はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2021',
-                                    year=2021,
-                                    theme='コロナ禍を通じて見えた現代社会の課題と、その解決策について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2020',
-                                    year=2020,
-                                    theme='持続可能な社会の実現に向けて、政治が果たすべき役割について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2019',
-                                    year=2019,
-                                    theme='人工知能の発達が社会に与える影響と、それに対する政策の在り方について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                )
-                            ]
-                        ),
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-econ-2023',
-                                    year=2023,
-                                    theme='日本経済の持続的成長に向けた課題と解決策について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='経済学科'
-                                )
-                            ]
-                        )
-                    ]
-                ),
-                Faculty(
-                    id='law',
-                    name='法学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='law',
-                            name='法学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-law-2023',
-                                    year=2023,
-                                    theme='法の支配と民主主義の関係について、現代社会の具体例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='法学部',
-                                    department='法学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='keio',
-            name='慶應義塾大学',
-            faculties=[
-                Faculty(
-                    id='economics',
-                    name='経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='keio-econ-2023',
-                                    year=2023,
-                                    theme='デジタル化が進む現代において、経済活動はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='慶應義塾大学',
-                                    faculty='経済学部',
-                                    department='経済学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='todai',
-            name='東京大学',
-            faculties=[
-                Faculty(
-                    id='liberal-arts',
-                    name='教養学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='liberal-arts',
-                            name='教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='todai-liberal-2023',
-                                    year=2023,
-                                    theme='多様性と包摂性が求められる現代社会において、教育の果たすべき役割について論じなさい。',
-                                    time_limit=120,
-                                    university='東京大学',
-                                    faculty='教養学部',
-                                    department='教養学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
-
 # 問題予想機能
 def generate_predicted_question(
     past_questions: List[PastQuestion],
@@ -250,58 +65,10 @@ def generate_predicted_question(
     """過去問題データから次年度の予想問題を生成"""
     
     time_limit = past_questions[0].time_limit if past_questions else 90
-    
-    current_trends = [
-        'デジタル化',
-        'AI・人工知能',
-        '持続可能性',
-        'グローバル化',
-        '多様性と包摂',
-        '少子高齢化',
-        '環境問題',
-        '働き方改革',
-        'コロナ後の社会',
-        'イノベーション'
-    ]
-
-    subject_contexts = {
-        '政治': ['民主主義', '政策', '国際関係', '社会制度', '公共政策'],
-        '経済': ['経済成長', '市場', '金融', 'グローバル経済', '産業構造'],
-        '法': ['法の支配', '人権', '司法制度', '国際法', '社会規範'],
-        '文学': ['表現', '文化', 'コミュニケーション', '芸術', '言語'],
-        '教育': ['学習', '人材育成', '教育制度', '知識社会', '生涯学習'],
-        '医学': ['健康', '医療技術', '予防医学', '高齢化', '医療倫理'],
-        '工学': ['技術革新', 'ものづくり', '環境技術', 'インフラ', 'デザイン'],
-        '理学': ['科学技術', '研究', '発見', '自然科学', 'データサイエンス']
-    }
-
-    def get_relevant_contexts(faculty_name: str, department_name: str) -> List[str]:
-        contexts = []
-        
-        for key, values in subject_contexts.items():
-            if key in faculty_name or key in department_name:
-                contexts.extend(values)
-        
-        return contexts if contexts else ['社会', '現代', '課題', '解決策', '将来']
-
-    relevant_contexts = get_relevant_contexts(faculty, department)
-    
-    trend_keyword = random.choice(current_trends)
-    context_keyword = random.choice(relevant_contexts)
-    
-    question_templates = [
-        f"{trend_keyword}が進む現代において、{context_keyword}はどのような課題に直面し、どのような解決策が考えられるか、具体例を挙げて論じなさい。",
-        f"{trend_keyword}の発展が{context_keyword}に与える影響について、メリットとデメリットを比較検討し、今後の在り方を論じなさい。",
-        f"現代社会における{trend_keyword}の重要性を踏まえ、{context_keyword}の分野でどのような革新が必要か、あなたの考えを述べなさい。",
-        f"{trend_keyword}を背景とした社会変化の中で、{context_keyword}が果たすべき役割と課題について論じなさい。",
-        f"{trend_keyword}と{context_keyword}の関係性を分析し、持続可能な社会の実現に向けた提言を行いなさい。"
-    ]
-
-    selected_template = random.choice(question_templates)
 
     return PredictedQuestion(
         id=f"predicted-{int(datetime.now().timestamp())}",
-        theme=selected_template,
+        theme=predict_question(past_questions, university, faculty, department),
         time_limit=time_limit,
         generated_at=datetime.now(),
         based_on_questions=[q.id for q in past_questions],
@@ -394,7 +161,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
 
     # 表現評価
     # 重複表現のチェック
-    repetitive_patterns = re.findall(r'(.{10,})\1', content)
+    repetitive_patterns = find_repeated_spans(content, 10)
     if repetitive_patterns and len(repetitive_patterns) > 2:
         expression_score += 5
         feedback.append('表現に重複が見られます。より多様な表現を心がけてください。')
@@ -570,16 +337,6 @@ st.markdown("""
         border-left: 4px solid #4f46e5;
         margin: 1rem 0;
     }
-    .timer-display {
-        font-size: 2rem;
-        font-weight: bold;
-        color: #dc2626;
-        text-align: center;
-        padding: 1rem;
-        background-color: #fef2f2;
-        border-radius: 8px;
-        border: 2px solid #fecaca;
-    }
 </style>
 """, unsafe_allow_html=True)
 
@@ -613,6 +370,7 @@ def reset_state():
     st.session_state.essay_content = ""
     st.session_state.start_time = None
     st.session_state.essay_score = None
+    TimedExam(st.session_state, st.query_params).finish()
 
 def main():
     st.title("📝 総合選抜型入試 小論文対策アプリ")
@@ -748,47 +506,62 @@ def show_essay_editor():
     st.markdown(f"**制限時間:** {question.time_limit}分 | **推奨文字数:** 800-1200字")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    exam = TimedExam(st.session_state, st.query_params)
+    
+    # 締切時にサーバー側で自動提出済み（タブを操作していなかった場合も含む）なら結果画面へ
+    auto_submitted = exam.take_auto_submitted()
+    if auto_submitted is not None:
+        draft, future = auto_submitted
+        if draft.strip():
+            st.session_state.essay_content = draft
+            st.session_state.essay_score = future.result()
+            st.session_state.current_state = 'result'
+            st.rerun()
+    
+    # 再読み込み・サーバーの再起動で失われた下書きを復元する（確認はセッションごとに1回）
+    if exam.restore_draft(question.theme) is not None:
+        st.info("💾 前回の下書きを復元しました。")
+    saved = exam.saved_draft()
+    if saved is not None and saved.theme != question.theme:
+        # 出題テーマが変わった場合は復元せず、参照できるように表示だけする
+        with st.expander(f"💾 前回の下書き（出題テーマ: {saved.theme}）"):
+            st.text(saved.content)
+    
     # タイマー開始
     if st.session_state.start_time is None:
         if st.button("⏰ タイマーを開始して練習を始める", type="primary"):
             st.session_state.start_time = time.time()
             st.session_state.time_limit = question.time_limit * 60  # 秒に変換
+            # 締切に達したら、ブラウザの操作を待たずにその時点の下書きを採点する
+            exam.start(st.session_state.start_time + st.session_state.time_limit,
+                       partial(score_essay, theme=question.theme), st.session_state.essay_content)
             st.rerun()
         
         st.info("準備ができたら上のボタンを押してタイマーを開始してください。")
         return
     
-    # 経過時間とタイマー表示
-    elapsed_time = time.time() - st.session_state.start_time
-    remaining_time = max(0, st.session_state.time_limit - elapsed_time)
-    
-    col1, col2, col3 = st.columns(3)
+    # 経過時間とタイマー表示（ブラウザ側で数え、締切に達したときだけ再実行される）
+    col1, col2 = st.columns([2, 1])
     
     with col1:
-        st.metric("経過時間", f"{int(elapsed_time // 60)}:{int(elapsed_time % 60):02d}")
+        time_up = exam_timer(st.session_state.start_time + st.session_state.time_limit, st.session_state.time_limit)
     
     with col2:
-        minutes = int(remaining_time // 60)
-        seconds = int(remaining_time % 60)
-        if remaining_time > 0:
-            st.markdown(f'<div class="timer-display">残り {minutes}:{seconds:02d}</div>', unsafe_allow_html=True)
-        else:
-            st.markdown('<div class="timer-display">時間切れ</div>', unsafe_allow_html=True)
-    
-    with col3:
         word_count = len(st.session_state.essay_content.replace(' ', '').replace('\n', ''))
         st.metric("文字数", word_count)
     
     # 小論文入力エリア
-    if remaining_time > 0:
+    if not time_up:
         essay_content = st.text_area(
             "📝 ここに小論文を書いてください",
             value=st.session_state.essay_content,
             height=400,
+            max_chars=MAX_ESSAY_CHARS,
             placeholder="ここに小論文を入力してください...",
             key="essay_input"
         )
         st.session_state.essay_content = essay_content
+        exam.update(essay_content, question.theme)
         
         # 提出ボタン
         col1, col2 = st.columns(2)
@@ -817,6 +590,7 @@ def show_essay_editor():
     else:
         # 時間切れの場合は自動提出
         st.error("⏰ 制限時間が終了しました。自動的に提出されます。")
+        st.session_state.essay_content = st.session_state.get("essay_input", st.session_state.essay_content)
         if st.session_state.essay_content.strip():
             submit_essay()
         else:
@@ -828,6 +602,9 @@ def submit_essay():
         st.error("小論文が入力されていません。")
         return
     
+    # 締切前の提出（または時間切れを画面側で検出した場合）は自動提出を取り消す
+    TimedExam(st.session_state, st.query_params).finish()
+    
     # 採点実行
     score = score_essay(st.session_state.essay_content, st.session_state.current_question.theme)
     st.session_state.essay_score = score
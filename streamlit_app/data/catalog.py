@@ -0,0 +1,104 @@
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from sys import intern
+from typing import Dict, Optional, Tuple
+
+from .models import Department, Faculty, PastQuestion, University
+
+# 大学・学部・学科の索引データ（環境変数で差し替え可能）
+CATALOG_PATH = os.getenv(
+    "SHORONBUN_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+)
+# 過去問は索引と同じ場所の past_questions/大学ID/学部ID/学科ID.json に学科ごとに置く
+PAST_QUESTIONS_DIRNAME = "past_questions"
+# 読み込んだ過去問を保持する学科数（全アプリ・全セッションで共有）
+PAST_QUESTION_CACHE_SIZE = int(os.getenv("SHORONBUN_PAST_QUESTION_CACHE_SIZE", "256"))
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """読み込み済みの大学データ（プロセス内で1つだけ作成し、全アプリで共有する）"""
+    version: str
+    universities: Tuple[University, ...]
+    _by_id: Dict[str, University]
+
+    def get_university(self, university_id: str) -> Optional[University]:
+        return self._by_id.get(university_id)
+
+
+@lru_cache(maxsize=PAST_QUESTION_CACHE_SIZE)
+def load_past_questions(path: str, university: str, faculty: str, department: str) -> Tuple[PastQuestion, ...]:
+    """学科1つ分の過去問ファイルを読み込む（最近使った学科の分はプロセス内で再利用する）"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return tuple(
+        PastQuestion(
+            id=question["id"],
+            year=question["year"],
+            theme=question["theme"],
+            time_limit=question["time_limit"],
+            university=university,
+            faculty=faculty,
+            department=department
+        )
+        for question in data["past_questions"]
+    )
+
+
+def _build_university(data: dict, past_questions_dir: str) -> University:
+    university_id = intern(data["id"])
+    university_name = intern(data["name"])
+    faculties = []
+    for faculty_data in data["faculties"]:
+        faculty_id = intern(faculty_data["id"])
+        faculty_name = intern(faculty_data["name"])
+        faculty_key = f"{university_id}/{faculty_id}"
+        departments = []
+        for department_data in faculty_data["departments"]:
+            department_id = intern(department_data["id"])
+            department_name = intern(department_data["name"])
+            shard_path = os.path.join(past_questions_dir, university_id, faculty_id, department_id + ".json")
+            departments.append(Department(
+                id=department_id,
+                name=department_name,
+                has_ao=department_data["has_ao"],
+                question_count=department_data["question_count"],
+                kana=intern(department_data.get("kana", "")),
+                key=f"{faculty_key}/{department_id}",
+                _load_past_questions=partial(
+                    load_past_questions, shard_path, university_name, faculty_name, department_name
+                )
+            ))
+        faculties.append(Faculty(
+            id=faculty_id,
+            name=faculty_name,
+            departments=tuple(departments),
+            has_ao=faculty_data["has_ao"],
+            kana=intern(faculty_data.get("kana", "")),
+            aliases=tuple(map(intern, faculty_data.get("aliases", ()))),
+            key=faculty_key
+        ))
+    return University(
+        id=university_id,
+        name=university_name,
+        faculties=tuple(faculties),
+        kana=intern(data.get("kana", "")),
+        aliases=tuple(map(intern, data.get("aliases", ())))
+    )
+
+
+@lru_cache(maxsize=None)
+def load_catalog(path: str = CATALOG_PATH) -> Catalog:
+    """索引ファイルを読み込む（同じファイルはプロセス内で1回だけ読み込む。過去問は参照時に読み込む）"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    past_questions_dir = os.path.join(os.path.dirname(os.path.abspath(path)), PAST_QUESTIONS_DIRNAME)
+    universities = tuple(_build_university(university, past_questions_dir) for university in data["universities"])
+    return Catalog(
+        version=data["version"],
+        universities=universities,
+        _by_id={university.id: university for university in universities}
+    )
@@ -1,9 +1,37 @@
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 from datetime import datetime
 
-@dataclass
-class PastQuestion:
+class _CatalogModel:
+    """大学データのモデルの共通処理
+
+    データは読み込み後に変更しないため凍結し、__slots__ で1件ごとの __dict__ を持たない。
+    比較とハッシュは key（カタログ内で一意）だけで行うため、子要素が多くてもキャッシュのキーに安く使える。
+    key は各モデルがフィールドまたはプロパティとして定義する。
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    # 凍結した __slots__ クラスは標準の pickle 復元（setattr）が使えないため自前で行う
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            object.__setattr__(self, name, value)
+
+
+# 大学・学部・学科名は sys.intern した文字列を共有し、過去問ごとに複製しない
+@dataclass(frozen=True, eq=False)
+class PastQuestion(_CatalogModel):
+    __slots__ = ("id", "year", "theme", "time_limit", "university", "faculty", "department")
     id: str
     year: int
     theme: str
@@ -12,25 +40,49 @@ class PastQuestion:
     faculty: str
     department: str
 
-@dataclass
-class Department:
+    @property
+    def key(self) -> str:
+        return self.id
+
+@dataclass(frozen=True, eq=False)
+class Department(_CatalogModel):
+    __slots__ = ("id", "name", "has_ao", "question_count", "kana", "key", "_load_past_questions")
     id: str
     name: str
     has_ao: bool
-    past_questions: List[PastQuestion]
+    question_count: int  # 過去問の件数（過去問を読み込まずに表示できるよう索引に持つ）
+    kana: str  # 読み（検索用、なければ空文字）
+    key: str  # 「大学ID/学部ID/学科ID」
+    _load_past_questions: Callable[[], Tuple[PastQuestion, ...]]
 
-@dataclass
-class Faculty:
+    @property
+    def past_questions(self) -> Tuple[PastQuestion, ...]:
+        """過去問（初回参照時に学科ごとのファイルから読み込み、プロセス内で共有する）"""
+        return self._load_past_questions()
+
+@dataclass(frozen=True, eq=False)
+class Faculty(_CatalogModel):
+    __slots__ = ("id", "name", "departments", "has_ao", "kana", "aliases", "key")
     id: str
     name: str
-    departments: List[Department]
+    departments: Tuple[Department, ...]
     has_ao: bool
+    kana: str
+    aliases: Tuple[str, ...]  # 略称（検索用）
+    key: str  # 「大学ID/学部ID」
 
-@dataclass
-class University:
+@dataclass(frozen=True, eq=False)
+class University(_CatalogModel):
+    __slots__ = ("id", "name", "faculties", "kana", "aliases")
     id: str
     name: str
-    faculties: List[Faculty]
+    faculties: Tuple[Faculty, ...]
+    kana: str
+    aliases: Tuple[str, ...]
+
+    @property
+    def key(self) -> str:
+        return self.id
 
 @dataclass
 class PredictedQuestion:
@@ -0,0 +1,240 @@
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+
+from .catalog import load_catalog
+from .models import Department, Faculty, University
+
+# 検索時に無視する区切り文字
+SEPARATOR_PATTERN = re.compile(r"[\s・･\-‐－_／/]+")
+
+# 照合の種類（小さいほど上位に表示する）
+MATCH_EXACT, MATCH_PREFIX, MATCH_SUBSTRING, MATCH_INHERITED = range(4)
+# 階層（同じ照合の種類なら大学 → 学部 → 学科の順に表示する）
+LEVEL_UNIVERSITY, LEVEL_FACULTY, LEVEL_DEPARTMENT = range(3)
+
+# ひらがな → ヘボン式ローマ字
+_ROMAJI = {
+    "あ": "a", "い": "i", "う": "u", "え": "e", "お": "o",
+    "か": "ka", "き": "ki", "く": "ku", "け": "ke", "こ": "ko",
+    "さ": "sa", "し": "shi", "す": "su", "せ": "se", "そ": "so",
+    "た": "ta", "ち": "chi", "つ": "tsu", "て": "te", "と": "to",
+    "な": "na", "に": "ni", "ぬ": "nu", "ね": "ne", "の": "no",
+    "は": "ha", "ひ": "hi", "ふ": "fu", "へ": "he", "ほ": "ho",
+    "ま": "ma", "み": "mi", "む": "mu", "め": "me", "も": "mo",
+    "や": "ya", "ゆ": "yu", "よ": "yo",
+    "ら": "ra", "り": "ri", "る": "ru", "れ": "re", "ろ": "ro",
+    "わ": "wa", "ゐ": "i", "ゑ": "e", "を": "o", "ん": "n",
+    "が": "ga", "ぎ": "gi", "ぐ": "gu", "げ": "ge", "ご": "go",
+    "ざ": "za", "じ": "ji", "ず": "zu", "ぜ": "ze", "ぞ": "zo",
+    "だ": "da", "ぢ": "ji", "づ": "zu", "で": "de", "ど": "do",
+    "ば": "ba", "び": "bi", "ぶ": "bu", "べ": "be", "ぼ": "bo",
+    "ぱ": "pa", "ぴ": "pi", "ぷ": "pu", "ぺ": "pe", "ぽ": "po",
+    "ぁ": "a", "ぃ": "i", "ぅ": "u", "ぇ": "e", "ぉ": "o", "ゔ": "vu",
+}
+# 拗音（「きょ」→「kyo」、「しゃ」→「sha」）
+_YOUON = {"ゃ": "a", "ゅ": "u", "ょ": "o"}
+_YOUON_BASES = "きしちにひみりぎじぢびぴ"
+_YOUON_STEMS = {"し": "sh", "ち": "ch", "じ": "j", "ぢ": "j"}
+
+
+def normalize(text: str) -> str:
+    """検索用に表記を揃える（NFKC・小文字化・カタカナ→ひらがな・区切り文字の除去）"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = "".join(chr(ord(char) - 0x60) if "ァ" <= char <= "ヶ" else char for char in text)
+    return SEPARATOR_PATTERN.sub("", text)
+
+
+def to_romaji(kana: str) -> str:
+    """ひらがなの読みをヘボン式ローマ字にする（長音は「ou」「uu」のまま）"""
+    romaji = []
+    double_next = False
+    i = 0
+    while i < len(kana):
+        char = kana[i]
+        if char == "っ":
+            double_next = True
+            i += 1
+            continue
+        if i + 1 < len(kana) and kana[i + 1] in _YOUON and char in _YOUON_BASES:
+            syllable = _YOUON_STEMS.get(char, _ROMAJI[char][:-1] + "y") + _YOUON[kana[i + 1]]
+            i += 2
+        elif char == "ー":
+            syllable = romaji[-1][-1] if romaji and romaji[-1][-1] in "aiueo" else ""
+            i += 1
+        else:
+            syllable = _ROMAJI.get(char, char)
+            i += 1
+        if double_next and syllable:
+            syllable = ("t" if syllable.startswith("ch") else syllable[0]) + syllable
+            double_next = False
+        romaji.append(syllable)
+    return "".join(romaji)
+
+
+def romaji_variants(kana: str) -> List[str]:
+    """ローマ字表記の揺れ（「keiou」「keio」、「toukyou」「tokyo」）"""
+    romaji = to_romaji(kana)
+    folded = romaji.replace("ou", "o").replace("uu", "u")
+    return [romaji] if folded == romaji else [romaji, folded]
+
+
+@dataclass(frozen=True)
+class SearchResult:
+    """検索結果1件（学部・学科単位で一致した場合はその学部・学科も返す）"""
+    university: University
+    faculty: Optional[Faculty]
+    department: Optional[Department]
+    match: int
+
+    @property
+    def level(self) -> int:
+        if self.department is not None:
+            return LEVEL_DEPARTMENT
+        return LEVEL_FACULTY if self.faculty is not None else LEVEL_UNIVERSITY
+
+    @property
+    def label(self) -> str:
+        return " ".join(item.name for item in (self.university, self.faculty, self.department) if item is not None)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    university: University
+    faculty: Optional[Faculty]
+    department: Optional[Department]
+    keys: Tuple[str, ...]
+
+
+class SearchIndex:
+    """大学・学部・学科名の n-gram 転置インデックス
+
+    名前・読み・ローマ字・略称・ID を正規化したものを検索キーとし、
+    キーの2文字組（1文字の検索語には1文字）ごとに項目番号の集合を持つ。
+    検索語の2文字組の集合を積集合で絞り込んでから部分一致を確かめるため、
+    全件を走査せずに候補を求められる。
+    """
+
+    def __init__(self, universities: Tuple[University, ...]):
+        self._entries: List[_Entry] = []
+        # 項目は大学 → 学部 → 学科の深さ優先順に並べ、子孫の項目番号を [index, subtree_end) の範囲で表す
+        self._subtree_ends: List[int] = []
+        self._unigrams: Dict[str, Set[int]] = {}
+        self._bigrams: Dict[str, Set[int]] = {}
+        for university in universities:
+            self._add_subtree(university, None, None, university)
+
+    def _add_subtree(self, university: University, faculty: Optional[Faculty],
+                     department: Optional[Department], item) -> None:
+        index = len(self._entries)
+        keys = _search_keys(item)
+        self._entries.append(_Entry(university, faculty, department, keys))
+        self._subtree_ends.append(index + 1)
+        for key in keys:
+            for char in key:
+                self._unigrams.setdefault(char, set()).add(index)
+            for gram in _bigrams(key):
+                self._bigrams.setdefault(gram, set()).add(index)
+
+        if department is None and faculty is None:
+            for child in university.faculties:
+                self._add_subtree(university, child, None, child)
+        elif department is None:
+            for child in faculty.departments:
+                self._add_subtree(university, faculty, child, child)
+        self._subtree_ends[index] = len(self._entries)
+
+    def _candidates(self, term: str) -> Set[int]:
+        if len(term) == 1:
+            return self._unigrams.get(term, set())
+        postings = [self._bigrams.get(gram) for gram in _bigrams(term)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def _match(self, term: str) -> Dict[int, int]:
+        """検索語に一致する項目番号と照合の種類"""
+        matches = {}
+        for index in self._candidates(term):
+            best = MATCH_INHERITED
+            for key in self._entries[index].keys:
+                if key == term:
+                    best = MATCH_EXACT
+                    break
+                if key.startswith(term):
+                    best = min(best, MATCH_PREFIX)
+                elif term in key:
+                    best = min(best, MATCH_SUBSTRING)
+            if best != MATCH_INHERITED:
+                matches[index] = best
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[SearchResult]:
+        """大学・学部・学科を検索し、一致度の高い順に返す
+
+        空白で区切った検索語（「早大 政経」など）は、上位の大学・学部での一致も含めて
+        すべての語に一致する項目だけを返す。
+        """
+        terms = [term for term in map(normalize, query.split()) if term]
+        if not terms:
+            return []
+
+        ranks: Dict[int, int] = {}
+        covered: Optional[Set[int]] = None
+        for term in terms:
+            matches = self._match(term)
+            term_covered = set()
+            for index, match in matches.items():
+                ranks[index] = min(ranks.get(index, MATCH_INHERITED), match)
+                term_covered.update(range(index, self._subtree_ends[index]))
+            covered = term_covered if covered is None else covered & term_covered
+
+        results = []
+        for index in covered:
+            if index not in ranks:
+                continue
+            entry = self._entries[index]
+            results.append((ranks[index], index, SearchResult(entry.university, entry.faculty, entry.department,
+                                                              ranks[index])))
+        results.sort(key=lambda item: (item[0], item[2].level, item[1]))
+        return [result for _, _, result in results[:limit]]
+
+
+def _search_keys(item) -> Tuple[str, ...]:
+    keys = [normalize(item.name), normalize(item.id)]
+    if item.kana:
+        kana = normalize(item.kana)
+        keys.append(kana)
+        keys.extend(romaji_variants(kana))
+    keys.extend(normalize(alias) for alias in getattr(item, "aliases", ()))
+    return tuple(dict.fromkeys(key for key in keys if key))
+
+
+def _bigrams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+@lru_cache(maxsize=None)
+def get_search_index() -> SearchIndex:
+    """大学データの検索インデックス（初回呼び出し時に1回だけ作成する）"""
+    return SearchIndex(load_catalog().universities)
+
+
+def search(query: str, limit: Optional[int] = None) -> List[SearchResult]:
+    return get_search_index().search(query, limit)
+
+
+def search_universities(query: str) -> List[University]:
+    """検索語に一致する大学を一致度の高い順に返す（学部・学科名での一致も含む）"""
+    if not query.strip():
+        return list(load_catalog().universities)
+    universities = []
+    seen = set()
+    for result in search(query):
+        if result.university.id not in seen:
+            seen.add(result.university.id)
+            universities.append(result.university)
+    return universities
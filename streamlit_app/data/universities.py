@@ -1,167 +1,8 @@
-from .models import University, Faculty, Department, PastQuestion
+from typing import Sequence
 
-def get_universities():
-    return [
-        University(
-            id='waseda',
-            name='早稲田大学',
-            faculties=[
-                Faculty(
-                    id='political-science',
-                    name='政治経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='politics',
-                            name='政治学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-pol-2023',
-                                    year=2023,
-                                    theme='デジタル社会における民主主義の課題と可能性について、具体例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2022',
-                                    year=2022,
-                                    theme='グローバル化が進む現代において、国家の役割はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2021',
-                                    year=2021,
-                                    theme='コロナ禍を通じて見えた現代社会の課題と、その解決策について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2020',
-                                    year=2020,
-                                    theme='持続可能な社会の実現に向けて、政治が果たすべき役割について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                ),
-                                PastQuestion(
-                                    id='waseda-pol-2019',
-                                    year=2019,
-                                    theme='人工知能の発達が社会に与える影響と、それに対する政策の在り方について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='政治学科'
-                                )
-                            ]
-                        ),
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-econ-2023',
-                                    year=2023,
-                                    theme='日本経済の持続的成長に向けた課題と解決策について論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='政治経済学部',
-                                    department='経済学科'
-                                )
-                            ]
-                        )
-                    ]
-                ),
-                Faculty(
-                    id='law',
-                    name='法学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='law',
-                            name='法学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='waseda-law-2023',
-                                    year=2023,
-                                    theme='法の支配と民主主義の関係について、現代社会の具体例を挙げて論じなさい。',
-                                    time_limit=90,
-                                    university='早稲田大学',
-                                    faculty='法学部',
-                                    department='法学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='keio',
-            name='慶應義塾大学',
-            faculties=[
-                Faculty(
-                    id='economics',
-                    name='経済学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='economics',
-                            name='経済学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='keio-econ-2023',
-                                    year=2023,
-                                    theme='デジタル化が進む現代において、経済活動はどのように変化すべきか論じなさい。',
-                                    time_limit=90,
-                                    university='慶應義塾大学',
-                                    faculty='経済学部',
-                                    department='経済学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        ),
-        University(
-            id='todai',
-            name='東京大学',
-            faculties=[
-                Faculty(
-                    id='liberal-arts',
-                    name='教養学部',
-                    has_ao=True,
-                    departments=[
-                        Department(
-                            id='liberal-arts',
-                            name='教養学科',
-                            has_ao=True,
-                            past_questions=[
-                                PastQuestion(
-                                    id='todai-liberal-2023',
-                                    year=2023,
-                                    theme='多様性と包摂性が求められる現代社会において、教育の果たすべき役割について論じなさい。',
-                                    time_limit=120,
-                                    university='東京大学',
-                                    faculty='教養学部',
-                                    department='教養学科'
-                                )
-                            ]
-                        )
-                    ]
-                )
-            ]
-        )
-    ]
\ No newline at end of file
+from .catalog import load_catalog
+from .models import University
+
+def get_universities() -> Sequence[University]:
+    """全アプリ共通の大学データ（data/catalog.json から読み込み、プロセス内で共有）"""
+    return load_catalog().universities
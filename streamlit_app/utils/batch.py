@@ -0,0 +1,257 @@
+"""小論文の一括採点（Message Batches API）
+
+使い方（streamlit_app ディレクトリで実行）:
+    python -m utils.batch score essays.jsonl -o results.jsonl
+    python -m utils.batch score essays.csv -o results.csv --university 早稲田大学 --faculty 政治経済学部
+    python -m utils.batch score essays.jsonl -o results.jsonl --backend local  # APIを使わない動作確認
+
+入力（JSONL または CSV）の各行には content（解答）と theme（出題テーマ）が必要。
+id・university・faculty は任意（university・faculty はオプションで一括指定も可能）。
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.essay_scorer import score_essay
+from utils.prompts import (
+    SCORING_MODEL, SCORING_RUBRIC_VERSION, parse_scoring_response, response_json, scoring_request
+)
+from utils.score_cache import RESULT_FORMAT_DISPLAY, ScoreCache, get_score_cache, make_cache_key
+
+RESULT_FIELDS = [
+    "id", "university", "faculty", "theme", "status", "total",
+    "structure", "content", "logic", "expression",
+    "detailed_feedback", "specific_advice", "error"
+]
+
+
+@dataclass
+class EssayRecord:
+    id: str
+    content: str
+    theme: str
+    university: str
+    faculty: str
+
+
+def load_essays(path: str, university: str = "", faculty: str = "", theme: str = "") -> List[EssayRecord]:
+    """JSONL または CSV から採点対象を読み込む（拡張子で判定）"""
+    if path.endswith(".csv"):
+        with open(path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    records = []
+    for index, row in enumerate(rows, 1):
+        content = row.get("content") or ""
+        record_theme = row.get("theme") or theme
+        if not content or not record_theme:
+            raise ValueError(f"{path} の{index}件目に content または theme がありません")
+        records.append(EssayRecord(
+            id=str(row.get("id") or index),
+            content=content,
+            theme=record_theme,
+            university=row.get("university") or university,
+            faculty=row.get("faculty") or faculty
+        ))
+    return records
+
+
+def write_results(path: str, rows: List[dict]) -> None:
+    """採点結果を JSONL または CSV に書き出す（拡張子で判定）"""
+    if path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({**row, "specific_advice": " / ".join(row.get("specific_advice") or [])})
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API を使うバックエンド"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, requests: List[dict]) -> str:
+        return self.client.messages.batches.create(requests=requests).id
+
+    def is_ended(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """(custom_id, 応答（採点ツールの入力JSON）, エラー内容) を順に返す"""
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == "succeeded":
+                yield entry.custom_id, response_json(entry.result.message), None
+            else:
+                error = getattr(entry.result, "error", None)
+                yield entry.custom_id, None, f"{entry.result.type}: {error}" if error else entry.result.type
+
+
+class LocalBatchBackend:
+    """APIを呼ばずに responder で応答を作るバックエンド（オフラインでの動作確認用）"""
+
+    def __init__(self, responder: Callable[[str], str]):
+        self.responder = responder
+        self._batches: Dict[str, List[dict]] = {}
+
+    def submit(self, requests: List[dict]) -> str:
+        batch_id = f"local-batch-{len(self._batches) + 1}"
+        self._batches[batch_id] = requests
+        return batch_id
+
+    def is_ended(self, batch_id: str) -> bool:
+        return True
+
+    def results(self, batch_id: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        for request in self._batches[batch_id]:
+            try:
+                yield request["custom_id"], self.responder(request["custom_id"]), None
+            except Exception as e:
+                yield request["custom_id"], None, str(e)
+
+
+def local_scoring_response(record: EssayRecord) -> str:
+    """ルールベース採点の結果を Claude の採点応答と同じ JSON 形式で返す"""
+    score = score_essay(record.content, record.theme)
+    evaluation = f"ローカル採点（API未使用）: {score.feedback}"
+    return json.dumps({
+        "structure_score": score.structure,
+        "content_score": score.content,
+        "logic_score": score.logic,
+        "expression_score": score.expression,
+        "structure_evaluation": evaluation,
+        "content_evaluation": evaluation,
+        "logic_evaluation": evaluation,
+        "expression_evaluation": evaluation,
+        "detailed_feedback": score.feedback,
+        "specific_advice": score.suggestions
+    }, ensure_ascii=False)
+
+
+def result_row(record: EssayRecord, status: str, score: Optional[dict] = None, error: Optional[str] = None) -> dict:
+    """出力1行分の採点結果を作成"""
+    row = {
+        "id": record.id,
+        "university": record.university,
+        "faculty": record.faculty,
+        "theme": record.theme,
+        "status": status,
+        "error": error
+    }
+    if score is not None:
+        row.update({
+            "total": score["total"],
+            "structure": score["structure"]["score"],
+            "content": score["content"]["score"],
+            "logic": score["logic"]["score"],
+            "expression": score["expression"]["score"],
+            "detailed_feedback": score["detailed_feedback"],
+            "specific_advice": score["specific_advice"]
+        })
+    return row
+
+
+def score_batch(records: List[EssayRecord], backend, cache: Optional[ScoreCache] = None,
+                poll_interval: float = 60, log: Callable[[str], None] = print) -> List[dict]:
+    """採点対象をバッチで採点し、入力順の結果一覧を返す
+
+    cache を渡すと採点済みの解答はバッチに含めず、新たな採点結果はキャッシュに保存する。
+    """
+    rows: List[Optional[dict]] = [None] * len(records)
+    cache_keys = [
+        make_cache_key(r.content, r.theme, r.university, r.faculty, SCORING_RUBRIC_VERSION, SCORING_MODEL,
+                       RESULT_FORMAT_DISPLAY)
+        for r in records
+    ]
+    requests = []
+    for index, record in enumerate(records):
+        cached = cache.get(cache_keys[index]) if cache is not None else None
+        if cached is not None:
+            rows[index] = result_row(record, "cached", cached)
+        else:
+            requests.append({
+                "custom_id": f"essay-{index}",
+                "params": scoring_request(record.content, record.theme, record.university, record.faculty)
+            })
+
+    log(f"採点対象 {len(records)}件（キャッシュ済み {len(records) - len(requests)}件 / バッチ送信 {len(requests)}件）")
+    if requests:
+        batch_id = backend.submit(requests)
+        log(f"バッチ送信完了: {batch_id}")
+        while not backend.is_ended(batch_id):
+            time.sleep(poll_interval)
+        for custom_id, text, error in backend.results(batch_id):
+            index = int(custom_id.split("-", 1)[1])
+            record = records[index]
+            if error is not None:
+                rows[index] = result_row(record, "errored", error=error)
+                continue
+            try:
+                score = parse_scoring_response(text)
+            except (ValueError, KeyError, TypeError) as e:
+                rows[index] = result_row(record, "errored", error=f"応答の解析に失敗: {e}")
+                continue
+            if cache is not None:
+                cache.put(cache_keys[index], score)
+            rows[index] = result_row(record, "succeeded", score)
+
+    return [
+        row if row is not None else result_row(records[i], "errored", error="結果がありません")
+        for i, row in enumerate(rows)
+    ]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.batch", description="小論文の一括採点")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    score_parser = subparsers.add_parser("score", help="JSONL/CSV の小論文を一括採点する")
+    score_parser.add_argument("input", help="採点対象（.jsonl または .csv）")
+    score_parser.add_argument("-o", "--output", required=True, help="採点結果の出力先（.jsonl または .csv）")
+    score_parser.add_argument("--backend", choices=["anthropic", "local"], default="anthropic",
+                              help="local はAPIを使わずルールベース採点で動作確認する")
+    score_parser.add_argument("--university", default="", help="入力に university がない行の大学名")
+    score_parser.add_argument("--faculty", default="", help="入力に faculty がない行の学部名")
+    score_parser.add_argument("--theme", default="", help="入力に theme がない行の出題テーマ")
+    score_parser.add_argument("--poll-interval", type=float, default=60, help="バッチ状態の確認間隔（秒）")
+    score_parser.add_argument("--no-cache", action="store_true", help="採点キャッシュを使わない")
+    args = parser.parse_args(argv)
+
+    records = load_essays(args.input, args.university, args.faculty, args.theme)
+    if args.backend == "local":
+        records_by_id = {f"essay-{i}": r for i, r in enumerate(records)}
+        backend = LocalBatchBackend(lambda custom_id: local_scoring_response(records_by_id[custom_id]))
+        cache = None
+    else:
+        import anthropic
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            print("ANTHROPIC_API_KEY が設定されていません", file=sys.stderr)
+            return 1
+        backend = AnthropicBatchBackend(anthropic.Anthropic(api_key=api_key))
+        cache = None if args.no_cache else get_score_cache()
+
+    rows = score_batch(records, backend, cache=cache, poll_interval=args.poll_interval)
+    write_results(args.output, rows)
+    failed = sum(1 for row in rows if row["status"] == "errored")
+    print(f"採点結果を {args.output} に出力しました（失敗 {failed}件）")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
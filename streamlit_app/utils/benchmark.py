@@ -0,0 +1,349 @@
+"""採点・問題予想・検索・API 呼び出しの性能を計測し、結果を JSON で出力するベンチマーク
+
+使い方（streamlit_app ディレクトリで実行）:
+    python -m utils.benchmark -o .cache/benchmark.json            # 全項目を計測
+    python -m utils.benchmark --quick --only score                # 採点の項目だけを短時間で計測
+    python -m utils.benchmark --baseline old.json -o new.json     # 前回の結果と比べて遅くなった項目を表示
+
+API の計測はローカルの代替サーバー（utils.fake_anthropic）に対して行い、Claude API は呼ばない。
+アプリ画面の関数（streamlit）や anthropic が import できない環境では、その項目を skipped として記録する。
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from data.catalog import load_catalog, load_past_questions
+from data.search import get_search_index, search_universities
+from utils.essay_scorer import score_essay
+from utils.question_predictor import generate_predicted_question, get_university_statistics, predict_themes
+from utils.storage import ensure_parent_dir
+
+# 生成する答案の文字数
+ESSAY_SIZES = (100, 500, 1000, 2000, 5000, 10000, 20000)
+QUICK_ESSAY_SIZES = (100, 1000, 20000)
+SEARCH_QUERIES = ("東京大学", "けいおう", "waseda", "早大 政経", "法学部", "情報")
+BENCHMARK_THEME = "デジタル社会における情報リテラシーの重要性について論じなさい。"
+
+# 1項目あたりの計測時間（秒）と回数の範囲
+MIN_TIME = 0.5
+QUICK_MIN_TIME = 0.05
+MIN_ROUNDS = 5
+MAX_ROUNDS = 10000
+
+# 答案の各部分に使う文（採点ルールのキーワード・数値データを含むものを混ぜる）
+_INTRODUCTION = [
+    "現代社会において、{topic}は重要な課題となっている。",
+    "本稿では{topic}について、その背景と解決策を論じる。",
+    "私は{topic}に関して、積極的に取り組むべきだと考える。",
+]
+_BODY = [
+    "例えば、ある調査では回答者の{percent}%が{topic}の影響を実感していると答えている。",
+    "そのため、個人だけでなく社会全体での対応が求められる。",
+    "なぜなら、{topic}は世代や地域を越えて私たちの生活に関わるからである。",
+    "具体的には、{year}年以降に制度の見直しが進められてきた。",
+    "その結果、約{count}人が新しい取り組みに参加するようになった。",
+    "このことから、継続的な教育と支援の仕組みが欠かせないと言える。",
+    "しかし、費用や人材の不足といった課題も残されている。",
+    "一方で、技術の進歩によって解決の糸口も見えつつある。",
+    "ただし、急激な変化は新たな格差を生むおそれがある。",
+]
+_CONCLUSION = [
+    "以上のことから、{topic}には長期的な視点での対策が必要である。",
+    "このように、私たち一人ひとりが{topic}を自分の問題として考えることが大切だ。",
+    "よって、行政・企業・市民が連携して取り組むべきである。",
+]
+_TOPICS = ["情報リテラシー", "地域の活性化", "環境問題", "少子高齢化", "多様性の尊重"]
+
+
+def generate_essay(length: int, seed: int = 0) -> str:
+    """序論・本論・結論の段落からなる、およそ length 文字の答案を作る（同じ引数なら同じ答案）"""
+    rng = random.Random(f"{length}/{seed}")
+    topic = rng.choice(_TOPICS)
+
+    def sentence(templates: Sequence[str]) -> str:
+        return rng.choice(templates).format(
+            topic=topic, percent=rng.randint(10, 90), year=rng.randint(2000, 2025), count=rng.randint(100, 9999)
+        )
+
+    introduction = sentence(_INTRODUCTION)
+    conclusion = sentence(_CONCLUSION)
+    budget = max(0, length - len(introduction) - len(conclusion))
+    paragraphs = [introduction]
+    paragraph = ""
+    written = 0
+    while written < budget:
+        text = sentence(_BODY)
+        paragraph += text
+        written += len(text)
+        if len(paragraph) >= 200:
+            paragraphs.append(paragraph)
+            paragraph = ""
+    if paragraph:
+        paragraphs.append(paragraph)
+    paragraphs.append(conclusion)
+    return "\n\n".join(paragraphs)[:max(length, len(introduction))]
+
+
+@dataclass
+class BenchmarkResult:
+    """ベンチマーク1項目の計測結果（時間は秒）"""
+    name: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    rounds: int = 0
+    min: Optional[float] = None
+    median: Optional[float] = None
+    p95: Optional[float] = None
+    mean: Optional[float] = None
+    ops_per_second: Optional[float] = None
+    chars_per_second: Optional[float] = None
+    skipped: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.name + "".join(f" {name}={value}" for name, value in sorted(self.params.items()))
+
+
+def summarize(name: str, params: Dict[str, Any], samples: List[float]) -> BenchmarkResult:
+    """計測した所要時間の一覧を集計する"""
+    ordered = sorted(samples)
+    mean = sum(ordered) / len(ordered)
+    result = BenchmarkResult(
+        name=name,
+        params=params,
+        rounds=len(ordered),
+        min=ordered[0],
+        median=ordered[len(ordered) // 2],
+        p95=ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        mean=mean,
+        ops_per_second=1 / mean if mean > 0 else None
+    )
+    if "chars" in params and result.ops_per_second is not None:
+        result.chars_per_second = params["chars"] * result.ops_per_second
+    return result
+
+
+def measure(name: str, func: Callable[[], Any], params: Optional[Dict[str, Any]] = None,
+            min_time: float = MIN_TIME, min_rounds: int = MIN_ROUNDS, max_rounds: int = MAX_ROUNDS,
+            setup: Optional[Callable[[], Any]] = None) -> BenchmarkResult:
+    """func を min_time 秒以上（min_rounds 回以上）繰り返し、1回ごとの所要時間を集計する
+
+    setup は毎回 func の直前に呼び、所要時間には含めない（キャッシュの破棄など）。
+    """
+    if setup is not None:
+        setup()
+    func()  # 初回の import・キャッシュ作成を計測から除く
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < max_rounds and (len(samples) < min_rounds or time.perf_counter() - started < min_time):
+        if setup is not None:
+            setup()
+        begin = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - begin)
+    return summarize(name, params or {}, samples)
+
+
+def skipped(name: str, reason: str, params: Optional[Dict[str, Any]] = None) -> BenchmarkResult:
+    return BenchmarkResult(name=name, params=params or {}, skipped=reason)
+
+
+def _import_app_function(module: str, name: str) -> Callable:
+    return getattr(importlib.import_module(module), name)
+
+
+def bench_scoring(sizes: Iterable[int], min_time: float) -> List[BenchmarkResult]:
+    """ルールベース採点（アプリごとの採点関数を含む）"""
+    targets = [
+        ("essay_scorer.score_essay", lambda: score_essay, lambda f, essay: f(essay, BENCHMARK_THEME)),
+        ("app_advanced.detailed_essay_scoring", lambda: _import_app_function("app_advanced", "detailed_essay_scoring"),
+         lambda f, essay: f(essay, BENCHMARK_THEME)),
+        ("app_final.simulate_ai_evaluation", lambda: _import_app_function("app_final", "simulate_ai_evaluation"),
+         lambda f, essay: f(essay, BENCHMARK_THEME, "東京大学", "法学部")),
+        ("app_api.fallback_score_essay", lambda: _import_app_function("app_api", "fallback_score_essay"),
+         lambda f, essay: f(essay, BENCHMARK_THEME)),
+    ]
+    essays = {size: generate_essay(size) for size in sizes}
+    results = []
+    for name, load, call in targets:
+        try:
+            func = load()
+        except Exception as e:
+            results.extend(skipped(name, f"import できません: {e}", {"chars": size}) for size in essays)
+            continue
+        for size, essay in essays.items():
+            results.append(measure(name, lambda: call(func, essay), {"chars": size}, min_time))
+    return results
+
+
+def bench_catalog(min_time: float) -> List[BenchmarkResult]:
+    """大学データの読み込み・検索・問題予想"""
+    catalog = load_catalog()
+    university = catalog.universities[0]
+    faculty = university.faculties[0]
+    department = faculty.departments[0]
+    past_questions = department.past_questions
+
+    results = [
+        measure("catalog.load", lambda: load_catalog(), min_time=min_time, setup=load_catalog.cache_clear),
+        measure("catalog.past_questions", lambda: department.past_questions, {"questions": len(past_questions)},
+                min_time, setup=load_past_questions.cache_clear),
+        measure("search.build_index", get_search_index, min_time=min_time, setup=get_search_index.cache_clear),
+    ]
+    for query in SEARCH_QUERIES:
+        results.append(measure("search_universities", lambda: search_universities(query), {"query": query}, min_time))
+
+    names = (university.name, faculty.name, department.name)
+    results.append(measure("question_predictor.statistics", lambda: get_university_statistics(university.name),
+                           min_time=min_time, setup=get_university_statistics.cache_clear))
+    results.append(measure("question_predictor.predict_themes", lambda: predict_themes(*names, tuple(past_questions)),
+                           min_time=min_time))
+    results.append(measure("question_predictor.generate_predicted_question",
+                           lambda: generate_predicted_question(list(past_questions), *names), min_time=min_time))
+    return results
+
+
+def bench_api(min_time: float, latency: float, chunk_interval: float, concurrency: int) -> List[BenchmarkResult]:
+    """ゲートウェイ経由の API 呼び出し（ローカルの代替サーバーに対して計測）"""
+    params = {"latency": latency, "chunk_interval": chunk_interval}
+    names = ("api.create", "api.stream", "api.stream.first_token", "api.concurrent")
+    try:
+        import anthropic
+        from utils.claude_gateway import ClaudeGateway
+    except Exception as e:
+        return [skipped(name, f"import できません: {e}", params) for name in names]
+    from utils.fake_anthropic import FakeAnthropicServer
+    from utils.prompts import scoring_request
+    from utils.streaming import stream_message
+
+    request = scoring_request(generate_essay(1000), BENCHMARK_THEME, "東京大学", "法学部")
+    with FakeAnthropicServer(latency=latency, chunk_interval=chunk_interval) as server:
+        client = anthropic.AsyncAnthropic(api_key="benchmark", base_url=server.base_url, max_retries=0)
+        # レート制限で待たないよう上限を十分大きくする（同時実行数の制限だけを残す）
+        gateway = ClaudeGateway(client=client, max_concurrency=concurrency,
+                                requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12)
+        results = [measure("api.create", lambda: gateway.messages.create(**request), params, min_time)]
+
+        first_tokens: List[float] = []
+        totals: List[float] = []
+        while len(totals) < MIN_ROUNDS or sum(totals) < min_time:
+            begin = time.perf_counter()
+            received = []
+
+            def on_delta(_text: str) -> None:
+                if not received:
+                    received.append(time.perf_counter() - begin)
+
+            stream_message(gateway, on_delta=on_delta, **request)
+            totals.append(time.perf_counter() - begin)
+            first_tokens.append(received[0] if received else totals[-1])
+        results.append(summarize("api.stream", params, totals))
+        results.append(summarize("api.stream.first_token", params, first_tokens))
+
+        # concurrency 件を同時に送り、1回あたりの所要時間からスループットを求める
+        batch_params = dict(params, concurrency=concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            def send_batch() -> None:
+                list(executor.map(lambda _: gateway.messages.create(**request), range(concurrency)))
+
+            batch = measure("api.concurrent", send_batch, batch_params, min_time)
+        if batch.ops_per_second is not None:
+            batch.ops_per_second *= concurrency
+        results.append(batch)
+    return results
+
+
+def compare(results: List[BenchmarkResult], baseline_path: str, max_regression: float) -> List[str]:
+    """前回の結果と中央値を比べ、max_regression（割合）を超えて遅くなった項目を返す"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {BenchmarkResult(**entry).key: entry for entry in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result.key)
+        if result.median is None or not previous or not previous.get("median"):
+            continue
+        ratio = result.median / previous["median"]
+        if ratio > 1 + max_regression:
+            regressions.append(f"{result.key}: {previous['median'] * 1000:.3f}ms → {result.median * 1000:.3f}ms（{ratio:.2f}倍）")
+    return regressions
+
+
+def run(only: str = "", quick: bool = False, api_latency: float = 0.05, api_chunk_interval: float = 0.0,
+        api_concurrency: int = 8) -> List[BenchmarkResult]:
+    min_time = QUICK_MIN_TIME if quick else MIN_TIME
+    sizes = QUICK_ESSAY_SIZES if quick else ESSAY_SIZES
+    groups = [
+        ("score", lambda: bench_scoring(sizes, min_time)),
+        ("catalog", lambda: bench_catalog(min_time)),
+        ("api", lambda: bench_api(min_time, api_latency, api_chunk_interval, api_concurrency)),
+    ]
+    if only in dict(groups):
+        return dict(groups)[only]()
+    results = []
+    for _group, bench in groups:
+        results.extend(result for result in bench() if only in result.name)
+    return results
+
+
+def _format(result: BenchmarkResult) -> str:
+    if result.skipped:
+        return f"{result.key:60} skipped（{result.skipped}）"
+    return (f"{result.key:60} median {result.median * 1000:10.3f}ms  p95 {result.p95 * 1000:10.3f}ms  "
+            f"{result.ops_per_second:12.1f} ops/s  ({result.rounds}回)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.benchmark", description="性能ベンチマーク")
+    parser.add_argument("-o", "--output", help="結果の JSON の出力先（省略時は標準出力）")
+    parser.add_argument("--only", default="", help="名前にこの文字列を含む項目（または score / catalog / api）だけを計測")
+    parser.add_argument("--quick", action="store_true", help="答案の文字数・計測時間を減らして短時間で計測")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="代替サーバーの最初のトークンまでの待ち時間（秒）")
+    parser.add_argument("--api-chunk-interval", type=float, default=0.0, help="代替サーバーの差分ごとの待ち時間（秒）")
+    parser.add_argument("--api-concurrency", type=int, default=8, help="同時送信数")
+    parser.add_argument("--baseline", help="比較する前回の結果（JSON）")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="前回より中央値がこの割合を超えて遅くなった項目があれば終了コード1")
+    args = parser.parse_args(argv)
+
+    results = run(args.only, args.quick, args.api_latency, args.api_chunk_interval, args.api_concurrency)
+    for result in results:
+        print(_format(result), file=sys.stderr)
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "catalog_version": load_catalog().version,
+        "options": {"quick": args.quick, "only": args.only, "api_latency": args.api_latency,
+                    "api_chunk_interval": args.api_chunk_interval, "api_concurrency": args.api_concurrency},
+        "results": [asdict(result) for result in results]
+    }
+    if args.output:
+        ensure_parent_dir(args.output)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"結果を {args.output} に出力しました", file=sys.stderr)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.max_regression)
+        for line in regressions:
+            print(f"遅くなった項目: {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
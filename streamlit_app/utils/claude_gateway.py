@@ -0,0 +1,254 @@
+import asyncio
+import os
+import queue
+import random
+import threading
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+import anthropic
+
+# 同時実行数・レート制限・タイムアウト（環境変数で調整可能）
+MAX_CONCURRENCY = int(os.getenv("CLAUDE_MAX_CONCURRENCY", "8"))
+REQUESTS_PER_MINUTE = int(os.getenv("CLAUDE_REQUESTS_PER_MINUTE", "50"))
+TOKENS_PER_MINUTE = int(os.getenv("CLAUDE_TOKENS_PER_MINUTE", "50000"))
+REQUEST_TIMEOUT = float(os.getenv("CLAUDE_REQUEST_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("CLAUDE_MAX_RETRIES", "5"))
+
+# 再試行するHTTPステータス（429: レート制限, 529: 過負荷, 5xx: 一時的なサーバーエラー）
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+
+
+class TokenBucket:
+    """1分あたりの上限を平滑化して払い出すトークンバケット"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """amount 分のトークンが貯まるまで待って消費する"""
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def estimate_tokens(request: dict) -> int:
+    """リクエストの消費トークン数を概算（日本語は概ね1文字1トークンとして見積もる）"""
+    chars = 0
+    system = request.get("system")
+    if isinstance(system, str):
+        chars += len(system)
+    elif isinstance(system, list):
+        chars += sum(len(block.get("text", "")) for block in system if isinstance(block, dict))
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(block.get("text", "")) for block in content if isinstance(block, dict))
+    return chars + int(request.get("max_tokens", 0))
+
+
+def is_retryable(error: Exception) -> bool:
+    """再試行で回復が見込めるエラーか判定"""
+    if isinstance(error, (anthropic.APIConnectionError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def backoff_delay(attempt: int, error: Optional[Exception] = None) -> float:
+    """ジッター付き指数バックオフの待ち時間（retry-after ヘッダーがあればそれを優先）"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+class ClaudeGateway:
+    """プロセス共有の Claude API ゲートウェイ
+
+    AsyncAnthropic をバックグラウンドのイベントループで動かし、同時実行数の制限、
+    リクエスト数・トークン数のレート制限、429/529 時のバックオフ再試行を一括で行う。
+    messages.create / messages.stream は同期版 anthropic.Anthropic と同じ形で呼べる。
+    """
+
+    def __init__(self, api_key: Optional[str] = None, client=None,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 requests_per_minute: int = REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = TOKENS_PER_MINUTE,
+                 timeout: float = REQUEST_TIMEOUT,
+                 max_retries: int = MAX_RETRIES):
+        # 再試行はゲートウェイで制御するため SDK 側の再試行は無効にする
+        self.client = client or anthropic.AsyncAnthropic(api_key=api_key, timeout=timeout, max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.messages = _SyncMessages(self)
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="claude-gateway", daemon=True)
+        self._thread.start()
+        # asyncio のプリミティブはイベントループのスレッド内で生成する
+        asyncio.run_coroutine_threadsafe(self._init_limits(), self._loop).result()
+
+    async def _init_limits(self) -> None:
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._request_bucket = TokenBucket(self.requests_per_minute)
+        self._token_bucket = TokenBucket(self.tokens_per_minute)
+
+    async def _wait_for_capacity(self, request: dict) -> None:
+        await self._request_bucket.acquire(1)
+        await self._token_bucket.acquire(estimate_tokens(request))
+
+    async def create(self, **request):
+        """messages.create の非同期版（レート制限・再試行付き）"""
+        attempt = 0
+        while True:
+            await self._wait_for_capacity(request)
+            try:
+                async with self._semaphore:
+                    return await asyncio.wait_for(self.client.messages.create(**request), self.timeout)
+            except Exception as error:
+                if attempt >= self.max_retries or not is_retryable(error):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, error))
+                attempt += 1
+
+    async def stream_text(self, **request) -> AsyncIterator[str]:
+        """messages.stream のテキスト差分（ツール呼び出しの場合は入力JSONの差分）を返す非同期イテレータ
+
+        最初のトークンを受信する前の失敗のみ再試行する（途中まで返した応答は再送できないため）。
+        """
+        attempt = 0
+        while True:
+            await self._wait_for_capacity(request)
+            received = False
+            try:
+                async with self._semaphore:
+                    async with self.client.messages.stream(**request) as stream:
+                        iterator = _deltas(stream).__aiter__()
+                        first = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+                        received = True
+                        yield first
+                        async for text in iterator:
+                            yield text
+                return
+            except StopAsyncIteration:
+                return
+            except Exception as error:
+                if received or attempt >= self.max_retries or not is_retryable(error):
+                    raise
+                await asyncio.sleep(backoff_delay(attempt, error))
+                attempt += 1
+
+    def run(self, coroutine):
+        """コルーチンをゲートウェイのイベントループで実行し、結果を待つ"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def submit(self, coroutine):
+        """コルーチンをゲートウェイのイベントループに投入し、concurrent.futures.Future を返す"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+
+async def _deltas(stream) -> AsyncIterator[str]:
+    """ストリームのイベントから、テキストとツール入力（JSON）の差分を受信順に取り出す"""
+    async for event in stream:
+        if event.type != "content_block_delta":
+            continue
+        if event.delta.type == "text_delta":
+            text = event.delta.text
+        elif event.delta.type == "input_json_delta":
+            text = event.delta.partial_json
+        else:
+            continue
+        if text:
+            yield text
+
+
+class _SyncMessages:
+    """anthropic.Anthropic().messages と同じ呼び出し方を提供する同期ラッパー"""
+
+    def __init__(self, gateway: ClaudeGateway):
+        self._gateway = gateway
+
+    def create(self, **request):
+        return self._gateway.run(self._gateway.create(**request))
+
+    def stream(self, **request) -> "_SyncStream":
+        return _SyncStream(self._gateway, request)
+
+
+class _SyncStream:
+    """イベントループ側で受信した差分を、呼び出し元スレッドへキュー経由で渡す"""
+
+    _DONE = object()
+
+    def __init__(self, gateway: ClaudeGateway, request: dict):
+        self._gateway = gateway
+        self._request = request
+        self._queue: "queue.Queue" = queue.Queue()
+        self._future = None
+
+    async def _pump(self) -> None:
+        try:
+            async for text in self._gateway.stream_text(**self._request):
+                self._queue.put(text)
+        except BaseException as error:
+            self._queue.put(error)
+            raise
+        self._queue.put(self._DONE)
+
+    def __enter__(self) -> "_SyncStream":
+        self._future = self._gateway.submit(self._pump())
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._future is not None and not self._future.done():
+            self._future.cancel()
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+_gateway: Optional[ClaudeGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_claude_gateway(api_key: str) -> ClaudeGateway:
+    """プロセス共有の Claude ゲートウェイを取得"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = ClaudeGateway(api_key=api_key)
+        return _gateway
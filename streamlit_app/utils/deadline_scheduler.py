@@ -0,0 +1,125 @@
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from utils.result_pipeline import submit_task
+
+# 自動提出した結果を、受験者が取りに来るまで保持する時間（秒）
+AUTO_SUBMIT_RESULT_TTL = float(os.getenv("SHORONBUN_AUTO_SUBMIT_RESULT_TTL", str(6 * 60 * 60)))
+
+
+@dataclass
+class _Exam:
+    deadline: float
+    draft: str
+    on_expire: Callable[[str], Any]
+    generation: int
+    result: Optional[Future] = None
+    expired_at: Optional[float] = None
+
+
+class DeadlineScheduler:
+    """受験中のセッションの締切を管理し、締切に達したら最新の下書きを自動提出する
+
+    締切はヒープで管理し、専用スレッドが最も近い締切まで待って処理する。
+    ブラウザの操作（再実行）を待たないため、タブを開いたまま放置されていても締切の時点で採点が始まる。
+    採点は on_expire(下書き) としてバックグラウンドの実行器に投入し、結果は result() で受け取る。
+    """
+
+    def __init__(self, submit: Callable[..., Future] = submit_task, result_ttl: float = AUTO_SUBMIT_RESULT_TTL,
+                 clock: Callable[[], float] = time.time):
+        self._submit = submit
+        self._result_ttl = result_ttl
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._exams: Dict[Hashable, _Exam] = {}
+        # (締切, 追加順, セッション, 世代)。取り消し・再登録された古い項目は取り出したときに読み飛ばす
+        self._heap: List[Tuple[float, int, Hashable, int]] = []
+        self._sequence = 0
+        self._thread = threading.Thread(target=self._run, name="deadline-scheduler", daemon=True)
+        self._thread.start()
+
+    def start(self, session: Hashable, deadline: float, on_expire: Callable[[str], Any], draft: str = "") -> None:
+        """セッションの締切を登録する（登録済みなら締切・提出処理を置き換える）"""
+        with self._condition:
+            previous = self._exams.get(session)
+            generation = previous.generation + 1 if previous else 0
+            self._exams[session] = _Exam(deadline, draft, on_expire, generation)
+            self._sequence += 1
+            heapq.heappush(self._heap, (deadline, self._sequence, session, generation))
+            self._condition.notify()
+
+    def update_draft(self, session: Hashable, draft: str) -> None:
+        """締切前の下書きを更新する（締切後・未登録のセッションでは何もしない）"""
+        with self._condition:
+            exam = self._exams.get(session)
+            if exam is not None and exam.expired_at is None:
+                exam.draft = draft
+
+    def cancel(self, session: Hashable) -> None:
+        """締切前に提出した・中断したセッションの登録を取り消す（自動提出済みの結果も破棄する）"""
+        with self._condition:
+            self._exams.pop(session, None)
+
+    def result(self, session: Hashable) -> Optional[Tuple[str, Future]]:
+        """自動提出済みなら (提出した下書き, 採点結果の Future) を返す"""
+        with self._condition:
+            exam = self._exams.get(session)
+            if exam is None or exam.result is None:
+                return None
+            return exam.draft, exam.result
+
+    def pending(self) -> int:
+        """締切前のセッション数"""
+        with self._condition:
+            return sum(1 for exam in self._exams.values() if exam.expired_at is None)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                expired = self._pop_expired()
+                if not expired:
+                    # 次の締切まで待つ（締切がなくても自動提出の結果があれば、保持期限の確認のために起きる）
+                    if self._heap:
+                        timeout = self._heap[0][0] - self._clock()
+                    else:
+                        timeout = self._result_ttl if self._exams else None
+                    self._condition.wait(timeout)
+                    continue
+            # 採点の投入はロックの外で行う（投入先が同期実行でも登録・更新を止めないため）
+            for exam in expired:
+                exam.result = self._submit(exam.on_expire, exam.draft)
+
+    def _pop_expired(self) -> List[_Exam]:
+        """締切を過ぎたセッションを取り出して下書きを確定し、期限切れの結果を破棄する"""
+        now = self._clock()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, session, generation = heapq.heappop(self._heap)
+            exam = self._exams.get(session)
+            if exam is None or exam.generation != generation or exam.expired_at is not None:
+                continue
+            exam.expired_at = now
+            expired.append(exam)
+        stale = [session for session, exam in self._exams.items()
+                 if exam.expired_at is not None and now - exam.expired_at > self._result_ttl]
+        for session in stale:
+            del self._exams[session]
+        return expired
+
+
+_default_scheduler: Optional[DeadlineScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+
+def get_deadline_scheduler() -> DeadlineScheduler:
+    """プロセス共有の締切スケジューラーを取得"""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = DeadlineScheduler()
+        return _default_scheduler
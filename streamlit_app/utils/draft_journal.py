@@ -0,0 +1,229 @@
+import atexit
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from utils.storage import cache_path, connect, ensure_parent_dir
+
+# 保存要求をまとめる時間（秒）。最初の要求からこの時間が経ったら、その時点の最新の下書きだけを書き込む
+DRAFT_SAVE_DELAY = float(os.getenv("SHORONBUN_DRAFT_SAVE_DELAY", "2"))
+# 差分がこの件数たまったら全文を書き込み、それより前の記録を削除する
+DRAFT_COMPACT_EVERY = 50
+# 更新がこの期間ない下書きは削除する
+DRAFT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60  # 7日
+# 古い下書きの削除（全セッションの走査）を行う間隔
+DRAFT_PURGE_INTERVAL = 60 * 60  # 1時間
+
+
+def make_diff(before: str, after: str) -> str:
+    """before → after の差分（共通の先頭・末尾の長さと、その間の新しい文字列）"""
+    prefix = len(os.path.commonprefix([before, after]))
+    limit = min(len(before), len(after)) - prefix
+    suffix = 0
+    while suffix < limit and before[-1 - suffix] == after[-1 - suffix]:
+        suffix += 1
+    return json.dumps([prefix, suffix, after[prefix:len(after) - suffix]], ensure_ascii=False)
+
+
+def apply_diff(before: str, diff: str) -> str:
+    prefix, suffix, text = json.loads(diff)
+    return before[:prefix] + text + before[len(before) - suffix:]
+
+
+@dataclass(frozen=True)
+class SavedDraft:
+    """保存済みの下書き"""
+    content: str
+    theme: str
+    saved_at: float
+
+
+@dataclass
+class _Persisted:
+    """書き込み済みの最新の下書き（次の差分の基準）"""
+    content: str
+    theme: str
+    diffs: int
+    saved_at: float
+
+
+class DraftJournal:
+    """執筆中の下書きを、セッションごとの追記専用ログとして SQLite（WAL）に保存する
+
+    save() はメモリ上の保存待ちを更新するだけで、書き込みは専用スレッドがまとめて行う
+    （入力のたびの再実行で SQLite を待たない）。書き込みは前回との差分を追記し、
+    差分が DRAFT_COMPACT_EVERY 件たまると全文を書いて古い記録を削除する。
+    保存待ちの取り出しと書き込みは _write_lock の中で続けて行うため、discard() の後に
+    取り出し済みの古い下書きが書き込まれて復活することはない。
+    """
+
+    def __init__(self, path: str, save_delay: float = DRAFT_SAVE_DELAY,
+                 compact_every: int = DRAFT_COMPACT_EVERY, max_age_seconds: int = DRAFT_MAX_AGE_SECONDS,
+                 purge_interval: float = DRAFT_PURGE_INTERVAL):
+        self.path = path
+        self.save_delay = save_delay
+        self.compact_every = compact_every
+        self.max_age_seconds = max_age_seconds
+        self.purge_interval = purge_interval
+        self._condition = threading.Condition()
+        self._pending: Dict[str, Tuple[SavedDraft, float]] = {}  # セッション → (下書き, 書き込む時刻)
+        self._persisted: Dict[str, _Persisted] = {}
+        # ロックの順序は _write_lock → _condition（save() は _condition だけを取り、書き込みを待たない）
+        self._write_lock = threading.Lock()
+        self._next_purge = 0.0
+        ensure_parent_dir(path)
+        with connect(path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS draft_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    theme TEXT,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_draft_entries_session ON draft_entries (session, id)")
+        self._thread = threading.Thread(target=self._run, name="draft-journal", daemon=True)
+        self._thread.start()
+
+    def save(self, session: str, content: str, theme: str = "") -> None:
+        """下書きの保存を予約する（最初の予約から save_delay 秒後に最新の内容を書き込む）"""
+        now = time.time()
+        with self._condition:
+            pending = self._pending.get(session)
+            due = pending[1] if pending is not None else now + self.save_delay
+            self._pending[session] = (SavedDraft(content, theme, now), due)
+            if pending is None:
+                self._condition.notify()
+
+    def restore(self, session: str) -> Optional[SavedDraft]:
+        """最新の下書き（保存待ちを含む）を返す。保存されていなければ None"""
+        with self._condition:
+            pending = self._pending.get(session)
+        if pending is not None:
+            return pending[0]
+        with self._write_lock:
+            persisted = self._load(session)
+        if persisted is None:
+            return None
+        return SavedDraft(persisted.content, persisted.theme, persisted.saved_at)
+
+    def discard(self, session: str) -> None:
+        """提出・中断したセッションの下書きを削除する"""
+        with self._write_lock:
+            with self._condition:
+                self._pending.pop(session, None)
+            with connect(self.path) as conn:
+                conn.execute("DELETE FROM draft_entries WHERE session = ?", (session,))
+            self._persisted.pop(session, None)
+
+    def flush(self) -> None:
+        """保存待ちの下書きをすべて書き込む"""
+        with self._write_lock:
+            self._write(self._take_pending(float("inf")))
+
+    def _take_pending(self, until: float) -> List[Tuple[str, SavedDraft]]:
+        """書き込む時刻が until までの保存待ちを取り出す（_write_lock 内で呼ぶ）"""
+        with self._condition:
+            due = [(session, draft) for session, (draft, at) in self._pending.items() if at <= until]
+            for session, _ in due:
+                del self._pending[session]
+        return due
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                now = time.time()
+                next_at = min((at for _, at in self._pending.values()), default=None)
+                if next_at is None or next_at > now:
+                    self._condition.wait(None if next_at is None else next_at - now)
+                    continue
+            with self._write_lock:
+                due = self._take_pending(time.time())
+                try:
+                    self._write(due)
+                except Exception:
+                    # 書き込みに失敗した下書きは次の保存要求で書き直す（基準を破棄して全文を書く）
+                    for session, _ in due:
+                        self._persisted.pop(session, None)
+
+    def _load(self, session: str) -> Optional[_Persisted]:
+        """書き込み済みの最新の下書きを、最後の全文とそれ以降の差分から組み立てる（_write_lock 内で呼ぶ）"""
+        persisted = self._persisted.get(session)
+        if persisted is not None:
+            return persisted
+        with connect(self.path) as conn:
+            rows = conn.execute(
+                """SELECT kind, payload, theme, created_at FROM draft_entries
+                   WHERE session = ? AND id >= (
+                       SELECT MAX(id) FROM draft_entries WHERE session = ? AND kind = 'full'
+                   ) ORDER BY id""",
+                (session, session)
+            ).fetchall()
+        if not rows:
+            return None
+        content = rows[0][1]
+        for _, payload, _, _ in rows[1:]:
+            content = apply_diff(content, payload)
+        persisted = _Persisted(content, rows[0][2] or "", len(rows) - 1, rows[-1][3])
+        self._persisted[session] = persisted
+        return persisted
+
+    def _write(self, drafts: List[Tuple[str, SavedDraft]]) -> None:
+        """下書きを書き込む（_write_lock 内で呼ぶ）"""
+        if not drafts:
+            return
+        now = time.time()
+        with connect(self.path) as conn:
+            for session, draft in drafts:
+                previous = self._load(session)
+                if previous is not None and previous.content == draft.content and previous.theme == draft.theme:
+                    continue
+                if previous is None or previous.theme != draft.theme or previous.diffs + 1 >= self.compact_every:
+                    cursor = conn.execute(
+                        "INSERT INTO draft_entries (session, kind, payload, theme, created_at) VALUES (?, 'full', ?, ?, ?)",
+                        (session, draft.content, draft.theme, now)
+                    )
+                    conn.execute("DELETE FROM draft_entries WHERE session = ? AND id < ?", (session, cursor.lastrowid))
+                    diffs = 0
+                else:
+                    conn.execute(
+                        "INSERT INTO draft_entries (session, kind, payload, created_at) VALUES (?, 'diff', ?, ?)",
+                        (session, make_diff(previous.content, draft.content), now)
+                    )
+                    diffs = previous.diffs + 1
+                self._persisted[session] = _Persisted(draft.content, draft.theme, diffs, now)
+            if now >= self._next_purge:
+                self._purge(conn, now)
+                self._next_purge = now + self.purge_interval
+
+    def _purge(self, conn, now: float) -> None:
+        """更新が max_age_seconds ない下書きを削除する（全セッションを走査するため purge_interval ごとに1回）"""
+        cutoff = now - self.max_age_seconds
+        conn.execute(
+            """DELETE FROM draft_entries WHERE session IN (
+                SELECT session FROM draft_entries GROUP BY session HAVING MAX(created_at) < ?
+            )""",
+            (cutoff,)
+        )
+        for session in [session for session, persisted in self._persisted.items() if persisted.saved_at < cutoff]:
+            del self._persisted[session]
+
+
+_default_journal: Optional[DraftJournal] = None
+_default_journal_lock = threading.Lock()
+
+
+def get_draft_journal() -> DraftJournal:
+    """プロセス共有の下書きジャーナルを取得（終了時に保存待ちの下書きを書き込む）"""
+    global _default_journal
+    with _default_journal_lock:
+        if _default_journal is None:
+            _default_journal = DraftJournal(cache_path("drafts.sqlite3"))
+            atexit.register(_default_journal.flush)
+        return _default_journal
@@ -1,12 +1,23 @@
-import re
 from typing import List
 from data.models import EssayScore
+from utils.repetition import find_repeated_spans
+from utils.rule_engine import RuleEngine
+
+# 採点ルールで使うキーワード群（RuleEngine で全キーワードをまとめて照合する）
+RULES = RuleEngine({
+    'introduction': ['について', 'において', 'に関して'],
+    'conclusion': ['よって', '従って', '以上', 'このように'],
+    'example': ['例えば', '具体的に', 'たとえば'],
+    'counter_argument': ['一方', 'しかし', 'ただし', 'もっとも'],
+    'logical_connector': ['そのため', 'なぜなら', '理由は', 'その結果', 'このことから'],
+}, data_units='%人件年')
 
 def score_essay(content: str, theme: str) -> EssayScore:
     """小論文の採点を行う"""
     
-    word_count = len(content.replace(' ', '').replace('\n', ''))
-    paragraphs = [p.strip() for p in content.split('\n') if p.strip()]
+    features = RULES.extract(content)
+    word_count = features.word_count
+    paragraph_count = features.paragraph_count
     
     structure_score = 0
     content_score = 0
@@ -25,7 +36,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
         suggestions.append('重要なポイントに焦点を当て、冗長な表現を削除してください。')
 
     # 構成評価
-    if len(paragraphs) >= 3:
+    if paragraph_count >= 3:
         structure_score += 15
         feedback.append('適切な段落構成が確認できます。')
     else:
@@ -34,8 +45,8 @@ def score_essay(content: str, theme: str) -> EssayScore:
         suggestions.append('序論で問題提起、本論で論証、結論でまとめという構成を心がけてください。')
 
     # 序論・結論の確認
-    has_introduction = any(keyword in content for keyword in ['について', 'において', 'に関して'])
-    has_conclusion = any(keyword in content for keyword in ['よって', '従って', '以上', 'このように'])
+    has_introduction = features.has('introduction')
+    has_conclusion = features.has('conclusion')
     
     if has_introduction:
         structure_score += 5
@@ -48,8 +59,8 @@ def score_essay(content: str, theme: str) -> EssayScore:
         suggestions.append('結論部分で自分の主張を明確にまとめてください。')
 
     # 内容評価
-    has_examples = any(keyword in content for keyword in ['例えば', '具体的に', 'たとえば'])
-    has_data = bool(re.search(r'\d+%|\d+人|\d+件|\d+年', content))
+    has_examples = features.has('example')
+    has_data = features.has_data()
     
     if has_examples:
         content_score += 10
@@ -64,7 +75,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
         suggestions.append('可能であれば、統計データや数値を用いて論証を補強してください。')
 
     # 反対意見への言及
-    has_counter_argument = any(keyword in content for keyword in ['一方', 'しかし', 'ただし', 'もっとも'])
+    has_counter_argument = features.has('counter_argument')
     if has_counter_argument:
         content_score += 5
         logic_score += 10
@@ -73,9 +84,8 @@ def score_essay(content: str, theme: str) -> EssayScore:
         suggestions.append('反対意見にも触れ、より多角的な論述を心がけてください。')
 
     # 論理性評価
-    logical_connectors = ['そのため', 'なぜなら', '理由は', 'その結果', 'このことから']
-    connector_count = sum(content.count(connector) for connector in logical_connectors)
-    
+    connector_count = features.count('logical_connector')
+
     if connector_count >= 2:
         logic_score += 15
         feedback.append('論理的な接続詞が適切に使用されています。')
@@ -85,7 +95,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
 
     # 表現評価
     # 重複表現のチェック
-    repetitive_patterns = re.findall(r'(.{10,})\1', content)
+    repetitive_patterns = find_repeated_spans(content, 10)
     if repetitive_patterns and len(repetitive_patterns) > 2:
         expression_score += 5
         feedback.append('表現に重複が見られます。より多様な表現を心がけてください。')
@@ -93,8 +103,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
         expression_score += 15
 
     # 文章の長さ評価
-    complex_sentences = re.findall(r'[。]{1}[^。]{50,}', content)
-    if complex_sentences:
+    if features.longest_run_after_period >= 50:
         expression_score += 10
         feedback.append('文章の長さが適切で読みやすい構成です。')
     else:
@@ -103,7 +112,7 @@ def score_essay(content: str, theme: str) -> EssayScore:
     # ボーナス点
     if 400 <= word_count <= 800:
         content_score += 5
-    if len(paragraphs) >= 4:
+    if paragraph_count >= 4:
         structure_score += 5
     if theme[:10] in content:
         content_score += 5
@@ -0,0 +1,24 @@
+import os
+import time
+
+import streamlit.components.v1 as components
+
+# ブラウザ側のタイマー（components/exam_timer/index.html）
+_FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "components", "exam_timer")
+_exam_timer = components.declare_component("exam_timer", path=_FRONTEND_DIR)
+
+
+def exam_timer(deadline: float, time_limit: float, key: str = "exam_timer") -> bool:
+    """経過時間・残り時間をブラウザ側で数えるタイマーを表示し、締切を過ぎていれば True を返す
+
+    deadline は締切のサーバー時刻（time.time() の値）、time_limit は制限時間（秒）。
+    表示の更新で Streamlit のスクリプトは再実行されず、締切に達したときに1回だけ再実行される。
+    残り時間は描画時のサーバー時刻を基準に数えるため、ブラウザの時計がずれていても締切は変わらない。
+    締切の判定はサーバー時刻でも行うため、ブラウザからの通知が届かなくても時間切れを検出できる。
+    """
+    now = time.time()
+    # 締切はミリ秒の整数で受け渡し、浮動小数点の往復による誤差なしに比較する
+    deadline_ms = int(round(deadline * 1000))
+    value = _exam_timer(deadline_ms=deadline_ms, server_now=now, time_limit=time_limit, key=key, default=None)
+    expired_in_browser = isinstance(value, dict) and value.get("deadline_ms") == deadline_ms
+    return expired_in_browser or now >= deadline
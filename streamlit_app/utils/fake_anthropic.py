@@ -0,0 +1,181 @@
+"""Anthropic Messages API の代わりに応答するローカルサーバー（ベンチマーク・オフラインでの動作確認用）
+
+使い方（streamlit_app ディレクトリで実行）:
+    python -m utils.fake_anthropic --port 8787 --latency 0.5
+    # ANTHROPIC_BASE_URL=http://127.0.0.1:8787 を指定してアプリを起動する
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Tuple
+
+from utils.scoring_result import ADVICE_FIELD, SCORE_LIMITS, TEXT_FIELDS
+
+# 本文の応答（問題生成・模範解答など）に使う文
+SAMPLE_SENTENCE = "デジタル技術の進展は社会の在り方を大きく変えつつあり、その影響を多面的に検討する必要がある。"
+
+
+def sample_scoring_input() -> dict:
+    """採点ツールの入力として返す採点結果（全項目が満点の7割）"""
+    fields = {name: limit * 7 // 10 for name, limit in SCORE_LIMITS.items()}
+    fields.update({name: f"{name} の評価。{SAMPLE_SENTENCE * 4}" for name in TEXT_FIELDS})
+    fields[ADVICE_FIELD] = [f"改善点{i}：{SAMPLE_SENTENCE}" for i in range(1, 7)]
+    return fields
+
+
+def _stop_reason(delta_type: str) -> str:
+    return "tool_use" if delta_type == "input_json_delta" else "end_turn"
+
+
+def _chunks(text: str, size: int) -> Iterator[str]:
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class FakeAnthropicServer:
+    """POST /v1/messages に決まった応答を返す HTTP サーバー
+
+    latency は最初のトークン（非ストリーミングでは応答全体）までの待ち時間、
+    chunk_interval はストリーミングの差分ごとの待ち時間。tool_choice でツールの使用が指定されていれば
+    そのツール（"any" なら最初のツール）の tool_use ブロック（入力は採点結果）を、なければ本文を返す。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 chunk_interval: float = 0.0, chunk_chars: int = 20, text_chars: int = 800):
+        self.latency = latency
+        self.chunk_interval = chunk_interval
+        self.chunk_chars = chunk_chars
+        self.text = (SAMPLE_SENTENCE * (text_chars // len(SAMPLE_SENTENCE) + 1))[:text_chars]
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-anthropic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _content(self, request: dict) -> Tuple[dict, str, str]:
+        """(content ブロックの初期値, 差分の種類, 差分で送る本文) を返す"""
+        tool_choice = request.get("tool_choice") or {}
+        if tool_choice.get("type") in ("tool", "any") and request.get("tools"):
+            name = tool_choice.get("name") or request["tools"][0]["name"]
+            block = {"type": "tool_use", "id": "toolu_fake", "name": name, "input": {}}
+            return block, "input_json_delta", json.dumps(sample_scoring_input(), ensure_ascii=False)
+        return {"type": "text", "text": ""}, "text_delta", self.text
+
+    def _message(self, request: dict, content: List[dict], stop_reason: Optional[str]) -> dict:
+        return {
+            "id": f"msg_fake_{self.request_count}",
+            "type": "message",
+            "role": "assistant",
+            "model": request.get("model", "fake"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": {"input_tokens": 0, "output_tokens": 0}
+        }
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                if self.path.split("?")[0] != "/v1/messages":
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                with server._count_lock:
+                    server.request_count += 1
+                time.sleep(server.latency)
+                block, delta_type, body = server._content(request)
+                if request.get("stream"):
+                    self._stream(request, block, delta_type, body)
+                else:
+                    if delta_type == "input_json_delta":
+                        block["input"] = json.loads(body)
+                    else:
+                        block["text"] = body
+                    message = server._message(request, [block], _stop_reason(delta_type))
+                    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+            def _stream(self, request: dict, block: dict, delta_type: str, body: str) -> None:
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("connection", "close")
+                self.end_headers()
+                field = "partial_json" if delta_type == "input_json_delta" else "text"
+                self._event("message_start", {"type": "message_start", "message": server._message(request, [], None)})
+                self._event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": block})
+                for chunk in _chunks(body, server.chunk_chars):
+                    self._event("content_block_delta", {
+                        "type": "content_block_delta", "index": 0, "delta": {"type": delta_type, field: chunk}
+                    })
+                    time.sleep(server.chunk_interval)
+                self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+                self._event("message_delta", {
+                    "type": "message_delta",
+                    "delta": {"stop_reason": _stop_reason(delta_type), "stop_sequence": None},
+                    "usage": {"output_tokens": 0}
+                })
+                self._event("message_stop", {"type": "message_stop"})
+                self.close_connection = True
+
+            def _event(self, name: str, data: dict) -> None:
+                self.wfile.write(f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m utils.fake_anthropic", description="Claude API のローカル代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0, help="最初のトークンまでの待ち時間（秒）")
+    parser.add_argument("--chunk-interval", type=float, default=0.0, help="ストリーミングの差分ごとの待ち時間（秒）")
+    args = parser.parse_args(argv)
+
+    server = FakeAnthropicServer(args.host, args.port, args.latency, args.chunk_interval)
+    print(f"{server.base_url} で待ち受けています（Ctrl+C で終了）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import time
+from typing import Optional
+
+from utils.score_cache import normalize_essay
+from utils.storage import cache_path, connect, ensure_parent_dir
+
+
+def theme_hash(theme: str) -> str:
+    """テーマ文のハッシュ（空白・全角半角の揺れは同一視）"""
+    return hashlib.sha256(normalize_essay(theme).encode('utf-8')).hexdigest()
+
+
+class ModelAnswerStore:
+    """テーマ・大学・学部・プロンプト版ごとに模範解答を保存するSQLiteストア"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        with connect(path) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS model_answers (
+                    theme_hash TEXT NOT NULL,
+                    university TEXT NOT NULL,
+                    faculty TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    theme TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (theme_hash, university, faculty, prompt_version)
+                )"""
+            )
+
+    def get(self, theme: str, university: str, faculty: str, prompt_version: str) -> Optional[str]:
+        """保存済みの模範解答を取得（未保存なら None）"""
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                """SELECT answer FROM model_answers
+                   WHERE theme_hash = ? AND university = ? AND faculty = ? AND prompt_version = ?""",
+                (theme_hash(theme), university, faculty, prompt_version)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, theme: str, university: str, faculty: str, prompt_version: str, answer: str) -> None:
+        """模範解答を保存（同じキーは上書き）"""
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO model_answers
+                   (theme_hash, university, faculty, prompt_version, theme, answer, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (theme_hash(theme), university, faculty, prompt_version, theme, answer, time.time())
+            )
+
+    def purge_other_versions(self, prompt_version: str) -> int:
+        """指定した版以外の模範解答を削除し、削除件数を返す"""
+        with self._lock, connect(self.path) as conn:
+            return conn.execute(
+                "DELETE FROM model_answers WHERE prompt_version != ?", (prompt_version,)
+            ).rowcount
+
+
+_default_store: Optional[ModelAnswerStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_model_answer_store() -> ModelAnswerStore:
+    """プロセス共有の模範解答ストアを取得"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = ModelAnswerStore(cache_path("model_answers.sqlite3"))
+        return _default_store
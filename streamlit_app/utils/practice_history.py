@@ -0,0 +1,240 @@
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from utils.scoring_result import SCORE_LIMITS
+from utils.storage import cache_path, connect, ensure_parent_dir
+
+# 集計する評価観点（採点結果の表示用辞書のキー）と満点
+AXES = tuple(key[:-len("_score")] for key in SCORE_LIMITS)
+AXIS_LIMITS = {axis: SCORE_LIMITS[f"{axis}_score"] for axis in AXES}
+
+# 学習者全体の集計は大学・学部・学科を空文字にして保存する
+ALL_DEPARTMENTS = ("", "", "")
+
+_SUM_COLUMNS = ("total_sum",) + tuple(f"{axis}_sum" for axis in AXES)
+
+
+@dataclass(frozen=True)
+class Attempt:
+    """1回分の練習記録"""
+    id: int
+    student: str
+    university: str
+    faculty: str
+    department: str
+    question: str
+    essay: str
+    total: int
+    scores: Dict[str, int]
+    time_spent: Optional[float]
+    feedback: dict
+    created_at: float
+
+
+@dataclass(frozen=True)
+class ScoreSummary:
+    """練習回数と観点ごとの平均点"""
+    attempts: int
+    average_total: float
+    averages: Dict[str, float]
+    best_total: int
+    last_at: float
+
+
+@dataclass(frozen=True)
+class WeeklyStats:
+    """週ごとの練習回数と平均点（week はその週の月曜日）"""
+    week: date
+    attempts: int
+    average_total: float
+    averages: Dict[str, float]
+    best_total: int
+
+
+def week_start(timestamp: float) -> date:
+    """timestamp を含む週の月曜日（サーバーのタイムゾーン）"""
+    day = datetime.fromtimestamp(timestamp).date()
+    return day - timedelta(days=day.weekday())
+
+
+def _summary_from_row(attempts: int, sums: Tuple[float, ...], best_total: int) -> Tuple[float, Dict[str, float], int]:
+    average_total = sums[0] / attempts
+    averages = {axis: value / attempts for axis, value in zip(AXES, sums[1:])}
+    return average_total, averages, best_total
+
+
+class PracticeHistory:
+    """練習履歴を SQLite に保存し、学習者ごとの集計を記録のたびに更新する
+
+    答案・講評を含む記録は attempts に追記し、学習者×学科（と学習者全体）・学習者×週の
+    合計値は同じトランザクションで attempt_stats・weekly_stats に加算する。
+    成績画面の集計は記録を走査せず、集計表の数行を読むだけで済む。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        axis_columns = "".join(f"{axis} INTEGER NOT NULL,\n" for axis in AXES)
+        sum_columns = "".join(f"{column} REAL NOT NULL,\n" for column in _SUM_COLUMNS)
+        with connect(path) as conn:
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS attempts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    student TEXT NOT NULL,
+                    university TEXT NOT NULL,
+                    faculty TEXT NOT NULL,
+                    department TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    essay TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    {axis_columns}time_spent REAL,
+                    feedback TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_attempts_student ON attempts (student, created_at)")
+            conn.execute(
+                """CREATE INDEX IF NOT EXISTS idx_attempts_department
+                   ON attempts (student, university, faculty, department, created_at)"""
+            )
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS attempt_stats (
+                    student TEXT NOT NULL,
+                    university TEXT NOT NULL,
+                    faculty TEXT NOT NULL,
+                    department TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    {sum_columns}best_total INTEGER NOT NULL,
+                    last_at REAL NOT NULL,
+                    PRIMARY KEY (student, university, faculty, department)
+                )"""
+            )
+            conn.execute(
+                f"""CREATE TABLE IF NOT EXISTS weekly_stats (
+                    student TEXT NOT NULL,
+                    week TEXT NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    {sum_columns}best_total INTEGER NOT NULL,
+                    PRIMARY KEY (student, week)
+                )"""
+            )
+
+    def record(self, student: str, university: str, faculty: str, department: str, question: str,
+               essay: str, score: dict, time_spent: Optional[float] = None,
+               created_at: Optional[float] = None) -> int:
+        """採点結果（表示用の辞書）を記録し、集計を更新する。記録の id を返す"""
+        created_at = time.time() if created_at is None else created_at
+        total = int(score["total"])
+        axis_scores = [int(score[axis]["score"]) for axis in AXES]
+        sums = [total] + axis_scores
+        with self._lock, connect(self.path) as conn:
+            cursor = conn.execute(
+                f"""INSERT INTO attempts (student, university, faculty, department, question, essay, total,
+                    {", ".join(AXES)}, time_spent, feedback, created_at)
+                    VALUES ({", ".join("?" * (10 + len(AXES)))})""",
+                [student, university, faculty, department, question, essay, total] + axis_scores
+                + [time_spent, json.dumps(score, ensure_ascii=False), created_at]
+            )
+            for scope in ((university, faculty, department), ALL_DEPARTMENTS):
+                conn.execute(
+                    f"""INSERT INTO attempt_stats (student, university, faculty, department, attempts,
+                        {", ".join(_SUM_COLUMNS)}, best_total, last_at)
+                        VALUES (?, ?, ?, ?, 1, {", ".join("?" * len(_SUM_COLUMNS))}, ?, ?)
+                        ON CONFLICT (student, university, faculty, department) DO UPDATE SET
+                        attempts = attempts + 1, {self._accumulate()},
+                        best_total = MAX(best_total, excluded.best_total),
+                        last_at = MAX(last_at, excluded.last_at)""",
+                    [student, *scope] + sums + [total, created_at]
+                )
+            conn.execute(
+                f"""INSERT INTO weekly_stats (student, week, attempts, {", ".join(_SUM_COLUMNS)}, best_total)
+                    VALUES (?, ?, 1, {", ".join("?" * len(_SUM_COLUMNS))}, ?)
+                    ON CONFLICT (student, week) DO UPDATE SET
+                    attempts = attempts + 1, {self._accumulate()},
+                    best_total = MAX(best_total, excluded.best_total)""",
+                [student, week_start(created_at).isoformat()] + sums + [total]
+            )
+        return cursor.lastrowid
+
+    @staticmethod
+    def _accumulate() -> str:
+        return ", ".join(f"{column} = {column} + excluded.{column}" for column in _SUM_COLUMNS)
+
+    def summary(self, student: str, university: str = "", faculty: str = "",
+                department: str = "") -> Optional[ScoreSummary]:
+        """学習者の集計（学科を指定しなければ全体）。記録がなければ None"""
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                f"""SELECT attempts, {", ".join(_SUM_COLUMNS)}, best_total, last_at FROM attempt_stats
+                    WHERE student = ? AND university = ? AND faculty = ? AND department = ?""",
+                (student, university, faculty, department)
+            ).fetchone()
+        if row is None:
+            return None
+        return ScoreSummary(row[0], *_summary_from_row(row[0], row[1:-2], row[-2]), row[-1])
+
+    def department_summaries(self, student: str) -> List[Tuple[Tuple[str, str, str], ScoreSummary]]:
+        """学科ごとの集計（最近練習した順）"""
+        with self._lock, connect(self.path) as conn:
+            rows = conn.execute(
+                f"""SELECT university, faculty, department, attempts, {", ".join(_SUM_COLUMNS)}, best_total, last_at
+                    FROM attempt_stats WHERE student = ? AND department != '' ORDER BY last_at DESC""",
+                (student,)
+            ).fetchall()
+        return [
+            (tuple(row[:3]), ScoreSummary(row[3], *_summary_from_row(row[3], row[4:-2], row[-2]), row[-1]))
+            for row in rows
+        ]
+
+    def weekly_trend(self, student: str, weeks: int = 52) -> List[WeeklyStats]:
+        """直近 weeks 週の週ごとの集計（古い順・練習のない週は含まない）"""
+        since = (week_start(time.time()) - timedelta(weeks=weeks - 1)).isoformat()
+        with self._lock, connect(self.path) as conn:
+            rows = conn.execute(
+                f"""SELECT week, attempts, {", ".join(_SUM_COLUMNS)}, best_total FROM weekly_stats
+                    WHERE student = ? AND week >= ? ORDER BY week""",
+                (student, since)
+            ).fetchall()
+        return [
+            WeeklyStats(date.fromisoformat(row[0]), row[1], *_summary_from_row(row[1], row[2:-1], row[-1]))
+            for row in rows
+        ]
+
+    def recent_attempts(self, student: str, limit: int = 20) -> List[Attempt]:
+        """最近の練習記録（新しい順）"""
+        with self._lock, connect(self.path) as conn:
+            rows = conn.execute(
+                f"""SELECT id, student, university, faculty, department, question, essay, total,
+                    {", ".join(AXES)}, time_spent, feedback, created_at
+                    FROM attempts WHERE student = ? ORDER BY created_at DESC LIMIT ?""",
+                (student, limit)
+            ).fetchall()
+        attempts = []
+        for row in rows:
+            axis_end = 8 + len(AXES)
+            attempts.append(Attempt(
+                *row[:8],
+                scores=dict(zip(AXES, row[8:axis_end])),
+                time_spent=row[axis_end],
+                feedback=json.loads(row[axis_end + 1]),
+                created_at=row[axis_end + 2]
+            ))
+        return attempts
+
+
+_default_history: Optional[PracticeHistory] = None
+_default_history_lock = threading.Lock()
+
+
+def get_practice_history() -> PracticeHistory:
+    """プロセス共有の練習履歴を取得"""
+    global _default_history
+    with _default_history_lock:
+        if _default_history is None:
+            _default_history = PracticeHistory(cache_path("practice_history.sqlite3"))
+        return _default_history
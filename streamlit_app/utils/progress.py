@@ -0,0 +1,38 @@
+import time
+from typing import Callable, Dict, Optional
+
+# 処理段階ごとの表示文言と進捗率（実際の処理の区切りでのみ進める）
+STAGES = {
+    "prompt": ("📝 プロンプトを作成中...", 0.1),
+    "request": ("📡 Claudeにリクエストを送信しました。応答を待っています...", 0.25),
+    "first_token": ("✍️ Claudeが回答を生成中...", 0.5),
+    "parse": ("🔍 評価結果を解析中...", 0.85),
+    "render": ("📊 結果を表示中...", 1.0),
+}
+
+
+class ProgressReporter:
+    """実際の処理段階に合わせて進捗を通知する
+
+    on_stage には (表示文言, 進捗率 0.0-1.0) が渡される。各段階の経過時間は timings に記録する。
+    """
+
+    def __init__(self, on_stage: Optional[Callable[[str, float], None]] = None):
+        self.on_stage = on_stage
+        self.timings: Dict[str, float] = {}
+        self._started_at = time.monotonic()
+
+    def stage(self, name: str) -> None:
+        """処理段階 name に到達したことを通知"""
+        if name in self.timings:
+            return
+        self.timings[name] = time.monotonic() - self._started_at
+        if self.on_stage is not None:
+            label, fraction = STAGES[name]
+            self.on_stage(label, fraction)
+
+
+def report_stage(progress: Optional[ProgressReporter], name: str) -> None:
+    """progress が指定されている場合のみ段階を通知"""
+    if progress is not None:
+        progress.stage(name)
@@ -0,0 +1,323 @@
+# Claude API に送るプロンプトと生成パラメータ（アプリ画面とバッチ処理で共有）
+import json
+from typing import Sequence
+
+from utils.scoring_result import (
+    CATEGORY_ADVICE_FIELD, CATEGORY_LIMIT, CATEGORY_NAMES, SUMMARY_FIELD, ScoringResult, parse_fields
+)
+
+# 模範解答生成
+MODEL_ANSWER_MODEL = "claude-3-haiku-20240307"
+MODEL_ANSWER_MAX_TOKENS = 1500
+MODEL_ANSWER_TEMPERATURE = 0.7
+# プロンプト・生成パラメータを変更したら更新する（保存済みの模範解答を作り直すため）
+MODEL_ANSWER_PROMPT_VERSION = "2026-v1"
+
+
+def build_model_answer_prompt(theme: str, university: str, faculty: str) -> str:
+    """模範解答生成用のプロンプトを作成"""
+    return f"""
+あなたは{university}{faculty}の入試対策専門講師です。以下の小論文テーマに対する模範解答を作成してください。
+
+【テーマ】
+{theme}
+
+【要求事項】
+1. {faculty}の専門性を活かした内容
+2. 大学入試で高評価を得るレベル
+3. 800-1000文字程度
+4. 序論・本論・結論の明確な構成
+5. 具体例やデータの適切な活用
+6. 論理的で説得力のある論述
+7. 反対意見への配慮も含める
+
+【注意点】
+- 「である調」で統一
+- 専門用語は適切に使用
+- 現実的で実現可能な提案を含める
+- 読み手を意識した表現
+
+模範解答のみを出力してください。解説は不要です。
+"""
+
+
+def model_answer_request(theme: str, university: str, faculty: str) -> dict:
+    """模範解答生成の messages.create 引数一式を作成"""
+    return {
+        "model": MODEL_ANSWER_MODEL,
+        "max_tokens": MODEL_ANSWER_MAX_TOKENS,
+        "temperature": MODEL_ANSWER_TEMPERATURE,
+        "messages": [
+            {"role": "user", "content": build_model_answer_prompt(theme, university, faculty)}
+        ]
+    }
+
+
+# 詳細採点
+SCORING_MODEL = "claude-3-haiku-20240307"
+SCORING_MAX_TOKENS = 2500
+SCORING_TEMPERATURE = 0.2
+# 採点プロンプト・評価基準を変更したら更新する（古いキャッシュを無効化するため）
+SCORING_RUBRIC_VERSION = "2026-v3"
+# プロンプトキャッシュの指定（この位置までの入力が再利用される）
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# 採点基準（全大学・全答案で共通。プロンプトキャッシュの先頭に置くため、
+# 大学名・テーマ・答案・日時などリクエストごとに変わる値を含めないこと）
+SCORING_SYSTEM_PROMPT = """あなたは厳格な大学入試の小論文採点官です。受験生の志望大学・学部の入試基準で、小論文を厳しく評価してください。
+
+【厳格な採点基準（大学入試レベル）】
+1. 構成（25点満点）: 
+   - 序論での問題提起と立場表明の明確性
+   - 本論での論点の整理と段落構成
+   - 結論での主張の再確認と提案
+   - 全体的な論理的流れ
+
+2. 内容（30点満点）:
+   - テーマに対する理解度の深さ
+   - 具体例・データ・事例の適切性と効果性
+   - 志望学部の専門性を活かした視点
+   - 独創性と洞察力
+   - 現実性のある提案
+
+3. 論理性（25点満点）:
+   - 論理的一貫性と因果関係の明確性
+   - 反対意見への言及と反駁
+   - 根拠と主張の適切な関係性
+   - 論点の飛躍や矛盾の有無
+
+4. 表現（20点満点）:
+   - 文体統一と表現の適切性
+   - 語彙の豊富さと専門用語の使用
+   - 文の長さと読みやすさ
+   - 誤字脱字や文法の正確性
+
+【厳しい評価要求】
+- 平均的な受験生なら50-60点が標準
+- 80点以上は上位10%レベル
+- 90点以上は最優秀レベル
+- 具体的な改善点を「〜である」を「〜に変更すべきである」の形で指摘
+- 実際の文章例を引用して問題点を指摘
+- 志望大学・学部の入試レベルに特化した評価
+- 文章の具体的な箇所を特定して改善指導
+
+【出力方法】
+採点結果は必ず submit_score ツールで提出してください。各項目に書く内容はツールの項目説明に従ってください。"""
+
+SCORING_TOOL_NAME = "submit_score"
+SUPPLEMENT_TOOL_NAME = "submit_missing_fields"
+
+# 採点結果の各項目（ツールの入力スキーマとして渡し、この形式での出力を強制する）
+SCORING_PROPERTIES = {
+    "structure_score": {"type": "integer", "minimum": 0, "maximum": 25, "description": "構成の点数"},
+    "content_score": {"type": "integer", "minimum": 0, "maximum": 30, "description": "内容の点数"},
+    "logic_score": {"type": "integer", "minimum": 0, "maximum": 25, "description": "論理性の点数"},
+    "expression_score": {"type": "integer", "minimum": 0, "maximum": 20, "description": "表現の点数"},
+    "structure_evaluation": {
+        "type": "string",
+        "description": "構成の具体的問題点と改善策。序論・本論・結論の各段落を個別に分析し、段落内の論理展開、段落間の接続、全体的な流れを300字以上で詳述。"
+    },
+    "content_evaluation": {
+        "type": "string",
+        "description": "内容の深度、具体例の適切性、志望学部の専門性との関連、独創性、現実性を具体的に分析。不足している具体例、データ、専門的視点を明示し、どのような内容を追加すべきかを300字以上で詳述。"
+    },
+    "logic_evaluation": {
+        "type": "string",
+        "description": "論理的一貫性、因果関係の妥当性、反対意見への配慮、根拠と主張の関係性を詳細分析。論理の飛躍箇所、矛盾点、論証の弱い部分を具体的に指摘し、改善方法を300字以上で詳述。"
+    },
+    "expression_evaluation": {
+        "type": "string",
+        "description": "文体の統一性、語彙の豊富さ、文章の読みやすさ、専門用語の使用、誤字脱字を詳細チェック。文章レベル向上のための具体的修正案を300字以上で詳述。"
+    },
+    "detailed_feedback": {
+        "type": "string",
+        "description": "志望大学・学部の入試基準での総合評価。現在のレベル、合格可能性、重点改善項目、学習計画を含む総合的な指導を400字以上で詳述。"
+    },
+    "specific_advice": {
+        "type": "array",
+        "items": {"type": "string"},
+        "minItems": 6,
+        "description": """次の6観点の具体的な改善指示（各1件）。
+序論の構成について：「[実際の文章の具体的箇所]」を「[具体的な改善文例]」に変更し、問題提起をより明確にすべきである
+本論の論証について：「[論理的に弱い箇所]」に「[具体的なデータや事例]」を追加して説得力を強化すべきである
+結論の提案について：「[抽象的な表現]」を「[具体的で実現可能な提案]」に変更して実践性を高めるべきである
+全体の表現について：「[不適切な表現例]」を「[より適切な学術的表現]」に統一すべきである
+志望学部の専門性について：「[専門性が不足している箇所]」に「[具体的な専門的視点や知識]」を加えて学部適合性を高めるべきである
+文字数と構成について：現在[実際の文字数]字だが、[具体的な増減指示]して全体のバランスを改善すべきである"""
+    }
+}
+
+# ツール定義はプロンプトキャッシュの先頭に含まれるため、不足項目の再生成用ツールも常に一緒に渡す
+SCORING_TOOLS = [
+    {
+        "name": SCORING_TOOL_NAME,
+        "description": "小論文の採点結果を提出する",
+        "input_schema": {"type": "object", "properties": SCORING_PROPERTIES, "required": list(SCORING_PROPERTIES)}
+    },
+    {
+        "name": SUPPLEMENT_TOOL_NAME,
+        "description": "前回の採点結果で不足していた項目だけを提出する",
+        "input_schema": {"type": "object", "properties": SCORING_PROPERTIES}
+    }
+]
+
+
+def build_scoring_persona(university: str, faculty: str) -> str:
+    """採点官の設定（大学・学部ごとに共通。採点基準の次にキャッシュする）"""
+    return f"""【志望大学・学部】
+{university}{faculty}
+
+{university}{faculty}の入試基準で評価し、「志望学部の専門性」は{faculty}の専門性として判断してください。"""
+
+
+def build_scoring_prompt(content: str) -> str:
+    """詳細採点用のプロンプトのうち、答案ごとに変わる部分を作成"""
+    return f"""【受験生の解答】
+{content}"""
+
+
+# tool_choice が変わるとメッセージ部分のキャッシュが使えないため、採点と不足項目の再生成で同じ指定にする
+# （ツールの使用だけを強制し、どちらのツールで提出するかはプロンプトで指示する）
+SCORING_TOOL_CHOICE = {"type": "any"}
+
+
+def _scoring_messages(content: str, theme: str, university: str, faculty: str,
+                      system_prompt: str = SCORING_SYSTEM_PROMPT, tools: list = SCORING_TOOLS,
+                      max_tokens: int = SCORING_MAX_TOKENS) -> dict:
+    return {
+        "model": SCORING_MODEL,
+        "max_tokens": max_tokens,
+        "temperature": SCORING_TEMPERATURE,
+        "tools": tools,
+        "tool_choice": SCORING_TOOL_CHOICE,
+        "system": [
+            {"type": "text", "text": system_prompt, "cache_control": CACHE_CONTROL},
+            {"type": "text", "text": build_scoring_persona(university, faculty), "cache_control": CACHE_CONTROL}
+        ],
+        "messages": [
+            {"role": "user", "content": [
+                {"type": "text", "text": f"【出題テーマ】\n{theme}", "cache_control": CACHE_CONTROL},
+                {"type": "text", "text": build_scoring_prompt(content)}
+            ]}
+        ]
+    }
+
+
+def scoring_request(content: str, theme: str, university: str, faculty: str) -> dict:
+    """詳細採点の messages.create 引数一式を作成
+
+    変わりにくい順（ツール定義・採点基準 → 大学・学部 → 出題テーマ → 答案）に並べ、各区切りにキャッシュ指定を付ける。
+    同じ大学・学部・テーマの答案が続けば、答案以外の入力はキャッシュから読み込まれる。
+    結果は submit_score ツールの入力（JSON）として返させる。
+    """
+    return _scoring_messages(content, theme, university, faculty)
+
+
+def missing_fields_request(content: str, theme: str, university: str, faculty: str,
+                           fields: Sequence[str]) -> dict:
+    """採点結果のうち不足した項目だけを再生成する messages.create 引数一式を作成
+
+    ツール定義・tool_choice・答案までの入力は scoring_request と同じため、
+    採点基準・大学・テーマ部分はキャッシュから読み込まれる。
+    """
+    request = _scoring_messages(content, theme, university, faculty)
+    _append_missing_fields_instruction(request, fields)
+    return request
+
+
+def _append_missing_fields_instruction(request: dict, fields: Sequence[str]) -> None:
+    request["messages"][0]["content"].append({
+        "type": "text",
+        "text": f"【指示】\n次の項目だけを {SUPPLEMENT_TOOL_NAME} ツールで提出してください: {', '.join(fields)}"
+    })
+
+
+# 観点別の詳細採点（ルートの app.py・app_v2.py。各観点25点満点で、観点ごとに評価と改善点を付ける）
+CATEGORY_SCORING_MAX_TOKENS = 4000
+# 観点別の採点プロンプト・評価基準を変更したら更新する（古いキャッシュを無効化するため）
+CATEGORY_SCORING_RUBRIC_VERSION = "category-2026-v1"
+
+CATEGORY_SCORING_SYSTEM_PROMPT = """あなたは厳格な大学入試の小論文採点官です。受験生の志望大学・学部の入試基準で、小論文を厳しく評価してください。
+
+【厳格評価基準】
+以下の4観点を各25点満点（合計100点満点）で厳しく評価してください。
+平均点は60-70点とし、優秀でない限り80点を超えないよう厳正に採点してください。文章の質に応じて点数を大きく変動させてください。
+
+1. 構成（構成・組織化）: 序論・本論・結論の明確性、段落構成、全体の論理的流れ
+2. 内容（内容・論点）: 論点の深度、根拠の妥当性、具体例の適切性、独創性
+3. 論理性（論理性・一貫性）: 論理展開の正確性、矛盾の有無、因果関係の明確性
+4. 表現（表現・文章力）: 語彙力、文章の正確性、読みやすさ、誤字脱字
+
+【詳細要求事項】
+- 文章の長さ、構成、内容、表現を詳細に分析してください
+- 改善点は必ず実際の文章から具体的な部分を引用して指摘してください
+
+【出力方法】
+採点結果は必ず submit_score ツールで提出してください。各項目に書く内容はツールの項目説明に従ってください。"""
+
+
+def _category_property(name: str) -> dict:
+    return {
+        "type": "object",
+        "description": f"{name}の評価",
+        "properties": {
+            "得点": {"type": "integer", "minimum": 0, "maximum": CATEGORY_LIMIT, "description": f"{name}の点数"},
+            "評価": {"type": "string", "description": "この文章特有の問題点と改善方法を400文字以上で詳述"},
+            "改善点": {"type": "string", "description": "実際の文章の具体的な部分を引用し、改善方法を示す"}
+        },
+        "required": ["得点", "評価", "改善点"]
+    }
+
+
+CATEGORY_SCORING_PROPERTIES = {name: _category_property(name) for name in CATEGORY_NAMES}
+CATEGORY_SCORING_PROPERTIES[SUMMARY_FIELD] = {
+    "type": "string",
+    "description": "この文章の特徴を踏まえた厳格な総合判定コメントを200文字以上で"
+}
+CATEGORY_SCORING_PROPERTIES[CATEGORY_ADVICE_FIELD] = {
+    "type": "array",
+    "items": {"type": "string"},
+    "minItems": 8,
+    "description": "この文章に特化した詳細な改善提案を8つ以上"
+}
+
+CATEGORY_SCORING_TOOLS = [
+    {
+        "name": SCORING_TOOL_NAME,
+        "description": "小論文の採点結果を提出する",
+        "input_schema": {"type": "object", "properties": CATEGORY_SCORING_PROPERTIES,
+                         "required": list(CATEGORY_SCORING_PROPERTIES)}
+    },
+    {
+        "name": SUPPLEMENT_TOOL_NAME,
+        "description": "前回の採点結果で不足していた項目だけを提出する",
+        "input_schema": {"type": "object", "properties": CATEGORY_SCORING_PROPERTIES}
+    }
+]
+
+
+def category_scoring_request(content: str, theme: str, university: str, faculty: str) -> dict:
+    """観点別の詳細採点の messages.create 引数一式を作成（並びとキャッシュ指定は scoring_request と同じ）"""
+    return _scoring_messages(content, theme, university, faculty, CATEGORY_SCORING_SYSTEM_PROMPT,
+                             CATEGORY_SCORING_TOOLS, CATEGORY_SCORING_MAX_TOKENS)
+
+
+def category_missing_fields_request(content: str, theme: str, university: str, faculty: str,
+                                    fields: Sequence[str]) -> dict:
+    """観点別の採点結果のうち不足した項目だけを再生成する messages.create 引数一式を作成"""
+    request = category_scoring_request(content, theme, university, faculty)
+    _append_missing_fields_instruction(request, fields)
+    return request
+
+
+def response_json(message) -> str:
+    """messages.create の応答からツール入力（なければ本文）を JSON 文字列として取り出す"""
+    for block in message.content:
+        if block.type == "tool_use":
+            return json.dumps(block.input, ensure_ascii=False)
+    return "".join(block.text for block in message.content if block.type == "text")
+
+
+def parse_scoring_response(response_text: str) -> dict:
+    """Claude の採点応答（JSON）を画面表示用の採点結果に変換（項目が不足していれば ValueError）"""
+    return ScoringResult.from_fields(parse_fields(response_text)).to_display()
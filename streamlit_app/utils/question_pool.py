@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Hashable, Optional
+
+from utils.result_pipeline import submit_task
+
+# 学科ごとに作り置きする予想問題の数
+QUESTION_POOL_SIZE = int(os.getenv("SHORONBUN_QUESTION_POOL_SIZE", "3"))
+
+
+class QuestionPool:
+    """学科ごとに予想問題を作り置きし、取り出して減った分をバックグラウンドで補充する
+
+    作り置きはプロセス内の全セッションで共有する。補充は学科ごとに1問ずつ順に行うため、
+    授業開始時などに同じ学科の生成要求が集中しても API への同時リクエストは学科あたり1件に抑えられる。
+    """
+
+    def __init__(self, size: int = QUESTION_POOL_SIZE,
+                 submit: Callable[..., Future] = submit_task):
+        self.size = size
+        self._submit = submit
+        self._lock = threading.Lock()
+        self._questions: Dict[Hashable, Deque[str]] = {}
+        self._filling: Dict[Hashable, bool] = {}
+
+    def available(self, key: Hashable) -> int:
+        """key の作り置き数"""
+        with self._lock:
+            return len(self._questions.get(key, ()))
+
+    def fill(self, key: Hashable, generate: Callable[[], str]) -> None:
+        """key の作り置きが size 件になるまで、generate をバックグラウンドで1問ずつ実行する"""
+        with self._lock:
+            if self._filling.get(key) or len(self._questions.get(key, ())) >= self.size:
+                return
+            self._filling[key] = True
+        future = self._submit(generate)
+        future.add_done_callback(lambda done: self._on_generated(key, generate, done))
+
+    def _on_generated(self, key: Hashable, generate: Callable[[], str], future: Future) -> None:
+        question = None
+        try:
+            question = future.result()
+        except Exception:
+            pass
+        finally:
+            # st.stop() などの BaseException で中断された場合も、次の補充を受け付けるようにする
+            with self._lock:
+                self._filling[key] = False
+                questions = self._questions.setdefault(key, deque())
+                added = bool(question) and question not in questions
+                if added:
+                    questions.append(question)
+        # 生成に失敗した・作り置きと重複した場合は次に取り出されるまで補充しない
+        # （生成できる問題の種類が作り置きの数より少ない場合に、生成を繰り返し続けないように）
+        if added:
+            self.fill(key, generate)
+
+    def take(self, key: Hashable, generate: Callable[[], str]) -> Optional[str]:
+        """作り置きを1問取り出し（なければ None）、減った分の補充を始める"""
+        with self._lock:
+            questions = self._questions.get(key)
+            question = questions.popleft() if questions else None
+        self.fill(key, generate)
+        return question
+
+
+_default_pool: Optional[QuestionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_question_pool() -> QuestionPool:
+    """プロセス共有の予想問題の作り置きを取得"""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = QuestionPool()
+        return _default_pool
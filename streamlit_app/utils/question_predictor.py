@@ -1,73 +1,380 @@
+"""過去問テーマの出題傾向から次年度の予想問題を生成する
+
+学科ごと（と学部・大学単位の集計）に、時事トピックと頻出語の出題年・出題形式を集計し、
+新しい年の出題ほど重く、出題が増えているトピックほど重くした重み付き抽選で予想問題を作る。
+乱数の種は「大学/学部/学科/対象年度」から決めるため、同じデータからは常に同じ予想問題になる。
+
+全学科分をまとめて事前生成する（streamlit_app ディレクトリで実行）:
+    python -m utils.question_predictor
+"""
+import argparse
+import json
+import os
 import random
+import re
+import sys
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import List
-from data.models import PastQuestion, PredictedQuestion
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from data.catalog import load_catalog
+from data.models import PastQuestion, PredictedQuestion, University
+from utils.storage import cache_path, ensure_parent_dir
+from utils.tokenizer import analyze
+
+# 事前生成した予想問題の保存先
+PREDICTIONS_PATH = cache_path("predictions.json")
+# 予想方法を変えたら更新する（古い版で事前生成した予想問題は使わない）
+PREDICTOR_VERSION = "1"
+# 1学科あたりに用意する予想問題の数
+PREDICTIONS_PER_DEPARTMENT = 5
+
+# 出題年が1年古くなるごとに掛ける重み
+RECENCY_DECAY = 0.7
+# 学部・大学単位の傾向を学科の傾向に混ぜる割合（学科の過去問が少なくても偏りすぎないように）
+# 頻出語は分野が異なると当てはまらないため、大学単位の傾向は時事トピックにだけ混ぜる
+FACULTY_BACKOFF = 0.5
+UNIVERSITY_BACKOFF = 0.25
+# 過去に出題のない時事トピック・学部分野の語にも与える重み
+TOPIC_PRIOR = 0.3
+CONTEXT_PRIOR = 0.3
+# 出題が減っているトピックでも重みをこの割合より下げない
+MIN_TREND_FACTOR = 0.2
+
+# 時事トピックと、過去問テーマでそのトピックとみなす語
+TREND_TOPICS = {
+    'デジタル化': ['デジタル', 'DX', 'オンライン', 'SNS', 'TikTok', 'Twitter', 'メディア', '情報社会', 'インターネット'],
+    'AI・人工知能': ['AI', '人工知能', '機械学習'],
+    '持続可能性': ['持続可能', 'SDGs', 'ESG'],
+    '気候変動': ['環境', '気候', '脱炭素', 'カーボン'],
+    'グローバル化': ['グローバル', '国際', '異文化', '多言語'],
+    '多様性と包摂': ['多様性', '包摂', 'ダイバーシティ', 'インクルージョン', '女性', 'ジェンダー'],
+    '少子高齢化': ['高齢化', '少子', '人口減少'],
+    '働き方改革': ['働き方', '雇用', '労働', 'リスキリング'],
+    'ポストコロナ': ['コロナ', '感染症', 'パンデミック'],
+    'イノベーション': ['イノベーション', 'スタートアップ', '起業', '革新'],
+    '経済格差': ['格差', '貧困'],
+}
+
+# 学部・学科名に含まれる語ごとの分野の語（過去問の少ない学科の予想にも使う）
+DOMAIN_CONTEXTS = {
+    '政治': ['民主主義', '政策立案', '国際関係', '公共政策', '行政改革', '地方創生'],
+    '経済': ['市場経済', '金融政策', '産業構造', '労働市場', '国際貿易', '経済格差'],
+    '法': ['法の支配', '人権保護', '司法制度', '国際法', '企業法務'],
+    '商': ['企業経営', 'マーケティング', 'ビジネスモデル', '起業'],
+    '外国語': ['国際コミュニケーション', '多言語社会', '異文化理解', '言語教育', '翻訳技術'],
+    '国際': ['国際協力', '異文化理解', '国際社会'],
+    '情報': ['情報社会', 'デジタル技術', 'メディア', 'コミュニケーション', 'プライバシー'],
+    '教養': ['人文学', '学際研究', '批判的思考', '文化研究', '総合知'],
+    'スポーツ': ['スポーツ', '健康づくり', '地域スポーツ', '競技力'],
+    'ウェルネス': ['ウェルネス', '健康', '生涯スポーツ'],
+    '文学': ['表現', '文化', '芸術', '言語'],
+    '教育': ['学習', '人材育成', '教育制度', '生涯学習'],
+    '医学': ['健康', '医療技術', '予防医学', '医療倫理'],
+    '工学': ['技術革新', 'ものづくり', '環境技術', 'インフラ'],
+    '理学': ['科学技術', '研究', '自然科学', 'データサイエンス'],
+}
+DEFAULT_CONTEXTS = ['社会', '地域社会', '教育', '文化']
+
+# 頻出語として数えない語（どのテーマにも現れる一般的な語・設問の指示）
+GENERIC_NOUNS = {
+    '課題', '役割', '影響', '可能性', '意義', '関係', '解決策', '在り方', '現代', '現代社会', '社会', '重要性',
+    '価値', '具体例', '具体的', '事例', '時代', '未来', '今後', '変化', '発展', '実現', '実践', '実践的', '本文',
+    '文章', '議論', '主張', '考え', '筆者', '論旨', '長文読解型', '以上', '以内', '前後', '字', '問', '取り組み',
+    '促進', '両立', '調和', '関連', '向', '通', '限界', '意味', '問題', '方法', '進化', '普及', '導入', '活用', '保護',
+    '見方', '適用', '影響力', 'アプリ', '短答式',
+}
+KEYWORD_PATTERN = re.compile(r"[一-龯々ァ-ヴーA-Za-z]{2,}")
+# 出題形式の表示・字数などの注記（頻出語の集計から除く）
+ANNOTATION_PATTERN = re.compile(r"【[^】]*】|（[^）]*）|\([^)]*\)")
+
+# 出題形式（設問の指示）
+INSTRUCTIONS = ['論じなさい', '述べなさい']
+EXAMPLE_PATTERN = re.compile(r"具体例|具体的な事例")
+
+QUESTION_TEMPLATES = [
+    "{trend}が注目される現代において、{context}はどのような課題に直面し、どのような解決策が考えられるか、{example}{instruction}。",
+    "{trend}が{context}に与える影響について、メリットとデメリットを比較し、{example}今後の在り方を{instruction}。",
+    "{trend}を背景とした社会の変化の中で、{context}が果たすべき役割と課題について、{example}{instruction}。",
+    "{trend}と{context}の関係について、{example}あなたの考えを{instruction}。",
+    "{context}における{trend}の意義と課題について、{example}{instruction}。",
+]
+
+
+@dataclass
+class TrendStatistics:
+    """過去問テーマの出題傾向（学科・学部・大学のいずれか1つ分）"""
+    years: List[int] = field(default_factory=list)  # 各過去問の出題年
+    topic_years: Dict[str, List[int]] = field(default_factory=dict)  # 時事トピック → 出題年
+    keyword_years: Dict[str, List[int]] = field(default_factory=dict)  # 頻出語 → 出題年
+    instruction_counts: Dict[str, int] = field(default_factory=dict)
+    example_count: int = 0  # 具体例を求める設問の数
+
+    @property
+    def question_count(self) -> int:
+        return len(self.years)
+
+    @property
+    def latest_year(self) -> Optional[int]:
+        return max(self.years, default=None)
+
+    def add(self, question: PastQuestion) -> None:
+        self.years.append(question.year)
+        for topic in detect_topics(question.theme):
+            self.topic_years.setdefault(topic, []).append(question.year)
+        for keyword in extract_keywords(question.theme):
+            self.keyword_years.setdefault(keyword, []).append(question.year)
+        for instruction in INSTRUCTIONS:
+            if instruction in question.theme:
+                self.instruction_counts[instruction] = self.instruction_counts.get(instruction, 0) + 1
+        if EXAMPLE_PATTERN.search(question.theme):
+            self.example_count += 1
+
+    def merge(self, other: "TrendStatistics") -> None:
+        """他の集計結果を足し合わせる（学部・大学単位の集計用）"""
+        self.years.extend(other.years)
+        for source, target in ((other.topic_years, self.topic_years), (other.keyword_years, self.keyword_years)):
+            for key, years in source.items():
+                target.setdefault(key, []).extend(years)
+        for instruction, count in other.instruction_counts.items():
+            self.instruction_counts[instruction] = self.instruction_counts.get(instruction, 0) + count
+        self.example_count += other.example_count
+
+    def trend(self, years: Sequence[int]) -> float:
+        """出題年の一覧から、1年あたりの出題数の増減（最小二乗法の傾き）を求める"""
+        all_years = sorted(set(self.years))
+        if len(all_years) < 2:
+            return 0.0
+        counts = [years.count(year) for year in all_years]
+        mean_year = sum(all_years) / len(all_years)
+        mean_count = sum(counts) / len(counts)
+        variance = sum((year - mean_year) ** 2 for year in all_years)
+        covariance = sum((year - mean_year) * (count - mean_count) for year, count in zip(all_years, counts))
+        return covariance / variance
+
+    def weights(self, occurrences: Dict[str, List[int]], target_year: int) -> Dict[str, float]:
+        """語ごとの重み（新しい出題ほど重く、出題が増えている語ほど重い）"""
+        weights = {}
+        for key, years in occurrences.items():
+            recency = sum(RECENCY_DECAY ** max(target_year - year - 1, 0) for year in years)
+            weights[key] = recency * max(MIN_TREND_FACTOR, 1 + self.trend(years))
+        return weights
+
+
+def detect_topics(theme: str) -> List[str]:
+    """テーマ文に含まれる時事トピック"""
+    return [topic for topic, words in TREND_TOPICS.items() if any(word in theme for word in words)]
+
+
+def extract_keywords(theme: str) -> List[str]:
+    """テーマ文の頻出語の候補（一般的な語・時事トピックの語を除いた名詞）"""
+    keywords = []
+    for token in analyze(ANNOTATION_PATTERN.sub("", theme)).content_words:
+        word = token.base
+        if token.pos != '名詞' or word in GENERIC_NOUNS or not KEYWORD_PATTERN.fullmatch(word):
+            continue
+        if any(word in alias or alias in word for aliases in TREND_TOPICS.values() for alias in aliases):
+            continue
+        if word not in keywords:
+            keywords.append(word)
+    return keywords
+
+
+def build_statistics(universities: Iterable[University]) -> Dict[Tuple[str, ...], TrendStatistics]:
+    """学科・学部・大学ごとの出題傾向を集計する
+
+    キーは (大学名, 学部名, 学科名)・(大学名, 学部名)・(大学名,)。
+    """
+    statistics: Dict[Tuple[str, ...], TrendStatistics] = {}
+    for university in universities:
+        university_stats = statistics.setdefault((university.name,), TrendStatistics())
+        for faculty in university.faculties:
+            faculty_stats = statistics.setdefault((university.name, faculty.name), TrendStatistics())
+            for department in faculty.departments:
+                department_stats = TrendStatistics()
+                for question in department.past_questions:
+                    department_stats.add(question)
+                statistics[(university.name, faculty.name, department.name)] = department_stats
+                faculty_stats.merge(department_stats)
+            university_stats.merge(faculty_stats)
+    return statistics
+
+
+@lru_cache(maxsize=256)
+def get_university_statistics(university: str) -> Dict[Tuple[str, ...], TrendStatistics]:
+    """大学データにある大学の出題傾向（大学ごとに1回だけ集計する）"""
+    matched = [u for u in load_catalog().universities if u.name == university]
+    return build_statistics(matched)
+
+
+def _blend(*weighted: Tuple[float, Dict[str, float]]) -> Dict[str, float]:
+    blended: Dict[str, float] = {}
+    for ratio, weights in weighted:
+        for key, weight in weights.items():
+            blended[key] = blended.get(key, 0.0) + ratio * weight
+    return blended
+
+
+def _domain_contexts(faculty: str, department: str) -> List[str]:
+    contexts = []
+    for key, values in DOMAIN_CONTEXTS.items():
+        if key in faculty or key in department:
+            contexts.extend(value for value in values if value not in contexts)
+    return contexts or DEFAULT_CONTEXTS
+
+
+def _weighted_choice(rng: random.Random, weights: Dict[str, float]) -> str:
+    keys = sorted(weights)
+    return rng.choices(keys, weights=[weights[key] for key in keys])[0]
+
+
+def predict_themes(
+    university: str,
+    faculty: str,
+    department: str,
+    past_questions: Tuple[PastQuestion, ...] = (),
+    count: int = PREDICTIONS_PER_DEPARTMENT,
+    target_year: Optional[int] = None
+) -> List[str]:
+    """学科の予想問題を重複なく count 件作る（同じ入力からは常に同じ結果になる）
+
+    大学データにない大学は past_questions だけから傾向を集計する。
+    """
+    statistics = get_university_statistics(university)
+    department_stats = statistics.get((university, faculty, department))
+    if department_stats is None:
+        department_stats = TrendStatistics()
+        for question in past_questions:
+            department_stats.add(question)
+    faculty_stats = statistics.get((university, faculty), TrendStatistics())
+    university_stats = statistics.get((university,), TrendStatistics())
+    if target_year is None:
+        target_year = (department_stats.latest_year or datetime.now().year) + 1
+
+    topic_weights = _blend(
+        (TOPIC_PRIOR, {topic: 1.0 for topic in TREND_TOPICS}),
+        (1.0, department_stats.weights(department_stats.topic_years, target_year)),
+        (FACULTY_BACKOFF, faculty_stats.weights(faculty_stats.topic_years, target_year)),
+        (UNIVERSITY_BACKOFF, university_stats.weights(university_stats.topic_years, target_year))
+    )
+    context_weights = _blend(
+        (CONTEXT_PRIOR, {context: 1.0 for context in _domain_contexts(faculty, department)}),
+        (1.0, department_stats.weights(department_stats.keyword_years, target_year)),
+        (FACULTY_BACKOFF, faculty_stats.weights(faculty_stats.keyword_years, target_year))
+    )
+    instruction_weights = {
+        instruction: 1 + department_stats.instruction_counts.get(instruction, 0) for instruction in INSTRUCTIONS
+    }
+    example_ratio = (department_stats.example_count + 1) / (department_stats.question_count + 2)
+
+    rng = random.Random(f"{university}/{faculty}/{department}/{target_year}")
+    themes: List[str] = []
+    for _ in range(count * 10):
+        if len(themes) >= count:
+            break
+        theme = rng.choice(QUESTION_TEMPLATES).format(
+            trend=_weighted_choice(rng, topic_weights),
+            context=_weighted_choice(rng, context_weights),
+            instruction=_weighted_choice(rng, instruction_weights),
+            example="具体例を挙げて" if rng.random() < example_ratio else ""
+        )
+        if theme not in themes:
+            themes.append(theme)
+    return themes
+
+
+@lru_cache(maxsize=None)
+def load_precomputed_predictions(path: str = PREDICTIONS_PATH) -> Dict[str, List[str]]:
+    """事前生成した予想問題（「大学/学部/学科」→ 予想問題）。ファイルがない・大学データや予想方法が古い場合は空"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("catalog_version") != load_catalog().version or data.get("predictor_version") != PREDICTOR_VERSION:
+        return {}
+    return data["predictions"]
+
+
+@lru_cache(maxsize=1024)
+def get_predicted_themes(
+    university: str,
+    faculty: str,
+    department: str,
+    past_questions: Tuple[PastQuestion, ...] = ()
+) -> List[str]:
+    """学科の予想問題（事前生成済みならそれを使い、なければその場で作って再利用する）"""
+    precomputed = load_precomputed_predictions().get(f"{university}/{faculty}/{department}")
+    if precomputed:
+        return precomputed
+    return predict_themes(university, faculty, department, past_questions)
+
+
+def predict_question(
+    past_questions: Sequence[PastQuestion],
+    university: str,
+    faculty: str,
+    department: str,
+    seed: Optional[int] = None
+) -> str:
+    """用意済みの予想問題から1問選ぶ（seed を指定すると常に同じ問題を返す）"""
+    themes = get_predicted_themes(university, faculty, department, tuple(past_questions))
+    return random.Random(seed).choice(themes)
+
 
 def generate_predicted_question(
     past_questions: List[PastQuestion],
     university: str,
     faculty: str,
-    department: str
+    department: str,
+    seed: Optional[int] = None
 ) -> PredictedQuestion:
     """過去問題データから次年度の予想問題を生成"""
-    
-    time_limit = past_questions[0].time_limit if past_questions else 90
-    
-    current_trends = [
-        'デジタル化',
-        'AI・人工知能',
-        '持続可能性',
-        'グローバル化',
-        '多様性と包摂',
-        '少子高齢化',
-        '環境問題',
-        '働き方改革',
-        'コロナ後の社会',
-        'イノベーション'
-    ]
-
-    subject_contexts = {
-        '政治': ['民主主義', '政策', '国際関係', '社会制度', '公共政策'],
-        '経済': ['経済成長', '市場', '金融', 'グローバル経済', '産業構造'],
-        '法': ['法の支配', '人権', '司法制度', '国際法', '社会規範'],
-        '文学': ['表現', '文化', 'コミュニケーション', '芸術', '言語'],
-        '教育': ['学習', '人材育成', '教育制度', '知識社会', '生涯学習'],
-        '医学': ['健康', '医療技術', '予防医学', '高齢化', '医療倫理'],
-        '工学': ['技術革新', 'ものづくり', '環境技術', 'インフラ', 'デザイン'],
-        '理学': ['科学技術', '研究', '発見', '自然科学', 'データサイエンス']
-    }
 
-    def get_relevant_contexts(faculty_name: str, department_name: str) -> List[str]:
-        contexts = []
-        
-        for key, values in subject_contexts.items():
-            if key in faculty_name or key in department_name:
-                contexts.extend(values)
-        
-        return contexts if contexts else ['社会', '現代', '課題', '解決策', '将来']
-
-    relevant_contexts = get_relevant_contexts(faculty, department)
-    
-    trend_keyword = random.choice(current_trends)
-    context_keyword = random.choice(relevant_contexts)
-    
-    question_templates = [
-        f"{trend_keyword}が進む現代において、{context_keyword}はどのような課題に直面し、どのような解決策が考えられるか、具体例を挙げて論じなさい。",
-        f"{trend_keyword}の発展が{context_keyword}に与える影響について、メリットとデメリットを比較検討し、今後の在り方を論じなさい。",
-        f"現代社会における{trend_keyword}の重要性を踏まえ、{context_keyword}の分野でどのような革新が必要か、あなたの考えを述べなさい。",
-        f"{trend_keyword}を背景とした社会変化の中で、{context_keyword}が果たすべき役割と課題について論じなさい。",
-        f"{trend_keyword}と{context_keyword}の関係性を分析し、持続可能な社会の実現に向けた提言を行いなさい。"
-    ]
-
-    selected_template = random.choice(question_templates)
+    time_limit = past_questions[0].time_limit if past_questions else 90
 
     return PredictedQuestion(
         id=f"predicted-{int(datetime.now().timestamp())}",
-        theme=selected_template,
+        theme=predict_question(past_questions, university, faculty, department, seed),
         time_limit=time_limit,
         generated_at=datetime.now(),
         based_on_questions=[q.id for q in past_questions],
         university=university,
         faculty=faculty,
         department=department
-    )
\ No newline at end of file
+    )
+
+
+def precompute_predictions(universities: Iterable[University],
+                           count: int = PREDICTIONS_PER_DEPARTMENT) -> Dict[str, List[str]]:
+    """全学科の予想問題をまとめて作る"""
+    predictions = {}
+    for university in universities:
+        for faculty in university.faculties:
+            for department in faculty.departments:
+                predictions[f"{university.name}/{faculty.name}/{department.name}"] = predict_themes(
+                    university.name, faculty.name, department.name, count=count
+                )
+    return predictions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="全学科の予想問題を事前生成する")
+    parser.add_argument("-o", "--output", default=PREDICTIONS_PATH, help="出力先のJSONファイル")
+    parser.add_argument("--count", type=int, default=PREDICTIONS_PER_DEPARTMENT, help="1学科あたりの予想問題数")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog()
+    started = datetime.now()
+    predictions = precompute_predictions(catalog.universities, args.count)
+    ensure_parent_dir(args.output)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"catalog_version": catalog.version, "predictor_version": PREDICTOR_VERSION,
+                   "predictions": predictions}, f, ensure_ascii=False, indent=2)
+    elapsed = (datetime.now() - started).total_seconds()
+    print(f"{len(predictions)}学科分の予想問題を保存しました: {args.output}（{elapsed:.1f}秒）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+from dataclasses import dataclass
+from typing import List
+
+# 重複表現の検出対象とする最大文字数（これを超える部分は検出しない）
+MAX_ANALYZED_CHARS = int(os.getenv("SHORONBUN_MAX_ANALYZED_CHARS", "4000"))
+# 解答欄に入力できる最大文字数（貼り付けによる極端に長い入力を受け付けない）
+MAX_ESSAY_CHARS = int(os.getenv("SHORONBUN_MAX_ESSAY_CHARS", "4000"))
+
+
+@dataclass(frozen=True)
+class RepeatedSpan:
+    """同じ文字列が2回続けて現れる箇所（「ABCABC」の unit は「ABC」）"""
+    start: int
+    unit: str
+
+    @property
+    def end(self) -> int:
+        return self.start + 2 * len(self.unit)
+
+
+def find_repeated_spans(content: str, min_length: int, max_chars: int = MAX_ANALYZED_CHARS) -> List[RepeatedSpan]:
+    """min_length 文字以上の文字列が続けて繰り返される箇所を、先頭から重ならないように返す
+
+    re.findall(r'(.{min_length,})\\1', content) と同じ箇所を、同じ優先順位
+    （左端を優先し、同じ位置では最長の繰り返しを採用）で返す。
+    正規表現では長い入力で処理時間が爆発するため、繰り返し単位の長さ L ごとに L 文字おきの
+    基準位置だけを調べる方式（Main–Lorentz と同じ考え方）で O(n log n) 回の比較に抑えている。
+    先頭 max_chars 文字より後ろは検出しない。
+    """
+    spans = []
+    offset = 0
+    for line in content[:max_chars].split("\n"):
+        longest = _longest_repeat_at(line, min_length)
+        position = 0
+        while position < len(line):
+            length = longest[position]
+            if length:
+                spans.append(RepeatedSpan(offset + position, line[position:position + length]))
+                position += 2 * length
+            else:
+                position += 1
+        offset += len(line) + 1
+    return spans
+
+
+def _longest_repeat_at(text: str, min_length: int) -> List[int]:
+    """各位置から始まる「同じ文字列の2回連続」のうち最長の単位長（なければ 0）"""
+    n = len(text)
+    # (単位長, 開始位置の下限, 上限) の一覧
+    ranges = []
+    for length in range(max(min_length, 1), n // 2 + 1):
+        # 長さ 2L の繰り返しは、前半に L の倍数の位置（基準位置 q）をちょうど1つ含む
+        for q in range(0, n - length, length):
+            if text[q] != text[q + length]:
+                continue
+            forward = _common_prefix_length(text, q, q + length, length)
+            backward = _common_suffix_length(text, q, q + length, length - 1)
+            if forward + backward < length:
+                continue
+            ranges.append((length, max(q - backward, q - length + 1), min(q + forward - length, q)))
+
+    # 単位長の長い順に、まだ決まっていない位置へ割り当てる
+    longest = [0] * n
+    next_unassigned = list(range(n + 1))
+
+    def find(position: int) -> int:
+        root = position
+        while next_unassigned[root] != root:
+            root = next_unassigned[root]
+        while next_unassigned[position] != root:
+            next_unassigned[position], position = root, next_unassigned[position]
+        return root
+
+    for length, low, high in sorted(ranges, reverse=True):
+        position = find(low)
+        while position <= high:
+            longest[position] = length
+            next_unassigned[position] = position + 1
+            position = find(position + 1)
+    return longest
+
+
+def _common_prefix_length(text: str, i: int, j: int, limit: int) -> int:
+    """text[i:] と text[j:] の共通接頭辞の長さ（limit で打ち切り）"""
+    limit = min(limit, len(text) - j)
+    if text[i:i + limit] == text[j:j + limit]:
+        return limit
+    # 一致する長さを二分探索する（文字列の比較は1回ずつまとめて行う）
+    low, high = 0, limit - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text[i:i + middle] == text[j:j + middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _common_suffix_length(text: str, i: int, j: int, limit: int) -> int:
+    """text[:i] と text[:j] の共通接尾辞の長さ（limit で打ち切り）"""
+    limit = min(limit, i)
+    if text[i - limit:i] == text[j - limit:j]:
+        return limit
+    low, high = 0, limit - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text[i - middle:i] == text[j - middle:j]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable, MutableMapping, Optional
+
+# 結果画面の並列処理（模範解答生成・次の予想問題の先読み）用ワーカー数
+PIPELINE_WORKERS = int(os.getenv("SHORONBUN_PIPELINE_WORKERS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="result-pipeline")
+
+
+def submit_task(fn: Callable, *args, **kwargs) -> Future:
+    """fn をバックグラウンドで実行する
+
+    ワーカースレッドでは Streamlit の画面要素を描画できないため、fn は結果を戻り値で返すこと。
+    """
+    return _executor.submit(fn, *args, **kwargs)
+
+
+def prefetch(state: MutableMapping, slot: str, key: Hashable, fn: Callable, *args, **kwargs) -> Future:
+    """state[slot] に key 付きでバックグラウンド処理を登録する
+
+    同じ key の処理が登録済みならそれを再利用し、key が異なれば新しく投入し直す。
+    """
+    pending = state.get(slot)
+    if pending is not None and pending[0] == key:
+        return pending[1]
+    future = submit_task(fn, *args, **kwargs)
+    state[slot] = (key, future)
+    return future
+
+
+def take_prefetched(state: MutableMapping, slot: str, key: Hashable,
+                    timeout: Optional[float] = None) -> Optional[Any]:
+    """key が一致する登録済み処理の結果を取り出す（未完了なら完了を待つ）
+
+    未登録・key 不一致・処理失敗の場合は None を返す。
+    """
+    pending = state.get(slot)
+    if pending is None or pending[0] != key:
+        return None
+    del state[slot]
+    try:
+        return pending[1].result(timeout=timeout)
+    except Exception:
+        return None
@@ -0,0 +1,96 @@
+import os
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from utils.essay_scorer import RULES
+from utils.rule_engine import PARAGRAPH_PATTERN, EssayFeatures
+
+# 変更された文字の割合がこれを超える修正版は、差分ではなく全文を採点し直す
+FULL_RESCORE_RATIO = float(os.getenv("SHORONBUN_FULL_RESCORE_RATIO", "0.5"))
+# 特徴量を保持する段落数（修正前後の段落を使い回すため、答案数本分あれば足りる）
+PARAGRAPH_FEATURE_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class ParagraphChange:
+    """修正前後で変わった段落1つ（追加は before、削除は after が空文字列）"""
+    index: Optional[int]  # 修正版での段落番号（0始まり。削除された段落は直前の段落の次の番号）
+    before: str
+    after: str
+
+    @property
+    def kind(self) -> str:
+        if not self.before:
+            return "added"
+        return "removed" if not self.after else "changed"
+
+
+@dataclass(frozen=True)
+class EssayDiff:
+    """修正前後の答案の段落単位の差分"""
+    paragraphs: Tuple[str, ...]  # 修正版の段落
+    changes: Tuple[ParagraphChange, ...]
+
+    @property
+    def changed_indexes(self) -> List[int]:
+        """修正版で追加・変更された段落の番号"""
+        return [change.index for change in self.changes if change.after]
+
+    @property
+    def changed_ratio(self) -> float:
+        """修正版の文字数に対する、追加・変更・削除された段落の文字数の割合"""
+        total = sum(map(len, self.paragraphs))
+        changed = sum(max(len(change.before), len(change.after)) for change in self.changes)
+        return changed / total if total else 1.0
+
+    def needs_full_rescore(self, threshold: float = FULL_RESCORE_RATIO) -> bool:
+        return not self.paragraphs or self.changed_ratio > threshold
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """空行・改行で区切った空でない段落（前後の空白は除く）"""
+    return PARAGRAPH_PATTERN.findall(content)
+
+
+def diff_paragraphs(before: str, after: str) -> EssayDiff:
+    """修正前後の答案を段落単位で比較する（一部の段落が置き換わった箇所は先頭から順に対応付ける）"""
+    old = split_paragraphs(before)
+    new = split_paragraphs(after)
+    changes = []
+    for tag, old_start, old_end, new_start, new_end in SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        old_block = old[old_start:old_end]
+        new_block = new[new_start:new_end]
+        for offset in range(max(len(old_block), len(new_block))):
+            changes.append(ParagraphChange(
+                index=new_start + min(offset, len(new_block)),
+                before=old_block[offset] if offset < len(old_block) else "",
+                after=new_block[offset] if offset < len(new_block) else ""
+            ))
+    return EssayDiff(paragraphs=tuple(new), changes=tuple(changes))
+
+
+@lru_cache(maxsize=PARAGRAPH_FEATURE_CACHE_SIZE)
+def paragraph_features(paragraph: str) -> EssayFeatures:
+    """段落1つの採点ルール用特徴量（変更のない段落は修正のたびに集計し直さない）"""
+    return RULES.extract(paragraph)
+
+
+def describe_paragraph(paragraph: str) -> str:
+    """段落の特徴量の要約（差分採点のプロンプトに添える）"""
+    if not paragraph:
+        return "なし"
+    features = paragraph_features(paragraph)
+    markers = [label for category, label in (
+        ("example", "具体例"),
+        ("counter_argument", "反論への言及"),
+        ("logical_connector", "因果の接続語"),
+        ("conclusion", "まとめの表現"),
+    ) if features.has(category)]
+    if features.has_data():
+        markers.append("数値データ")
+    return (f"{features.word_count}文字・{features.sentence_count}文"
+            f"（平均{features.average_sentence_length:.0f}文字）・{'、'.join(markers) or '目立った論証表現なし'}")
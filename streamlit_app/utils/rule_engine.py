@@ -0,0 +1,129 @@
+import re
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from utils.tokenizer import split_sentences
+
+# 数値データとして扱う単位（「80%」「2024年」など）
+DATA_UNITS = "%人件年倍"
+
+# 前後の空白を除いた空でない段落の範囲
+PARAGRAPH_PATTERN = re.compile(r"\S(?:[^\n]*\S)?")
+
+
+@dataclass
+class EssayFeatures:
+    """採点ルールが参照する本文の特徴量"""
+    word_count: int
+    keyword_positions: Dict[str, List[int]]
+    unit_counts: Dict[str, int]
+    paragraph_spans: List[Tuple[int, int]]
+    sentence_lengths: List[int]
+    longest_run_after_period: int
+
+    @property
+    def paragraph_count(self) -> int:
+        return len(self.paragraph_spans)
+
+    @property
+    def sentence_count(self) -> int:
+        return len(self.sentence_lengths)
+
+    @property
+    def average_sentence_length(self) -> float:
+        if not self.sentence_lengths:
+            return 0.0
+        return sum(self.sentence_lengths) / len(self.sentence_lengths)
+
+    def count(self, category: str) -> int:
+        """カテゴリ内キーワードの出現回数の合計"""
+        return len(self.keyword_positions.get(category, ()))
+
+    def has(self, category: str) -> bool:
+        return bool(self.keyword_positions.get(category))
+
+    def has_between(self, category: str, start: int, end: int) -> bool:
+        """本文の [start, end) から始まるカテゴリ内キーワードがあるか"""
+        positions = self.keyword_positions.get(category, [])
+        index = bisect_left(positions, start)
+        return index < len(positions) and positions[index] < end
+
+    def paragraph_has(self, category: str, index: int) -> bool:
+        """index 番目の段落（負数は末尾から）にカテゴリ内キーワードがあるか"""
+        if not self.paragraph_spans:
+            return False
+        start, end = self.paragraph_spans[index]
+        return self.has_between(category, start, end)
+
+    def has_data(self, units: str = DATA_UNITS) -> bool:
+        """「数字＋単位」（units のいずれか）の表記があるか"""
+        return any(self.unit_counts.get(unit) for unit in units)
+
+
+class RuleEngine:
+    """カテゴリ別のキーワード群を1つの照合器にまとめ、特徴量を一括で集計する
+
+    全キーワードを1本の正規表現にコンパイルし、本文を先頭から1回だけ照合する。
+    重なり合うキーワード（「その結果」と「結果」など）は、Aho–Corasick の失敗遷移と
+    同じ考え方で事前に求めた再開位置から照合を続けることで漏れなく数える。
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]], data_units: str = DATA_UNITS):
+        self.categories = {name: tuple(keywords) for name, keywords in categories.items()}
+        keywords = sorted({kw for kws in self.categories.values() for kw in kws if kw}, key=len, reverse=True)
+
+        self._keyword_categories: Dict[str, List[str]] = {}
+        for name, kws in self.categories.items():
+            for keyword in set(kws):
+                self._keyword_categories.setdefault(keyword, []).append(name)
+        # 正規表現は各位置で最長のキーワードだけを返すため、同じ位置から始まる短いキーワードを補う
+        self._matched_keywords = {
+            keyword: [other for other in keywords if keyword.startswith(other)] for keyword in keywords
+        }
+        # 一致した範囲の途中から始まる別のキーワードがあり得る最小のずれ（なければ一致の末尾から再開）
+        self._resume_offsets = {
+            keyword: next(
+                (offset for offset in range(1, len(keyword))
+                 if any(other.startswith(keyword[offset:]) or keyword.startswith(other, offset)
+                        for other in keywords)),
+                len(keyword)
+            )
+            for keyword in keywords
+        }
+        self._keyword_pattern = re.compile("|".join(map(re.escape, keywords))) if keywords else None
+        # 単位の文字から照合を始め、直前が数字かを後読みで確かめる（数字の連続ごとに1回数える）
+        units = "[" + re.escape(data_units) + "]"
+        self._unit_pattern = re.compile(units + r"(?<=\d" + units + ")")
+
+    def extract(self, content: str) -> EssayFeatures:
+        """本文の特徴量を集計する"""
+        return EssayFeatures(
+            word_count=len(content) - content.count(" ") - content.count("\n"),
+            keyword_positions=self._scan_keywords(content),
+            unit_counts=self._count_units(content),
+            paragraph_spans=[match.span() for match in PARAGRAPH_PATTERN.finditer(content)],
+            sentence_lengths=[len(sentence) for sentence in split_sentences(content)],
+            longest_run_after_period=max(map(len, content.split("。")[1:]), default=0)
+        )
+
+    def _scan_keywords(self, content: str) -> Dict[str, List[int]]:
+        positions: Dict[str, List[int]] = {name: [] for name in self.categories}
+        if self._keyword_pattern is None:
+            return positions
+        search = self._keyword_pattern.search
+        match = search(content)
+        while match is not None:
+            start = match.start()
+            longest = match.group()
+            for keyword in self._matched_keywords[longest]:
+                for name in self._keyword_categories[keyword]:
+                    positions[name].append(start)
+            match = search(content, start + self._resume_offsets[longest])
+        return positions
+
+    def _count_units(self, content: str) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for unit in self._unit_pattern.findall(content):
+            counts[unit] = counts.get(unit, 0) + 1
+        return counts
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+from utils.storage import cache_path, connect, ensure_parent_dir
+
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60  # 30日
+
+# キャッシュする採点結果の形式（同じ答案でも形式が違えば別のキーにし、他の画面の結果を返さない）
+RESULT_FORMAT_DISPLAY = "display"  # ScoringResult.to_display()（streamlit_app の画面・バッチ採点）
+RESULT_FORMAT_CATEGORY = "category"  # scoring_result.category_result()（ルートの app_v2.py）
+
+
+def normalize_essay(content: str) -> str:
+    """キャッシュキー用に小論文本文を正規化する（全角半角・行末空白・空行の揺れを吸収）"""
+    text = unicodedata.normalize('NFKC', content)
+    lines = [line.strip() for line in text.replace('\r\n', '\n').split('\n')]
+    return '\n'.join(line for line in lines if line)
+
+
+def make_cache_key(content: str, theme: str, university: str, faculty: str,
+                   rubric_version: str, model: str, result_format: str) -> str:
+    """採点結果のキャッシュキーを生成"""
+    payload = json.dumps(
+        [normalize_essay(content), theme.strip(), university, faculty, rubric_version, model, result_format],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ScoreCache:
+    """SQLiteに採点結果を保存するLRUキャッシュ"""
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 max_age_seconds: int = DEFAULT_MAX_AGE_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        with connect(path) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS scores (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_scores_accessed ON scores (accessed_at)")
+
+    def get(self, key: str) -> Optional[dict]:
+        """キャッシュ済みの採点結果を取得（期限切れは None）"""
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT value, created_at FROM scores WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.max_age_seconds:
+                conn.execute("DELETE FROM scores WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE scores SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict) -> None:
+        """採点結果を保存し、上限を超えた分を古い順に削除"""
+        now = time.time()
+        with self._lock, connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scores (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float) -> None:
+        conn.execute("DELETE FROM scores WHERE created_at < ?", (now - self.max_age_seconds,))
+        conn.execute(
+            """DELETE FROM scores WHERE key IN (
+                SELECT key FROM scores ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )""",
+            (self.max_entries,)
+        )
+
+    def invalidate(self, key: str) -> None:
+        """指定したキーのキャッシュを削除"""
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM scores WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        """全キャッシュを削除"""
+        with self._lock, connect(self.path) as conn:
+            conn.execute("DELETE FROM scores")
+
+    def __len__(self) -> int:
+        with self._lock, connect(self.path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+
+_default_cache: Optional[ScoreCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_score_cache() -> ScoreCache:
+    """プロセス共有の採点キャッシュを取得"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ScoreCache(cache_path("score_cache.sqlite3"))
+        return _default_cache
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from utils.score_cache import normalize_essay
+from utils.storage import cache_path, connect, ensure_parent_dir
+
+MAX_SCORE = 100
+# 合格者の割合（学科の受験者のうち上位何割を合格とみなすか）
+ADMIT_RATE = float(os.getenv("SHORONBUN_ADMIT_RATE", "0.3"))
+# 受験者が少ない学科でも数値が極端にならないよう、事前分布（平均60点・標準偏差12点）を
+# PRIOR_WEIGHT 人分の仮想的な受験者として混ぜる。受験者が増えるほど実際の分布に近づく
+PRIOR_MEAN = 60.0
+PRIOR_STD = 12.0
+PRIOR_WEIGHT = 20
+# 採点のぶれ（点）。合格ラインとの差をこの幅でならして合格可能性にする
+SCORE_NOISE = 6.0
+
+DepartmentKey = Tuple[str, str, str]  # (大学, 学部, 学科)
+
+
+def _normal_cdf(x: float) -> float:
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def _clamp_score(score: float) -> int:
+    return min(max(int(round(score)), 0), MAX_SCORE)
+
+
+@dataclass(frozen=True)
+class Standing:
+    """学科の受験者の中での位置"""
+    deviation: float  # 偏差値
+    percentile: float  # 自分より低い受験者の割合（0〜1）
+    pass_probability: float  # 合格可能性（0〜1）
+    cohort_size: int  # 比較した受験者数（事前分布を除く）
+
+    def to_display(self) -> dict:
+        """評価結果の辞書に加える項目"""
+        return {
+            "偏差値": round(self.deviation, 1),
+            "合格可能性": f"{round(self.pass_probability * 100)}%",
+            "順位": f"上位{max(1, round((1 - self.percentile) * 100))}%",
+            "比較人数": self.cohort_size,
+        }
+
+
+class ScoreHistogram:
+    """0〜100点の得点分布（1点刻みのヒストグラム）
+
+    得点の追加は O(1)。平均・分散は合計と二乗和から求め、順位と合格ラインは101区間を数えて求める。
+    """
+
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = list(counts) if counts is not None else [0] * (MAX_SCORE + 1)
+        self.count = sum(self.counts)
+        self.total = sum(score * n for score, n in enumerate(self.counts))
+        self.total_squares = sum(score * score * n for score, n in enumerate(self.counts))
+
+    def add(self, score: int) -> None:
+        self.counts[score] += 1
+        self.count += 1
+        self.total += score
+        self.total_squares += score * score
+
+    def mean_std(self) -> Tuple[float, float]:
+        """事前分布を混ぜた平均と標準偏差"""
+        weight = self.count + PRIOR_WEIGHT
+        mean = (self.total + PRIOR_WEIGHT * PRIOR_MEAN) / weight
+        second_moment = (self.total_squares + PRIOR_WEIGHT * (PRIOR_STD ** 2 + PRIOR_MEAN ** 2)) / weight
+        return mean, math.sqrt(max(second_moment - mean * mean, 1.0))
+
+    def cdf(self, score: float) -> float:
+        """score 未満の割合（同点は半分として数え、事前分布を混ぜる）"""
+        position = min(max(score, 0.0), float(MAX_SCORE))
+        below = sum(self.counts[:math.ceil(position)])
+        if position == int(position):
+            below += self.counts[int(position)] / 2
+        prior = _normal_cdf((position - PRIOR_MEAN) / PRIOR_STD)
+        return (below + PRIOR_WEIGHT * prior) / (self.count + PRIOR_WEIGHT)
+
+    def quantile(self, fraction: float) -> int:
+        """その得点以下の割合が fraction に達する最小の得点"""
+        at_or_below = 0
+        for score in range(MAX_SCORE + 1):
+            at_or_below += self.counts[score]
+            prior = _normal_cdf((score + 0.5 - PRIOR_MEAN) / PRIOR_STD)
+            if (at_or_below + PRIOR_WEIGHT * prior) / (self.count + PRIOR_WEIGHT) >= fraction:
+                return score
+        return MAX_SCORE
+
+    def standing(self, score: int) -> Standing:
+        mean, std = self.mean_std()
+        cutoff = self.quantile(1.0 - ADMIT_RATE)
+        pass_probability = _normal_cdf((score - cutoff) / SCORE_NOISE)
+        return Standing(
+            deviation=50.0 + 10.0 * (score - mean) / std,
+            percentile=self.cdf(score),
+            pass_probability=min(max(pass_probability, 0.01), 0.99),
+            cohort_size=self.count
+        )
+
+
+def attempt_key(content: str, theme: str, university: str, faculty: str, department: str) -> str:
+    """分布に加えた答案の識別子（同じ答案の再提出・強制再評価を二重に数えないため）"""
+    payload = json.dumps(
+        [normalize_essay(content), theme.strip(), university, faculty, department], ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ScoreDistributions:
+    """学科ごとの得点分布を SQLite に保存し、偏差値・合格可能性を求める
+
+    採点のたびに該当する1区間だけを加算する。分布は求めるたびに SQLite から読む
+    （1学科101行まで）ため、複数のワーカープロセスが同じ分布を共有できる。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        ensure_parent_dir(path)
+        with connect(path) as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS score_histograms (
+                    university TEXT NOT NULL,
+                    faculty TEXT NOT NULL,
+                    department TEXT NOT NULL,
+                    score INTEGER NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (university, faculty, department, score)
+                )"""
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS observed_attempts (key TEXT PRIMARY KEY)")
+
+    @staticmethod
+    def _histogram(conn, key: DepartmentKey) -> ScoreHistogram:
+        counts = [0] * (MAX_SCORE + 1)
+        for score, count in conn.execute(
+            """SELECT score, count FROM score_histograms
+               WHERE university = ? AND faculty = ? AND department = ?""",
+            key
+        ):
+            counts[score] = count
+        return ScoreHistogram(counts)
+
+    def standing(self, university: str, faculty: str, department: str, score: float) -> Standing:
+        """得点の学科内での位置を求める（分布には加えない）"""
+        with self._lock, connect(self.path) as conn:
+            histogram = self._histogram(conn, (university, faculty, department))
+        return histogram.standing(_clamp_score(score))
+
+    def observe(self, university: str, faculty: str, department: str, score: float, attempt: str) -> Standing:
+        """得点の学科内での位置を、それまでの受験者と比べて求めてから分布に加える
+
+        attempt（attempt_key の値）が分布に加え済みなら、加えずに位置だけを求める。
+        """
+        key = (university, faculty, department)
+        score = _clamp_score(score)
+        with self._lock, connect(self.path) as conn:
+            # 最初の書き込みで書き込みロックを取り、他のプロセスの加算と読み込みが混ざらないようにする
+            added = conn.execute("INSERT OR IGNORE INTO observed_attempts (key) VALUES (?)", (attempt,)).rowcount
+            histogram = self._histogram(conn, key)
+            if added:
+                conn.execute(
+                    """INSERT INTO score_histograms (university, faculty, department, score, count)
+                       VALUES (?, ?, ?, ?, 1)
+                       ON CONFLICT (university, faculty, department, score) DO UPDATE SET count = count + 1""",
+                    key + (score,)
+                )
+        return histogram.standing(score)
+
+
+_default_distributions: Optional[ScoreDistributions] = None
+_default_distributions_lock = threading.Lock()
+
+
+def get_score_distributions() -> ScoreDistributions:
+    """プロセス共有の得点分布を取得"""
+    global _default_distributions
+    with _default_distributions_lock:
+        if _default_distributions is None:
+            _default_distributions = ScoreDistributions(cache_path("score_distributions.sqlite3"))
+        return _default_distributions
@@ -0,0 +1,237 @@
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 点数項目と満点
+SCORE_LIMITS = {
+    "structure_score": 25,
+    "content_score": 30,
+    "logic_score": 25,
+    "expression_score": 20,
+}
+# 文章で評価する項目
+TEXT_FIELDS = (
+    "structure_evaluation",
+    "content_evaluation",
+    "logic_evaluation",
+    "expression_evaluation",
+    "detailed_feedback",
+)
+ADVICE_FIELD = "specific_advice"
+SCORING_FIELDS = tuple(SCORE_LIMITS) + TEXT_FIELDS + (ADVICE_FIELD,)
+
+# 途中で切れたJSONを修復するとき、末尾から試す区切り位置の数
+MAX_REPAIR_ATTEMPTS = 200
+
+
+@dataclass(frozen=True)
+class ScoringResult:
+    """Claude の詳細採点結果（全項目がそろい、点数が満点の範囲内であることを保証する）"""
+    structure_score: int
+    content_score: int
+    logic_score: int
+    expression_score: int
+    structure_evaluation: str
+    content_evaluation: str
+    logic_evaluation: str
+    expression_evaluation: str
+    detailed_feedback: str
+    specific_advice: Tuple[str, ...]
+
+    @property
+    def total(self) -> int:
+        return self.structure_score + self.content_score + self.logic_score + self.expression_score
+
+    @classmethod
+    def from_fields(cls, fields: Dict[str, Any]) -> "ScoringResult":
+        """validate_fields 済みの項目から作成する（不足があれば ValueError）"""
+        missing = missing_fields(fields)
+        if missing:
+            raise ValueError(f"採点結果に不足している項目があります: {', '.join(missing)}")
+        return cls(**{name: fields[name] for name in SCORING_FIELDS})
+
+    def to_display(self) -> dict:
+        """画面表示・採点キャッシュ用の形式に変換"""
+        return {
+            "total": self.total,
+            "structure": {"score": self.structure_score, "evaluation": self.structure_evaluation},
+            "content": {"score": self.content_score, "evaluation": self.content_evaluation},
+            "logic": {"score": self.logic_score, "evaluation": self.logic_evaluation},
+            "expression": {"score": self.expression_score, "evaluation": self.expression_evaluation},
+            "detailed_feedback": self.detailed_feedback,
+            "specific_advice": list(self.specific_advice)
+        }
+
+
+def is_display_result(result: Any) -> bool:
+    """ScoringResult.to_display() の形式（total と観点ごとの score を持つ辞書）か"""
+    if not isinstance(result, dict) or _clean_score(result.get("total"), 100) is None:
+        return False
+    axes = [key[:-len("_score")] for key in SCORE_LIMITS]
+    return all(isinstance(result.get(axis), dict) and "score" in result[axis] for axis in axes)
+
+
+def _clean_score(value: Any, limit: int) -> Optional[int]:
+    """点数を 0〜limit の整数にする（数値でなければ None）"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value.strip())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return min(max(int(round(value)), 0), limit)
+    return None
+
+
+def _clean_text(value: Any) -> Optional[str]:
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def _clean_advice(value: Any) -> Tuple[str, ...]:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list):
+        return ()
+    return tuple(item.strip() for item in value if isinstance(item, str) and item.strip())
+
+
+def validate_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """採点結果の項目のうち、型と値が正しいものだけを（必要なら変換して）返す"""
+    fields: Dict[str, Any] = {}
+    for name, limit in SCORE_LIMITS.items():
+        score = _clean_score(data.get(name), limit)
+        if score is not None:
+            fields[name] = score
+    for name in TEXT_FIELDS:
+        text = _clean_text(data.get(name))
+        if text is not None:
+            fields[name] = text
+    advice = _clean_advice(data.get(ADVICE_FIELD))
+    if advice:
+        fields[ADVICE_FIELD] = advice
+    return fields
+
+
+def missing_fields(fields: Dict[str, Any]) -> List[str]:
+    return [name for name in SCORING_FIELDS if name not in fields]
+
+
+def repair_json(text: str) -> Optional[dict]:
+    """途中で切れたJSONオブジェクトを、最後に完結している値までで閉じて読み込む
+
+    文字列の外にある区切り（',' の直前、開き括弧の直後、閉じ括弧の直後）を末尾から順に試し、
+    その時点で開いている括弧を閉じて読み込めた最初のものを返す。修復できなければ None。
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []  # (切る位置, その位置で閉じる括弧)
+    in_string = False
+    escape = False
+    for index in range(start, len(text)):
+        ch = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == '\\':
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            cuts.append((index + 1, ''.join(reversed(stack))))
+        elif ch in '}]':
+            if stack:
+                stack.pop()
+            cuts.append((index + 1, ''.join(reversed(stack))))
+            if not stack:
+                break
+        elif ch == ',':
+            cuts.append((index, ''.join(reversed(stack))))
+
+    for cut, closing in reversed(cuts[-MAX_REPAIR_ATTEMPTS:]):
+        try:
+            data = json.loads(text[start:cut] + closing)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def parse_fields(text: str, validate: Callable[[Dict[str, Any]], Dict[str, Any]] = validate_fields) -> Dict[str, Any]:
+    """Claude の応答（JSON）から正しい採点項目を取り出す（JSONが途中で切れていても読める分は返す）
+
+    validate には採点形式ごとの検証関数（validate_fields・validate_category_fields）を渡す。
+    """
+    start = text.find('{')
+    if start < 0:
+        return {}
+    try:
+        data, _ = json.JSONDecoder().raw_decode(text, start)
+    except ValueError:
+        data = repair_json(text)
+    if not isinstance(data, dict):
+        return {}
+    return validate(data)
+
+
+# 観点ごとに25点満点で採点し、評価と改善点を付ける形式（ルートの app.py・app_v2.py の画面用）
+CATEGORY_NAMES = ("構成", "内容", "論理性", "表現")
+CATEGORY_LIMIT = 25
+SUMMARY_FIELD = "総合評価"
+CATEGORY_ADVICE_FIELD = "具体的アドバイス"
+CATEGORY_SCORING_FIELDS = CATEGORY_NAMES + (SUMMARY_FIELD, CATEGORY_ADVICE_FIELD)
+
+
+def sabcd_grade(score: int) -> str:
+    """総合得点（100点満点）のSABCD評価"""
+    if score >= 85: return "S"
+    elif score >= 75: return "A"
+    elif score >= 65: return "B"
+    elif score >= 55: return "C"
+    return "D"
+
+
+def validate_category_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """観点別形式の採点結果のうち、得点・評価・改善点がそろった観点と正しい項目だけを返す"""
+    fields: Dict[str, Any] = {}
+    for name in CATEGORY_NAMES:
+        category = data.get(name)
+        if not isinstance(category, dict):
+            continue
+        score = _clean_score(category.get("得点"), CATEGORY_LIMIT)
+        evaluation = _clean_text(category.get("評価"))
+        improvement = _clean_text(category.get("改善点"))
+        if score is not None and evaluation is not None and improvement is not None:
+            fields[name] = {"得点": score, "評価": evaluation, "改善点": improvement}
+    summary = _clean_text(data.get(SUMMARY_FIELD))
+    if summary is not None:
+        fields[SUMMARY_FIELD] = summary
+    advice = _clean_advice(data.get(CATEGORY_ADVICE_FIELD))
+    if advice:
+        fields[CATEGORY_ADVICE_FIELD] = list(advice)
+    return fields
+
+
+def missing_category_fields(fields: Dict[str, Any]) -> List[str]:
+    return [name for name in CATEGORY_SCORING_FIELDS if name not in fields]
+
+
+def category_result(fields: Dict[str, Any]) -> dict:
+    """validate_category_fields 済みの項目から画面表示用の採点結果を作成（不足があれば ValueError）
+
+    総合得点と SABCD評価は観点別の得点から求める（Claude には出力させない）。
+    """
+    missing = missing_category_fields(fields)
+    if missing:
+        raise ValueError(f"採点結果に不足している項目があります: {', '.join(missing)}")
+    total = sum(fields[name]["得点"] for name in CATEGORY_NAMES)
+    result = {"総合得点": total, "SABCD評価": sabcd_grade(total)}
+    result.update({name: dict(fields[name]) for name in CATEGORY_NAMES})
+    result[SUMMARY_FIELD] = fields[SUMMARY_FIELD]
+    result[CATEGORY_ADVICE_FIELD] = list(fields[CATEGORY_ADVICE_FIELD])
+    return result
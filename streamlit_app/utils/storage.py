@@ -0,0 +1,35 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+# ローカルデータ（キャッシュ・保存データ）の保存先（環境変数で変更可能）
+CACHE_DIR = os.getenv(
+    "SHORONBUN_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+
+
+def cache_path(filename: str) -> str:
+    """CACHE_DIR 配下のファイルパスを返す"""
+    return os.path.join(CACHE_DIR, filename)
+
+
+def ensure_parent_dir(path: str) -> None:
+    """path の親ディレクトリを作成"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+
+@contextmanager
+def connect(path: str) -> Iterator[sqlite3.Connection]:
+    """SQLite に接続し、ブロックを抜けたらコミットして閉じる
+
+    Streamlit のスクリプトスレッドごとに接続を分けるため、操作ごとに接続を開く。
+    """
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
@@ -0,0 +1,113 @@
+import json
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+from utils.progress import ProgressReporter, report_stage
+
+# 画面の再描画間隔（秒）。トークンごとに描画するとブラウザへの送信が増えるため間引く
+RENDER_INTERVAL = 0.1
+
+
+def stream_message(
+    client,
+    on_text: Optional[Callable[[str], None]] = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    progress: Optional[ProgressReporter] = None,
+    **kwargs
+) -> str:
+    """Claude のストリーミングAPIで応答を受信し、全文を返す
+
+    on_text には受信済みの全文を RENDER_INTERVAL ごと（と受信完了時）に、
+    on_delta には受信した差分をそのまま渡す。progress にはリクエスト送信と最初のトークン受信を通知する。
+    """
+    chunks = []
+    last_render = 0.0
+    report_stage(progress, "request")
+    with client.messages.stream(**kwargs) as stream:
+        for text in stream.text_stream:
+            if not chunks:
+                report_stage(progress, "first_token")
+            chunks.append(text)
+            if on_delta is not None:
+                on_delta(text)
+            if on_text is not None:
+                now = time.monotonic()
+                if now - last_render >= RENDER_INTERVAL:
+                    on_text(''.join(chunks))
+                    last_render = now
+    full_text = ''.join(chunks)
+    if on_text is not None:
+        on_text(full_text)
+    return full_text
+
+
+class IncrementalJSONParser:
+    """受信途中のJSONオブジェクトから、完成したトップレベル項目を順に取り出す
+
+    採点結果の「構成」「内容」などの項目を、応答全体の完了を待たずに表示するために使う。
+    """
+
+    def __init__(self):
+        self.result = {}
+        self._buffer: List[str] = []
+        self._depth = 0
+        self._started = False
+        self._finished = False
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """文字列片を追加し、新たに完成した (キー, 値) の一覧を返す"""
+        completed: List[Tuple[str, Any]] = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                # 最初の '{' までの前置き文は読み飛ばす
+                if ch == '{':
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._flush(completed)
+                    self._finished = True
+                    continue
+            elif ch == ',' and self._depth == 1:
+                self._flush(completed)
+                continue
+            self._buffer.append(ch)
+        return completed
+
+    def _flush(self, completed: List[Tuple[str, Any]]) -> None:
+        segment = ''.join(self._buffer).strip()
+        self._buffer = []
+        if not segment:
+            return
+        try:
+            item = json.loads('{' + segment + '}')
+        except ValueError:
+            return
+        for key, value in item.items():
+            self.result[key] = value
+            completed.append((key, value))
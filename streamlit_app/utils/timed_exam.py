@@ -0,0 +1,75 @@
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, MutableMapping, Optional, Tuple
+
+from utils.deadline_scheduler import DeadlineScheduler, get_deadline_scheduler
+from utils.draft_journal import DraftJournal, SavedDraft, get_draft_journal
+
+# 再読み込み前のセッションの下書きを指す URL のパラメーター
+DRAFT_PARAM = "draft"
+
+
+class TimedExam:
+    """時間制限つきの執筆画面で、締切の自動提出と下書きの保存をセッションごとに扱う
+
+    識別子はサーバー側で Streamlit のセッションごとに発行し、session_state にだけ保持する。
+    URL からは受け取らないため、同じ URL を開いた別のタブや他人が締切・自動提出の結果を共有・横取りできない。
+    下書きの識別子だけは URL に残し、再読み込み・サーバーの再起動後の新しいセッションで1回だけ内容を引き継ぐ
+    （引き継いだ後の書き込みは新しいセッションの識別子で行うため、別のタブの下書きは上書きしない）。
+    """
+
+    def __init__(self, state: MutableMapping, query_params: Optional[MutableMapping] = None,
+                 scheduler: Optional[DeadlineScheduler] = None, journal: Optional[DraftJournal] = None):
+        self.state = state
+        self.scheduler = scheduler or get_deadline_scheduler()
+        self.journal = journal or get_draft_journal()
+        if 'exam_session_id' not in state:
+            state['exam_session_id'] = uuid.uuid4().hex
+            state['draft_session_id'] = uuid.uuid4().hex
+            state['resume_draft_id'] = query_params.get(DRAFT_PARAM) if query_params is not None else None
+        self.session_id = state['exam_session_id']
+        self.draft_id = state['draft_session_id']
+        if query_params is not None and query_params.get(DRAFT_PARAM) != self.draft_id:
+            query_params[DRAFT_PARAM] = self.draft_id
+
+    def start(self, deadline: float, on_expire: Callable[[str], Any], draft: str = "") -> None:
+        """締切を登録する（締切に達したら、ブラウザの操作を待たずにその時点の下書きを on_expire で採点する）"""
+        self.scheduler.start(self.session_id, deadline, on_expire, draft)
+
+    def take_auto_submitted(self) -> Optional[Tuple[str, Future]]:
+        """締切で自動提出済みなら登録を取り消し、(提出した下書き, 採点結果の Future) を返す"""
+        auto_submitted = self.scheduler.result(self.session_id)
+        if auto_submitted is not None:
+            self.scheduler.cancel(self.session_id)
+        return auto_submitted
+
+    def saved_draft(self) -> Optional[SavedDraft]:
+        """保存済みの下書き（このセッション、なければ再読み込み前のセッションのもの）。読むのはセッションごとに1回"""
+        if 'saved_draft' not in self.state:
+            saved = self.journal.restore(self.draft_id)
+            resume_from = self.state.pop('resume_draft_id', None)
+            if saved is None and resume_from:
+                saved = self.journal.restore(resume_from)
+            self.state['saved_draft'] = saved if saved is not None and saved.content.strip() else None
+        return self.state['saved_draft']
+
+    def restore_draft(self, theme: str) -> Optional[SavedDraft]:
+        """初回だけ、同じ出題テーマの下書きを入力欄が空の essay_content に戻し、戻した下書きを返す"""
+        if 'saved_draft' in self.state:
+            return None
+        saved = self.saved_draft()
+        if saved is None or saved.theme != theme or self.state.get('essay_content'):
+            return None
+        self.state['essay_content'] = saved.content
+        return saved
+
+    def update(self, draft: str, theme: str = "") -> None:
+        """入力のたびに締切前の下書きを更新し、保存を予約する（書き込みはバックグラウンドでまとめて行う）"""
+        self.scheduler.update_draft(self.session_id, draft)
+        self.journal.save(self.draft_id, draft, theme)
+
+    def finish(self) -> None:
+        """提出・中断したセッションの締切の登録と下書きを破棄する"""
+        self.scheduler.cancel(self.session_id)
+        self.journal.discard(self.draft_id)
+        self.state.pop('saved_draft', None)
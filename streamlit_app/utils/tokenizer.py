@@ -0,0 +1,133 @@
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+# 使用する形態素解析器（auto: fugashi があれば使い、なければ簡易解析 / mecab / simple）
+TOKENIZER_BACKEND = os.getenv("SHORONBUN_TOKENIZER", "auto")
+
+# 語彙数に数える品詞（内容語）
+CONTENT_POS = {"名詞", "動詞", "形容詞", "副詞", "形状詞", "代名詞", "連体詞"}
+
+# 文の区切り。「」『』内の句点では区切らず、閉じ括弧は直前の文に含める
+SENTENCE_PATTERN = re.compile(r"(?:「[^」]*」|『[^』]*』|[^。！？!?\n])+(?:[。！？!?]+[」』）)]*)?")
+
+
+@dataclass(frozen=True)
+class Token:
+    surface: str
+    pos: str
+    base: str
+
+
+@dataclass(frozen=True)
+class TextAnalysis:
+    """1つの文章の解析結果（採点ルール間で共有する）"""
+    tokens: Tuple[Token, ...]
+    sentences: Tuple[str, ...]
+
+    @property
+    def content_words(self) -> List[Token]:
+        return [token for token in self.tokens if token.pos in CONTENT_POS]
+
+    @property
+    def vocabulary_size(self) -> int:
+        """異なり語数（内容語の基本形の種類数）"""
+        return len({token.base for token in self.content_words})
+
+
+def split_sentences(text: str) -> List[str]:
+    """文章を文に分割する（改行も文の区切りとして扱う）"""
+    sentences = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        sentence = match.group().strip()
+        if sentence:
+            sentences.append(sentence)
+    return sentences
+
+
+# 簡易解析用の機能語辞書（ひらがな列はこれらで区切る）
+FUNCTION_WORDS = {
+    "接続詞": ["しかし", "そのため", "なぜなら", "つまり", "すなわち", "また", "さらに", "ただし", "もっとも",
+             "けれども", "このように", "したがって", "そして", "だから", "ところが", "まず"],
+    "助動詞": ["である", "ではない", "でした", "ました", "ません", "ます", "です", "だった", "だろう", "でしょう",
+             "られる", "させる", "れる", "せる", "ない", "たい", "らしい", "ようだ", "だ", "た"],
+    "助詞": ["について", "において", "に関して", "として", "によって", "ながら", "けれど", "ので", "のに",
+           "から", "まで", "より", "など", "ても", "でも", "には", "では", "とは", "への",
+           "が", "を", "に", "へ", "と", "で", "は", "も", "の", "や", "か", "ね", "よ", "ば", "て"],
+    "動詞": ["いる", "ある", "する", "なる", "できる", "おける", "いく", "くる"],
+    "名詞": ["こと", "もの", "ため", "とき", "ところ", "よう"],
+}
+_FUNCTION_POS = {word: pos for pos, words in FUNCTION_WORDS.items() for word in words}
+_FUNCTION_ALTERNATION = "|".join(sorted(_FUNCTION_POS, key=len, reverse=True))
+SIMPLE_TOKEN_PATTERN = re.compile(
+    r"(?P<kanji>[一-龯々〆ヶ]+(?:(?!" + _FUNCTION_ALTERNATION + r")[ぁ-ん])*)"
+    r"|(?P<katakana>[ァ-ヴー]+)"
+    r"|(?P<function>" + _FUNCTION_ALTERNATION + r")"
+    r"|(?P<hiragana>(?:(?!" + _FUNCTION_ALTERNATION + r")[ぁ-ん])+)"
+    r"|(?P<number>[0-9０-９]+(?:[.．][0-9０-９]+)?)"
+    r"|(?P<alphabet>[A-Za-zＡ-Ｚａ-ｚ]+)"
+    r"|(?P<symbol>\S)"
+)
+
+
+def simple_tokenize(text: str) -> List[Token]:
+    """文字種と機能語辞書による簡易形態素解析（外部ライブラリ不要）"""
+    tokens = []
+    for match in SIMPLE_TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        surface = match.group()
+        if kind == "kanji":
+            # 送り仮名付きの漢字は用言として扱う（「い」で終われば形容詞）
+            if surface[-1] < "一":
+                pos = "形容詞" if surface.endswith("い") else "動詞"
+            else:
+                pos = "名詞"
+        elif kind == "function":
+            pos = _FUNCTION_POS[surface]
+        elif kind in ("katakana", "number", "alphabet"):
+            pos = "名詞"
+        elif kind == "hiragana":
+            pos = "その他"
+        else:
+            pos = "記号"
+        tokens.append(Token(surface, pos, surface))
+    return tokens
+
+
+def _load_mecab() -> Callable[[str], List[Token]]:
+    """fugashi（MeCab + UniDic）による形態素解析器を読み込む"""
+    import fugashi
+
+    tagger = fugashi.Tagger()
+
+    def tokenize(text: str) -> List[Token]:
+        tokens = []
+        for word in tagger(text):
+            pos = word.feature.pos1
+            if pos in ("補助記号", "空白"):
+                pos = "記号"
+            base = getattr(word.feature, "lemma", None) or word.surface
+            tokens.append(Token(word.surface, pos, base))
+        return tokens
+
+    return tokenize
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer() -> Callable[[str], List[Token]]:
+    """形態素解析器を取得（初回呼び出し時に読み込む）"""
+    if TOKENIZER_BACKEND in ("auto", "mecab"):
+        try:
+            return _load_mecab()
+        except Exception:
+            if TOKENIZER_BACKEND == "mecab":
+                raise
+    return simple_tokenize
+
+
+@lru_cache(maxsize=64)
+def analyze(text: str) -> TextAnalysis:
+    """文章を解析する（同じ文章の解析結果は再利用する）"""
+    return TextAnalysis(tokens=tuple(get_tokenizer()(text)), sentences=tuple(split_sentences(text)))
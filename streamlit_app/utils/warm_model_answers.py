@@ -0,0 +1,122 @@
+"""過去問テーマの模範解答を事前生成し、模範解答ストアに保存するバッチ処理
+
+使い方（streamlit_app ディレクトリで実行）:
+    python -m utils.warm_model_answers            # 未生成のテーマのみ生成
+    python -m utils.warm_model_answers --purge-old  # 古いプロンプト版の模範解答も削除
+
+終了コード: 0 = すべて保存済み / 2 = 一部のテーマだけ失敗 / 1 = 保存済みのテーマが1件もない（API キー未設定を含む）
+"""
+import argparse
+import asyncio
+import os
+import sys
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+from dotenv import load_dotenv
+
+from data.universities import get_universities
+from utils.claude_gateway import MAX_CONCURRENCY, ClaudeGateway, get_claude_gateway
+from utils.model_answer_store import ModelAnswerStore, get_model_answer_store
+from utils.prompts import MODEL_ANSWER_PROMPT_VERSION, model_answer_request
+
+# 同時に生成する件数（既定はゲートウェイの同時実行数）
+WARM_CONCURRENCY = MAX_CONCURRENCY
+# ゲートウェイの再試行を使い切って失敗したテーマを、全件の後に生成し直す周回数
+WARM_RETRY_ROUNDS = 2
+# 一部のテーマだけ生成に失敗したときの終了コード（保存済みのテーマが1件もなければ 1）
+EXIT_PARTIAL = 2
+
+
+def collect_targets(universities) -> List[Tuple[str, str, str]]:
+    """AO入試対応学科の過去問から (テーマ, 大学, 学部) の一覧を重複なく集める"""
+    targets = []
+    seen = set()
+    for university in universities:
+        for faculty in university.faculties:
+            if not faculty.has_ao:
+                continue
+            for department in faculty.departments:
+                if not department.has_ao:
+                    continue
+                for question in department.past_questions:
+                    target = (question.theme, university.name, faculty.name)
+                    if target not in seen:
+                        seen.add(target)
+                        targets.append(target)
+    return targets
+
+
+@dataclass(frozen=True)
+class WarmSummary:
+    """事前生成の結果"""
+    stored: int  # 新たに生成して保存した件数
+    skipped: int  # 保存済みのため生成しなかった件数
+    failed: List[Tuple[str, str, str]]  # 再生成しても失敗したテーマ
+
+
+async def warm_store(gateway: ClaudeGateway, store: ModelAnswerStore, targets: List[Tuple[str, str, str]],
+                     concurrency: int = WARM_CONCURRENCY, retry_rounds: int = WARM_RETRY_ROUNDS) -> WarmSummary:
+    """未保存の模範解答を concurrency 件ずつ並列に生成して保存する
+
+    ゲートウェイの再試行を使い切って失敗したテーマは、全件を一巡した後に retry_rounds 周まで生成し直す。
+    """
+    missing = [t for t in targets if store.get(t[0], t[1], t[2], MODEL_ANSWER_PROMPT_VERSION) is None]
+    stored = 0
+
+    async def worker(queue: Iterator[Tuple[str, str, str]], failed: List[Tuple[str, str, str]]) -> None:
+        nonlocal stored
+        # 各ワーカーが同じイテレーターから1件ずつ取り出すため、同時に生成するのは最大でワーカー数
+        for target in queue:
+            theme, university, faculty = target
+            try:
+                message = await gateway.create(**model_answer_request(theme, university, faculty))
+                store.put(theme, university, faculty, MODEL_ANSWER_PROMPT_VERSION, message.content[0].text.strip())
+            except Exception as error:
+                print(f"生成失敗（{university} {faculty}「{theme[:30]}」）: {error}", file=sys.stderr)
+                failed.append(target)
+            else:
+                stored += 1
+
+    pending = missing
+    for round_number in range(retry_rounds + 1):
+        if not pending:
+            break
+        if round_number:
+            print(f"失敗した {len(pending)}件を生成し直します（{round_number}回目）", file=sys.stderr)
+        queue = iter(pending)
+        failed: List[Tuple[str, str, str]] = []
+        await asyncio.gather(*(worker(queue, failed) for _ in range(min(max(1, concurrency), len(pending)))))
+        pending = failed
+    return WarmSummary(stored, len(targets) - len(missing), pending)
+
+
+def main(argv=None) -> int:
+    """終了コードは、すべて保存済みなら 0、一部のテーマだけ失敗したら EXIT_PARTIAL、保存済みのテーマが1件もなければ 1"""
+    parser = argparse.ArgumentParser(description="過去問テーマの模範解答を事前生成する")
+    parser.add_argument("--purge-old", action="store_true", help="現在のプロンプト版以外の模範解答を削除する")
+    parser.add_argument("--concurrency", type=int, default=WARM_CONCURRENCY, help="同時に生成する件数")
+    parser.add_argument("--retries", type=int, default=WARM_RETRY_ROUNDS, help="失敗したテーマを生成し直す周回数")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api_key = os.getenv("ANTHROPIC_API_KEY")
+    if not api_key:
+        print("ANTHROPIC_API_KEY が設定されていません", file=sys.stderr)
+        return 1
+
+    store = get_model_answer_store()
+    if args.purge_old:
+        print(f"古い版の模範解答を削除: {store.purge_other_versions(MODEL_ANSWER_PROMPT_VERSION)}件")
+
+    targets = collect_targets(get_universities())
+    gateway = get_claude_gateway(api_key)
+    summary = gateway.run(warm_store(gateway, store, targets, args.concurrency, args.retries))
+    print(f"対象 {len(targets)}件 / 保存済み {summary.skipped}件 / 新規生成 {summary.stored}件 / 失敗 {len(summary.failed)}件")
+    if not summary.failed:
+        return 0
+    return EXIT_PARTIAL if summary.stored or summary.skipped else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())